@@ -0,0 +1,28 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Keep the module-level stores out of the working tree; read when the game module is imported
+_STATE_DIR = tempfile.mkdtemp(prefix="urban_pulse_tests_")
+os.environ.setdefault("URBAN_PULSE_SESSION_DB", os.path.join(_STATE_DIR, "sessions.db"))
+os.environ.setdefault("URBAN_PULSE_EFFECTS_CACHE_DIR", "")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streamlit as st  # noqa: E402
+
+import urban_pulse_game as game  # noqa: E402
+
+
+@pytest.fixture
+def session():
+    """Bare-mode st.session_state with a fresh game manager"""
+    st.session_state.custom_strategies = {}
+    st.session_state.team_name = "Test Team"
+    st.session_state.game_name = "Test Game"
+    st.session_state.current_round = 1
+    st.session_state.game_manager = game.MultiZoneGameManager()
+    yield st.session_state
+    st.session_state.custom_strategies = {}
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+import urban_pulse_game as game
+
+HEAT_PLAN = {
+    "Strategy": "Heat Resilience Plan",
+    "Subsystems": ["Thermal", "Air-Soundscape"],
+    "Actions": ["Cool roofs", "Misting stations"],
+    "Custom": True
+}
+
+
+def _configurations(zone_ids, seed):
+    rng = random.Random(seed)
+    names = [strategy["Strategy"] for strategy in game.STRATEGIES] + [HEAT_PLAN["Strategy"], "Unknown Strategy"]
+    action_counts = [1, 2, game.COMPILED_MAX_ACTIONS, game.COMPILED_MAX_ACTIONS + 1, 3 * game.COMPILED_MAX_ACTIONS]
+    for _ in range(12):
+        plan = {}
+        for zone in rng.sample(zone_ids, rng.randint(1, min(6, len(zone_ids)))):
+            plan[zone] = {
+                "strategies": rng.sample(names, rng.randint(1, 3)),
+                "actions": [f"Action {n}" for n in range(rng.choice(action_counts))]
+            }
+        # Always include the custom strategy with more actions than the table holds
+        zone = rng.choice(list(plan))
+        plan[zone] = {"strategies": [HEAT_PLAN["Strategy"]], "actions": [f"Action {n}" for n in range(game.COMPILED_MAX_ACTIONS + 5)]}
+        yield plan
+    yield {zone_ids[0]: {"strategies": [HEAT_PLAN["Strategy"]], "actions": []}}
+
+
+@pytest.mark.parametrize("city_size,spillover_epsilon,synergy_top_k", [
+    (None, 0.0, 0),
+    (None, 0.01, 3),
+    (200, 0.0, 0),
+    (200, 0.01, 5)
+])
+def test_compiled_path_matches_reference_engine(session, city_size, spillover_epsilon, synergy_top_k):
+    session.custom_strategies = {HEAT_PLAN["Strategy"]: HEAT_PLAN}
+    if city_size is None:
+        calculator = game.SpatialEffectsCalculator(spillover_epsilon=spillover_epsilon, synergy_top_k=synergy_top_k)
+    else:
+        zones, adjacency, multipliers = game.generate_synthetic_city(city_size, 1)
+        calculator = game.SpatialEffectsCalculator(zones, adjacency, multipliers, spillover_epsilon=spillover_epsilon,
+                                                   synergy_top_k=synergy_top_k)
+    assert calculator.compiled_tables is not None
+    
+    for seed, plan in enumerate(_configurations(list(calculator.zones), city_size or 0)):
+        reference = calculator.calculate_multi_zone_effects(plan, 2, compiled=False)
+        compiled = calculator.calculate_multi_zone_effects(plan, 2, compiled=True)
+        assert game._effects_mismatch(reference, compiled) is None, (seed, plan)
+
+
+def test_compiled_path_resolves_custom_strategies_per_call(session):
+    calculator = game.SpatialEffectsCalculator()
+    plan = {"city_center": {"strategies": [HEAT_PLAN["Strategy"]], "actions": ["Cool roofs"]}}
+    
+    unresolved = calculator.calculate_multi_zone_effects(plan, 1)
+    session.custom_strategies = {HEAT_PLAN["Strategy"]: HEAT_PLAN}
+    resolved = calculator.calculate_multi_zone_effects(plan, 1)
+    
+    assert set(unresolved["direct_effects"]["city_center"]) == {"Human-Social"}
+    assert set(resolved["direct_effects"]["city_center"]) == {"Thermal", "Air-Soundscape"}
+    assert game._effects_mismatch(calculator.calculate_multi_zone_effects(plan, 1, compiled=False), resolved) is None
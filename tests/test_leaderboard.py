@@ -0,0 +1,69 @@
+import random
+
+import urban_pulse_game as game
+
+
+def _brute_rank(scores, team_name, resolution=game.LEADERBOARD_SCORE_RESOLUTION):
+    bucket = round(scores[team_name] * resolution)
+    return 1 + sum(1 for score in scores.values() if round(score * resolution) > bucket)
+
+
+def test_fenwick_prefix_sums_and_kth_match_brute_force():
+    rng = random.Random(7)
+    for size in (1, 2, 7, 64, 1001):
+        tree = game.FenwickTree(size)
+        counts = [0] * size
+        for _ in range(300):
+            index = rng.randrange(size)
+            delta = rng.choice((1, 1, 2, -1)) if counts[index] else rng.randint(1, 3)
+            tree.add(index, delta)
+            counts[index] += delta
+        
+        for index in range(size):
+            assert tree.prefix_sum(index) == sum(counts[:index + 1])
+        for k in range(1, sum(counts) + 1):
+            expected = next(index for index in range(size) if sum(counts[:index + 1]) >= k)
+            assert tree.find_kth(k) == expected
+
+
+def test_leaderboard_ranks_and_top_match_brute_force():
+    rng = random.Random(11)
+    board = game.Leaderboard()
+    scores = {}
+    
+    for step in range(400):
+        team_name = f"team-{rng.randrange(120)}"
+        # Coarse scores force ties; resubmissions replace the previous entry
+        score = rng.choice((rng.randrange(0, 101), round(rng.uniform(0, 100), 2)))
+        rank = board.submit(team_name, {
+            "final_uec_score": score,
+            "submission_timestamp": f"{step:06d}"
+        }, strategies=["Behavioral Activation Program"])
+        scores[team_name] = score
+        assert rank == _brute_rank(scores, team_name)
+    
+    for team_name in scores:
+        assert board.rank_of(team_name) == _brute_rank(scores, team_name)
+    assert board.rank_of("never-submitted") is None
+    
+    ordered = sorted(scores.values(), reverse=True)
+    for n in (1, 5, 17, len(scores), len(scores) + 10):
+        top = board.top(n)
+        assert len(top) == min(n, len(scores))
+        assert [entry["final_uec_score"] for _, entry in top] == ordered[:n]
+        for rank, entry in top:
+            assert rank == 1 + sum(1 for score in scores.values() if score > entry["final_uec_score"])
+    
+    assert sum(count for _, count in board.histogram()) == len(scores)
+    assert board.strategy_popularity() == [("Behavioral Activation Program", len(scores))]
+
+
+def test_histogram_folds_perfect_score_into_last_bin():
+    board = game.Leaderboard()
+    for team_name, score in (("A", 0.0), ("B", 95.0), ("C", 100.0)):
+        board.submit(team_name, {"final_uec_score": score})
+    
+    histogram = board.histogram()
+    assert [label for label, _ in histogram] == [f"{low}-{low + 10}" for low in range(0, 100, 10)]
+    assert histogram[0] == ("0-10", 1)
+    assert histogram[-1] == ("90-100", 2)
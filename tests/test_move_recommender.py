@@ -0,0 +1,98 @@
+import copy
+
+import numpy as np
+import pytest
+
+import urban_pulse_game as game
+
+COMMUNITY_GARDENS = {
+    "Strategy": "Community Gardens Network",
+    "Subsystems": ["Human-Social", "Spatial"],
+    "Actions": ["Allotments", "Seed library", "Garden volunteers"],
+    "Custom": True
+}
+
+
+def _apply(plan, zone, strategy=None, actions=()):
+    changed = copy.deepcopy(plan)
+    zone_data = changed.setdefault(zone, {"strategies": [], "actions": []})
+    if strategy is not None:
+        zone_data["strategies"].append(strategy)
+    zone_data["actions"].extend(action for action in actions if action not in zone_data["actions"])
+    return changed
+
+
+def _engine_uec(calculator, plan):
+    return game.calculate_normalized_uec_score(calculator.calculate_multi_zone_effects(plan, 1, compiled=False))["overall_uec"]
+
+
+def _plans():
+    behavioral, green = game.STRATEGIES[0], game.STRATEGIES[1]
+    yield {}
+    yield {"poor_areas": {"strategies": [green["Strategy"]], "actions": green["Actions"][:1]}}
+    yield {
+        "poor_areas": {"strategies": [green["Strategy"]], "actions": green["Actions"][:1]},
+        "middle_class": {"strategies": [behavioral["Strategy"], COMMUNITY_GARDENS["Strategy"]], "actions": ["Allotments"]},
+        "city_center": {"strategies": [game.STRATEGIES[4]["Strategy"]], "actions": game.STRATEGIES[4]["Actions"]}
+    }
+
+
+@pytest.fixture
+def calculator(session):
+    session.custom_strategies = {COMMUNITY_GARDENS["Strategy"]: COMMUNITY_GARDENS}
+    return game.SpatialEffectsCalculator()
+
+
+@pytest.mark.parametrize("plan_index", range(3))
+def test_strategy_gains_match_a_fresh_engine_run(calculator, plan_index):
+    plan = list(_plans())[plan_index]
+    effects = calculator.calculate_multi_zone_effects(plan, 1) if plan else None
+    gains = game.MoveRecommender(calculator).strategy_gains(plan, effects)
+    
+    assert gains["strategies"][-1] == COMMUNITY_GARDENS["Strategy"]
+    assert gains["current_uec"] == pytest.approx(_engine_uec(calculator, plan) if plan else 0.0, abs=1e-9)
+    for z, zone in enumerate(calculator.spatial_index.zone_ids):
+        for s, name in enumerate(gains["strategies"]):
+            if name in plan.get(zone, {}).get("strategies", []):
+                assert np.isnan(gains["gains"][z, s])
+                continue
+            projected = gains["current_uec"] + gains["gains"][z, s]
+            changed = _apply(plan, zone, name, gains["strategy_actions"][s])
+            assert projected == pytest.approx(_engine_uec(calculator, changed), rel=1e-9, abs=1e-9), (zone, name)
+
+
+@pytest.mark.parametrize("plan_index", range(3))
+def test_recommended_moves_project_the_engine_uec(calculator, plan_index):
+    plan = list(_plans())[plan_index]
+    effects = calculator.calculate_multi_zone_effects(plan, 1) if plan else None
+    recommender = game.MoveRecommender(calculator)
+    gains = recommender.strategy_gains(plan, effects)
+    moves = recommender.recommend(plan, effects, top_n=1000)
+    
+    assert moves
+    assert [move["uec_gain"] for move in moves] == sorted((move["uec_gain"] for move in moves), reverse=True)
+    for move in moves:
+        if move["move"] == "Add action":
+            changed = _apply(plan, move["zone"], actions=[move["action"]])
+        else:
+            assert (move["move"] == "Add zone") == (move["zone"] not in plan)
+            strategy_actions = gains["strategy_actions"][gains["strategies"].index(move["strategy"])]
+            changed = _apply(plan, move["zone"], move["strategy"], strategy_actions)
+        assert move["projected_uec"] == pytest.approx(_engine_uec(calculator, changed), rel=1e-9, abs=1e-9), move
+
+
+def test_strategy_gains_on_a_synthetic_city(session):
+    zones, adjacency, multipliers = game.generate_synthetic_city(150, 2)
+    calculator = game.SpatialEffectsCalculator(zones, adjacency, multipliers)
+    zone_ids = list(zones)
+    strategy = game.STRATEGIES[2]
+    plan = {zone: {"strategies": [strategy["Strategy"]], "actions": strategy["Actions"][:2]} for zone in zone_ids[::30]}
+    gains = game.MoveRecommender(calculator).strategy_gains(plan, calculator.calculate_multi_zone_effects(plan, 1))
+    
+    rng = np.random.default_rng(0)
+    for z in rng.choice(len(zone_ids), 12, replace=False).tolist():
+        for s in (0, 3, len(gains["strategies"]) - 1):
+            if np.isnan(gains["gains"][z, s]):
+                continue
+            changed = _apply(plan, zone_ids[z], gains["strategies"][s], gains["strategy_actions"][s])
+            assert gains["current_uec"] + gains["gains"][z, s] == pytest.approx(_engine_uec(calculator, changed), rel=1e-9, abs=1e-9)
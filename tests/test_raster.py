@@ -0,0 +1,23 @@
+import numpy as np
+
+import urban_pulse_game as game
+
+
+def _dense_self_coupling(raster, zone_index):
+    cells = np.argwhere(raster.zone_grid == zone_index)
+    weight = raster.population[cells[:, 0], cells[:, 1]]
+    weight = weight / weight.sum()
+    offsets = cells[:, None, :] - cells[None, :, :]
+    kernel = game.spillover_decay_kernel(np.hypot(offsets[..., 0], offsets[..., 1]) * raster.cell_size)
+    np.fill_diagonal(kernel, 0.0)
+    return float(weight @ kernel @ weight)
+
+
+def test_self_coupling_matches_dense_pairwise_sum():
+    zones, _, _ = game.generate_synthetic_city(200, 3)
+    for city in (game.CITY_ZONES, zones):
+        raster = game.PopulationRaster(city)
+        for zone_index in range(len(raster.zone_ids)):
+            if raster.zone_cells[zone_index] and len(np.argwhere(raster.zone_grid == zone_index)) <= 2000:
+                assert np.isclose(raster.self_coupling(zone_index), _dense_self_coupling(raster, zone_index),
+                                  rtol=1e-9, atol=1e-12)
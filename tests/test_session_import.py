@@ -0,0 +1,83 @@
+import copy
+import json
+
+import pytest
+
+import urban_pulse_game as game
+
+COOLING_PROGRAM = {
+    "Strategy": "Neighbourhood Cooling Program",
+    "Description": "Shade and cool-roof retrofits",
+    "Subsystems": ["Thermal", "Spatial"],
+    "Actions": ["Cool roofs", "Street trees"],
+    "Custom": True
+}
+
+
+def _save_round(manager, round_number, zones):
+    manager.selected_zones = copy.deepcopy(zones)
+    manager.current_round = round_number
+    manager.round_history[round_number] = {
+        "effects": manager.calculate_round_effects(),
+        "zones": copy.deepcopy(zones),
+        "timestamp": f"2026-01-0{round_number}T12:00:00"
+    }
+
+
+def _played_session(session, zones_by_round):
+    session.custom_strategies = {COOLING_PROGRAM["Strategy"]: copy.deepcopy(COOLING_PROGRAM)}
+    manager = session.game_manager
+    for round_number, zones in zones_by_round.items():
+        _save_round(manager, round_number, zones)
+    session.current_round = max(zones_by_round)
+    return json.dumps(game.build_all_rounds_export(), default=str)
+
+
+def test_all_rounds_round_trip_recomputes_with_restored_custom_strategies(session):
+    exported = _played_session(session, {
+        1: {"city_center": {"strategies": ["Behavioral Activation Program"], "actions": ["Workshops", "Campaign"]}},
+        2: {
+            "city_center": {"strategies": [COOLING_PROGRAM["Strategy"]], "actions": ["Cool roofs"]},
+            "poor_areas": {"strategies": ["Green Infrastructure Expansion", COOLING_PROGRAM["Strategy"]], "actions": ["Parks"]}
+        }
+    })
+    original = {round_number: data["effects"] for round_number, data in session.game_manager.round_history.items()}
+    
+    manager, restored = game.import_session(exported)
+    
+    assert restored["custom_strategies"] == {COOLING_PROGRAM["Strategy"]: COOLING_PROGRAM}
+    assert sorted(manager.round_history) == [1, 2]
+    
+    # The live session no longer knows the custom strategy; restored rounds must not depend on it
+    session.custom_strategies = {}
+    for round_number, effects in original.items():
+        record = manager.round_history[round_number]
+        assert "effects" not in record.keys()
+        assert game.calculate_normalized_uec_score(record["effects"]) == game.calculate_normalized_uec_score(effects)
+        assert record["effects"]["total_city_impact"] == effects["total_city_impact"]
+
+
+def test_round_without_configured_zones_is_skipped(session):
+    exported = _played_session(session, {
+        1: {"city_center": {"strategies": ["Behavioral Activation Program"], "actions": ["Workshops"]}},
+        2: {"periphery": {"strategies": [], "actions": []}},
+        3: {}
+    })
+    
+    manager, restored = game.import_session(exported)
+    game.apply_restored_session(manager, restored)
+    
+    assert manager.round_history[2]["effects"] is None
+    assert manager.round_history[3]["effects"] is None
+    
+    rounds_effects = game.collect_rounds_effects(None)
+    assert sorted(rounds_effects) == [1]
+    
+    tables = game.load_effects_columnar(game.export_effects_columnar(rounds_effects))
+    assert tables["meta"]["rounds"] == [1]
+    assert set(tables["direct_effects"]["round"]) == {1}
+
+
+def test_unreadable_session_raises_import_error():
+    with pytest.raises(game.SessionImportError):
+        game.import_session("not json")
@@ -0,0 +1,27 @@
+import gc
+import json
+import time
+
+import urban_pulse_bench as bench
+import urban_pulse_game as game
+
+
+def test_sharded_evaluation_matches_engine_and_releases_workers(session):
+    zones, adjacency, multipliers = game.generate_synthetic_city(300, 5)
+    calculator = game.SpatialEffectsCalculator(zones, adjacency, multipliers, spillover_mode="exact", spillover_epsilon=0.01)
+    zone_actions = bench.build_zone_actions(zones, 5)
+    
+    evaluator = game.ShardedEffectsEvaluator(calculator, workers=2)
+    sharded = evaluator.calculate_multi_zone_effects(zone_actions, 2)
+    reference = calculator.calculate_multi_zone_effects(zone_actions, 2, compiled=False)
+    assert json.dumps(sharded, default=str) == json.dumps(reference, default=str)
+    
+    # Dropping the evaluator (as a pool cache eviction does) shuts its workers down
+    workers = list(evaluator.executor._processes.values())
+    assert workers
+    del evaluator
+    gc.collect()
+    deadline = time.monotonic() + 10
+    while any(worker.is_alive() for worker in workers) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not any(worker.is_alive() for worker in workers)
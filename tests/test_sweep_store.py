@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+import urban_pulse_game as game
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Store with small blocks and scores drifting across them, so pruning has work to do"""
+    monkeypatch.setattr(game, "SWEEP_STORE_BLOCK_ROWS", 256)
+    rng = np.random.default_rng(3)
+    rows = 256 * 40 + 77
+    drift = np.linspace(0, 60, rows)
+    columns = {
+        "scenario_id": np.arange(rows),
+        # Rounded to force ties across blocks
+        "overall_uec": np.round(drift + rng.uniform(0, 40, rows), 1),
+        "human_social": rng.uniform(0, 10, rows),
+        "spatial": rng.uniform(0, 10, rows),
+        "air_soundscape": rng.uniform(0, 10, rows),
+        "thermal": np.round(rng.uniform(0, 10, rows), 0),
+        "loop_activations": rng.integers(0, 30, rows),
+        "unique_loops": rng.integers(0, 15, rows)
+    }
+    with game.SweepResultStore(str(tmp_path / "sweep")) as writer:
+        # Two appends, the second one ending in a partial block
+        writer.append_batch({column: values[:5000] for column, values in columns.items()})
+        writer.append_batch({column: values[5000:] for column, values in columns.items()})
+    reader = game.SweepResultStore(str(tmp_path / "sweep"), mode="r")
+    yield reader, columns
+    reader.close()
+
+
+def _brute_force_top(columns, n, by, where, ascending):
+    mask = np.ones(len(columns[by]), dtype=bool)
+    for column, (low, high) in (where or {}).items():
+        values = columns[column].astype(game.SWEEP_STORE_COLUMNS[column])
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+    rows = np.flatnonzero(mask)
+    keys = (1.0 if ascending else -1.0) * columns[by].astype(game.SWEEP_STORE_COLUMNS[by])[rows].astype(np.float64)
+    return rows[np.lexsort((rows, keys))][:n]
+
+
+@pytest.mark.parametrize("n", [0, 1, 10, 300, 20000])
+@pytest.mark.parametrize("by,where,ascending", [
+    ("overall_uec", None, False),
+    ("overall_uec", None, True),
+    ("thermal", None, False),
+    ("overall_uec", {"thermal": (3, 6)}, False),
+    ("loop_activations", {"overall_uec": (None, 45.0), "unique_loops": (5, None)}, True),
+    ("overall_uec", {"overall_uec": (200.0, None)}, False)
+])
+def test_top_n_matches_brute_force(store, n, by, where, ascending):
+    reader, columns = store
+    top = reader.top_n(n, by=by, where=where, ascending=ascending)
+    assert top.index.tolist() == _brute_force_top(columns, n, by, where, ascending).tolist()
+
+
+def test_top_n_skips_blocks_that_cannot_qualify(store, monkeypatch):
+    reader, columns = store
+    scanned = []
+    block_mask = reader._block_mask
+    monkeypatch.setattr(reader, "_block_mask", lambda start, stop, where: scanned.append(start) or block_mask(start, stop, where))
+    
+    top = reader.top_n(10)
+    
+    assert top.index.tolist() == _brute_force_top(columns, 10, "overall_uec", None, False).tolist()
+    assert 0 < len(scanned) < len(reader.blocks["overall_uec"]) // 2
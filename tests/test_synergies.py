@@ -0,0 +1,71 @@
+import math
+import random
+
+import urban_pulse_game as game
+
+
+def _reference_synergies(calculator, zone_base_effects):
+    """The original pairwise double loop"""
+    synergies = {}
+    zones = list(zone_base_effects)
+    for i, zone1 in enumerate(zones):
+        for zone2 in zones[i + 1:]:
+            synergy_score = 0
+            for subsystem in game.SUBSYSTEMS:
+                effect1 = zone_base_effects[zone1].get(subsystem, 0)
+                effect2 = zone_base_effects[zone2].get(subsystem, 0)
+                if effect1 > 0 and effect2 > 0:
+                    synergy_score += math.sqrt(effect1 * effect2) * 0.3
+            distance = calculator.calculate_euclidean_distance(zone1, zone2)
+            synergies[f"{zone1}-{zone2}"] = {
+                "synergy_score": synergy_score * (1.0 / (1.0 + distance * 0.1)),
+                "distance": distance,
+                "zones": [zone1, zone2]
+            }
+    return synergies
+
+
+def _random_effects(zones, seed):
+    rng = random.Random(seed)
+    # Zero and negative effects must not contribute to a pair's synergy
+    return {
+        zone_id: {subsystem: rng.choice([0, -rng.uniform(0, 2), rng.uniform(0, 5), rng.uniform(0, 5)])
+                  for subsystem in game.SUBSYSTEMS}
+        for zone_id in zones
+    }
+
+
+def test_vectorized_synergies_match_reference_loop(monkeypatch):
+    # Small blocks so the pairs are scored across several row blocks
+    monkeypatch.setattr(game, "SYNERGY_PAIR_CHUNK", 500)
+    zones, adjacency, multipliers = game.generate_synthetic_city(120, 3)
+    calculator = game.SpatialEffectsCalculator(zones, adjacency, multipliers, synergy_top_k=0)
+    zone_base_effects = _random_effects(zones, seed=11)
+    
+    synergies = calculator._calculate_cross_zone_synergies(dict.fromkeys(zones, []), zone_base_effects)
+    assert synergies == _reference_synergies(calculator, zone_base_effects)
+
+
+def test_top_k_keeps_strongest_pairs_and_preserves_total(monkeypatch):
+    monkeypatch.setattr(game, "SYNERGY_PAIR_CHUNK", 500)
+    zones, adjacency, multipliers = game.generate_synthetic_city(120, 3)
+    zone_base_effects = _random_effects(zones, seed=12)
+    full = game.SpatialEffectsCalculator(zones, adjacency, multipliers, synergy_top_k=0)._calculate_cross_zone_synergies(
+        dict.fromkeys(zones, []), zone_base_effects
+    )
+    
+    top_k = 25
+    pruned = game.SpatialEffectsCalculator(zones, adjacency, multipliers, synergy_top_k=top_k)._calculate_cross_zone_synergies(
+        dict.fromkeys(zones, []), zone_base_effects
+    )
+    aggregate = pruned.pop(game.SYNERGY_AGGREGATE_KEY)
+    
+    assert len(pruned) == top_k
+    assert aggregate["pair_count"] == len(full) - top_k
+    assert all(pruned[key] == full[key] for key in pruned)
+    weakest_kept = min(entry["synergy_score"] for entry in pruned.values())
+    assert all(entry["synergy_score"] <= weakest_kept for key, entry in full.items() if key not in pruned)
+    
+    total = sum(entry["synergy_score"] for entry in full.values())
+    assert math.isclose(aggregate["synergy_score"] + sum(entry["synergy_score"] for entry in pruned.values()), total,
+                        rel_tol=1e-12)
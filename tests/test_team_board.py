@@ -0,0 +1,55 @@
+import urban_pulse_game as game
+
+
+def _summary(uec_score, updated_at):
+    return {'team': "A", 'game': "G", 'uec_score': uec_score, 'updated_at': updated_at}
+
+
+def test_publish_ignores_timestamp_only_changes():
+    board = game.TeamStateBoard()
+    first = board.publish("G", "A", _summary(40.0, "10:00:00"), now=0)
+    
+    assert board.publish("G", "A", _summary(40.0, "10:00:05"), now=5) == first
+    assert board.changes_since(first, now=5) == (first, [], False)
+    assert board.publish("G", "A", _summary(42.5, "10:00:09"), now=9) == first + 1
+
+
+def test_idle_teams_expire_then_are_forgotten():
+    board = game.TeamStateBoard(stale_minutes=1)
+    board.publish("G", "A", _summary(40.0, "10:00:00"), now=0)
+    board.publish("G", "B", _summary(55.0, "10:00:00"), now=0)
+    cursor, changes, reset = board.changes_since(0, now=1)
+    assert [key for key, _ in changes] == [("G", "A"), ("G", "B")] and not reset
+    
+    # B keeps publishing (unchanged), A goes quiet
+    board.publish("G", "B", _summary(55.0, "10:00:50"), now=50)
+    cursor, changes, reset = board.changes_since(cursor, now=70)
+    assert changes == [(("G", "A"), None)] and not reset
+    assert board.games() == ["G"]
+    
+    # Once the expiry itself is older than the window, old cursors must replay
+    stale_cursor = 2
+    board.publish("G", "B", _summary(55.0, "10:02:00"), now=120)
+    cursor, changes, reset = board.changes_since(stale_cursor, now=140)
+    assert reset
+    assert changes == [(("G", "B"), _summary(55.0, "10:00:00"))]
+    
+    # A returning team rejoins the feed
+    board.publish("G", "A", _summary(41.0, "10:03:00"), now=150)
+    _, changes, _ = board.changes_since(cursor, now=151)
+    assert changes == [(("G", "A"), _summary(41.0, "10:03:00"))]
+
+
+def test_touch_keeps_idle_team_alive_without_a_new_version():
+    board = game.TeamStateBoard(stale_minutes=1)
+    assert not board.touch("G", "A", now=0)
+    cursor = board.publish("G", "A", _summary(40.0, "10:00:00"), now=0)
+    
+    for now in (40, 80, 120):
+        assert board.touch("G", "A", now=now)
+    assert board.changes_since(cursor, now=150) == (cursor, [], False)
+    
+    # Without a heartbeat the team expires, and touching it no longer revives it
+    _, changes, _ = board.changes_since(cursor, now=200)
+    assert changes == [(("G", "A"), None)]
+    assert not board.touch("G", "A", now=201)
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Urban Pulse - Engine Benchmark Suite
+Micro benchmarks for the calculation engine and macro benchmarks for report generation,
+run against the stock 11-zone city and generated 100/1k/10k-zone cities
+
+Usage:
+    python urban_pulse_bench.py run --output bench_baseline.json
+    python urban_pulse_bench.py compare bench_baseline.json bench_current.json --tolerance 0.15
+"""
+
+import argparse
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import streamlit as st
+
+import urban_pulse_game as game
+
+BENCH_SCHEMA_VERSION = 1
+DEFAULT_SIZES = [100, 1000, 10000]
+DEFAULT_TOLERANCE = 0.15
+DEFAULT_MIN_REPEATS = 5
+DEFAULT_TARGET_SECONDS = 0.2  # Per repeat; fast cases are looped until a repeat takes this long
+ACTIVE_ZONES = 11  # Zones a team configures, whatever the size of the city
+DISTANCE_PAIRS = 1000
+KEYWORD_TEXTS = [
+    "Community engagement program with walking groups and local events",
+    "Green corridors, tree planting and shade structures to cool streets",
+    "Noise barriers and air quality monitoring near busy roads",
+    "Mixed-use redevelopment of vacant plots with better street connectivity",
+    "Smart sensors and digital platforms for neighbourhood data",
+    "A brand new approach nobody has categorised yet",
+]
+REPORT_TYPE = "📋 Complete Game Report"
+
+# SCENARIOS
+def build_zone_actions(zone_ids, seed=0):
+    """Seeded team configuration over a subset of zones"""
+    rng = random.Random(seed)
+    strategy_names = [strategy["Strategy"] for strategy in game.STRATEGIES]
+    chosen = rng.sample(list(zone_ids), min(ACTIVE_ZONES, len(zone_ids)))
+    
+    return {
+        zone_id: {
+            "strategies": rng.sample(strategy_names, rng.randint(1, 3)),
+            "actions": [f"Action {n}" for n in range(rng.randint(1, 5))]
+        }
+        for zone_id in chosen
+    }
+
+# TIMING
+def measure(func, min_repeats=DEFAULT_MIN_REPEATS, target_seconds=DEFAULT_TARGET_SECONDS):
+    """Per-call timings in microseconds: calls are batched so each repeat lasts about target_seconds"""
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= target_seconds or number >= 1 << 20:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(target_seconds / elapsed) + 1))
+    
+    samples = [elapsed / number]
+    for _ in range(min_repeats - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - started) / number)
+    
+    samples_us = [sample * 1e6 for sample in samples]
+    return {
+        "median_us": statistics.median(samples_us),
+        "min_us": min(samples_us),
+        "mean_us": statistics.fmean(samples_us),
+        "stdev_us": statistics.stdev(samples_us) if len(samples_us) > 1 else 0.0,
+        "calls_per_repeat": number,
+        "repeats": len(samples_us)
+    }
+
+def _prepare_session(manager):
+    """Report helpers read the team context from session state"""
+    st.session_state.custom_strategies = {}
+    st.session_state.game_manager = manager
+    st.session_state.team_name = "Benchmark Team"
+    st.session_state.game_name = "Benchmark"
+    st.session_state.current_round = 1
+
+# BENCHMARK CASES
+def iter_city_cases(label, calculator, seed, shard_workers=0):
+    """(name, callable, calls per invocation) for the engine functions on one city"""
+    zone_ids = list(calculator.zones)
+    rng = random.Random(seed)
+    pairs = [tuple(rng.sample(zone_ids, 2)) for _ in range(DISTANCE_PAIRS)]
+    zone_actions = build_zone_actions(zone_ids, seed)
+    subsystem_sets = [calculator._get_subsystems_from_strategies(data["strategies"]) for data in zone_actions.values()]
+    effects = calculator.calculate_multi_zone_effects(zone_actions, 1)
+    
+    def distance_batch():
+        for zone1, zone2 in pairs:
+            calculator.calculate_euclidean_distance(zone1, zone2)
+    
+    def activation_batch():
+        for subsystems in subsystem_sets:
+            calculator.calculate_loop_activation_score(["a", "b"], subsystems)
+    
+    yield f"calculate_euclidean_distance[{label}]", distance_batch, len(pairs)
+    yield f"calculate_loop_activation_score[{label}]", activation_batch, len(subsystem_sets)
+    yield f"calculate_multi_zone_effects[{label}]", lambda: calculator.calculate_multi_zone_effects(zone_actions, 1), 1
+    tables = calculator.compiled_tables
+    if tables is not None:
+        yield (f"calculate_multi_zone_effects[{label},reference]",
+               lambda: calculator.calculate_multi_zone_effects(zone_actions, 1, compiled=False), 1)
+        positions = [tables.zone_position[zone] for zone in zone_actions]
+        masks = [tables.strategy_mask(data["strategies"]) for data in zone_actions.values()]
+        counts = [len(data["actions"]) for data in zone_actions.values()]
+        yield f"score_zones[{label},compiled]", lambda: tables.score_zones(positions, masks, counts), len(positions)
+    yield f"calculate_normalized_uec_score[{label}]", lambda: game.calculate_normalized_uec_score(effects), 1
+    recommender = game.get_move_recommender(calculator)
+    yield f"recommend_moves[{label}]", lambda: recommender.recommend(zone_actions, effects), 1
+    if shard_workers > 1 and calculator.spillover_mode == "exact":
+        evaluator = game.get_sharded_evaluator(calculator, shard_workers)
+        yield (f"calculate_multi_zone_effects[{label},sharded]",
+               lambda: evaluator.calculate_multi_zone_effects(zone_actions, 1), 1)
+
+def iter_stock_only_cases(seed):
+    """City-independent cases and the report pipeline, which is tied to the stock zones"""
+    def keyword_batch():
+        for text in KEYWORD_TEXTS:
+            game.analyze_keywords_for_subsystem(text)
+    
+    yield "analyze_keywords_for_subsystem[stock]", keyword_batch, len(KEYWORD_TEXTS)
+    
+    manager = game.MultiZoneGameManager()
+    for zone_id, zone_data in build_zone_actions(game.CITY_ZONES, seed).items():
+        manager.add_zone_selection(zone_id, zone_data["strategies"], zone_data["actions"])
+    _prepare_session(manager)
+    effects = manager.calculate_round_effects()
+    
+    def report_cold():
+        game._report_cache.clear()
+        game.generate_report(REPORT_TYPE, effects)
+    
+    yield "generate_report[stock,cold]", report_cold, 1
+    yield "generate_report[stock,cached]", lambda: game.generate_report(REPORT_TYPE, effects), 1
+
+def run_benchmarks(sizes, seed=0, min_repeats=DEFAULT_MIN_REPEATS, target_seconds=DEFAULT_TARGET_SECONDS, pattern=None,
+                   spillover_epsilon=0.0, spillover_mode="exact", spillover_theta=game.SPILLOVER_THETA,
+                   spillover_alpha=game.SPILLOVER_ALPHA, shard_workers=0, synergy_top_k=0, compiled_scoring=True):
+    """Run every case and return a baseline document"""
+    st.session_state.custom_strategies = {}
+    
+    spillover = {"spillover_epsilon": spillover_epsilon, "spillover_mode": spillover_mode, "spillover_theta": spillover_theta,
+                 "spillover_alpha": spillover_alpha, "synergy_top_k": synergy_top_k, "compiled_scoring": compiled_scoring}
+    cities = [("stock", game.SpatialEffectsCalculator(**spillover))]
+    for size in sizes:
+        zones, adjacency, multipliers = game.generate_synthetic_city(size, seed)
+        calculator = game.SpatialEffectsCalculator(zones, adjacency, multipliers, **spillover)
+        cities.append((f"synthetic-{size}", calculator))
+    
+    cases = []
+    for label, calculator in cities:
+        cases.extend(iter_city_cases(label, calculator, seed, shard_workers))
+    cases.extend(iter_stock_only_cases(seed))
+    
+    results = {}
+    for name, func, batch in cases:
+        if pattern and pattern not in name:
+            continue
+        timing = measure(func, min_repeats, target_seconds)
+        for key in ("median_us", "min_us", "mean_us", "stdev_us"):
+            timing[key] /= batch
+        timing["batch"] = batch
+        results[name] = timing
+        print(f"{name:<55} {format_duration(timing['median_us']):>12}", flush=True)
+    
+    return {
+        "schema_version": BENCH_SCHEMA_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform()
+        },
+        "settings": {"sizes": sizes, "seed": seed, "active_zones": ACTIVE_ZONES, "shard_workers": shard_workers, **spillover},
+        "results": results
+    }
+
+# COMPARISON
+def format_duration(microseconds):
+    if microseconds >= 1e6:
+        return f"{microseconds / 1e6:.2f} s"
+    if microseconds >= 1e3:
+        return f"{microseconds / 1e3:.2f} ms"
+    return f"{microseconds:.2f} µs"
+
+def compare_results(baseline, current, tolerance=DEFAULT_TOLERANCE):
+    """Rows of (name, baseline_us, current_us, ratio, status) comparing medians"""
+    rows = []
+    for name in sorted(set(baseline["results"]) | set(current["results"])):
+        base = baseline["results"].get(name)
+        now = current["results"].get(name)
+        if base is None or now is None:
+            rows.append((name, base and base["median_us"], now and now["median_us"], None, "missing"))
+            continue
+        
+        ratio = now["median_us"] / base["median_us"] if base["median_us"] else math.inf
+        if ratio > 1 + tolerance:
+            status = "REGRESSION"
+        elif ratio < 1 / (1 + tolerance):
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append((name, base["median_us"], now["median_us"], ratio, status))
+    
+    return rows
+
+def print_comparison(rows):
+    print(f"{'benchmark':<55} {'baseline':>12} {'current':>12} {'ratio':>8}  status")
+    for name, base, now, ratio, status in rows:
+        base_text = format_duration(base) if base is not None else "—"
+        now_text = format_duration(now) if now is not None else "—"
+        ratio_text = f"{ratio:.2f}x" if ratio is not None else "—"
+        print(f"{name:<55} {base_text:>12} {now_text:>12} {ratio_text:>8}  {status}")
+
+def load_baseline(path):
+    with open(path, "r", encoding="utf-8") as handle:
+        document = json.load(handle)
+    if document.get("schema_version") != BENCH_SCHEMA_VERSION:
+        raise ValueError(f"{path}: unsupported benchmark schema version {document.get('schema_version')}")
+    return document
+
+# COMMAND LINE
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Urban Pulse engine benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    run_parser = subparsers.add_parser("run", help="Run the suite and write a JSON baseline")
+    run_parser.add_argument("--output", "-o", help="Baseline file to write")
+    run_parser.add_argument("--sizes", type=int, nargs="*", default=DEFAULT_SIZES, help="Synthetic city sizes")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--repeats", type=int, default=DEFAULT_MIN_REPEATS)
+    run_parser.add_argument("--target-seconds", type=float, default=DEFAULT_TARGET_SECONDS)
+    run_parser.add_argument("--filter", help="Only run benchmarks whose name contains this text")
+    run_parser.add_argument("--spillover-epsilon", type=float, default=0.0, help="Spillover cutoff (0 = exact)")
+    run_parser.add_argument("--spillover-mode", choices=["exact", "barnes_hut", "raster", "network"], default="exact")
+    run_parser.add_argument("--spillover-theta", type=float, default=game.SPILLOVER_THETA, help="Barnes-Hut opening angle")
+    run_parser.add_argument("--spillover-alpha", type=float, default=game.SPILLOVER_ALPHA, help="Network mode hop damping")
+    run_parser.add_argument("--shard-workers", type=int, default=0, help="Also time sharded evaluation with this many processes")
+    run_parser.add_argument("--synergy-top-k", type=int, default=0, help="Keep only the k strongest synergy pairs (0 = all)")
+    run_parser.add_argument("--no-compiled", action="store_true", help="Time the reference engine instead of compiled scoring")
+    run_parser.add_argument("--compare", help="Baseline to compare against after running")
+    run_parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    
+    compare_parser = subparsers.add_parser("compare", help="Compare two baselines and flag regressions")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                                help="Allowed slowdown as a fraction of the baseline median (default 0.15)")
+    
+    args = parser.parse_args(argv)
+    
+    if args.command == "run":
+        document = run_benchmarks(args.sizes, args.seed, args.repeats, args.target_seconds, args.filter,
+                                  args.spillover_epsilon, args.spillover_mode, args.spillover_theta, args.spillover_alpha,
+                                  args.shard_workers, args.synergy_top_k, not args.no_compiled)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as handle:
+                json.dump(document, handle, indent=2)
+            print(f"Baseline written to {args.output}")
+        if not args.compare:
+            return 0
+        baseline, current = load_baseline(args.compare), document
+    else:
+        baseline, current = load_baseline(args.baseline), load_baseline(args.current)
+    
+    rows = compare_results(baseline, current, args.tolerance)
+    print_comparison(rows)
+    regressions = [row for row in rows if row[4] == "REGRESSION"]
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
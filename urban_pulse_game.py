@@ -15,9 +15,31 @@ from plotly.subplots import make_subplots
 import networkx as nx
 from datetime import datetime
 import json
+import logging.handlers
 import math
 import copy
 import base64
+import bisect
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import http.server
+import io
+import multiprocessing
+import os
+import queue
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import types
+import weakref
+import zlib
+from collections import OrderedDict, deque
 from io import BytesIO
 import zipfile
 
@@ -334,6 +356,8 @@ ACTION_SUGGESTIONS = {
     "technology": ["Smart Systems", "Digital Platforms", "Monitoring Networks", "Data Analytics"]
 }
 
+SUBSYSTEMS = ["Human-Social", "Spatial", "Air-Soundscape", "Thermal"]
+
 ZONE_STRATEGY_MULTIPLIERS = {
     "Human-Social": {
         "city_center": 1.4, "commercial_district": 0.9, "rich_residential": 0.8, "middle_class": 1.2,
@@ -371,6 +395,10 @@ ZONE_ADJACENCY = {
     "periphery": ["poor_areas", "formal_slums"]
 }
 
+PRIORITY_MULTIPLIERS = {
+    "Emergency": 2.2, "Critical": 1.8, "High": 1.5, "Medium": 1.0, "Low": 0.8
+}
+
 SCIENTIFIC_LOOP_DATA = {
     1: {"type": "R", "variables": ["Active attendance level in open/public spaces", "Active mobility tendency and usage"], 
         "identity": "Pure Human-Social", "purity_score": 1.000, "integration_rate": 0.147, "system_influence": 0.735, 
@@ -457,14 +485,1600 @@ def init_session_state():
         st.session_state.current_round = 1
     if 'custom_strategies' not in st.session_state:
         st.session_state.custom_strategies = {}
+    if 'resume_checked' not in st.session_state:
+        # A reconnecting browser keeps its URL: reload that team's saved state once
+        st.session_state.resume_checked = True
+        game_id, team_id = recall_session_identity()
+        if team_id and not st.session_state.team_name:
+            try:
+                resume_session_from_store(game_id, team_id)
+            except SessionImportError as exc:
+                # A corrupt or outdated snapshot must not block the app: start a fresh session
+                st.error(f"Could not resume saved session: {exc}")
+
+def remember_session_identity(game_id, team_id):
+    """Keep game/team in the URL so a reconnecting browser can resume its saved session"""
+    st.query_params["game"] = game_id
+    st.query_params["team"] = team_id
+
+def recall_session_identity():
+    return st.query_params.get("game", ""), st.query_params.get("team", "")
+
+def forget_session_identity():
+    st.query_params.clear()
+
+# SHARED CACHES
+class LRUCache:
+    """Thread-safe least-recently-used map, shared by every session through an st.cache_resource getter
+    
+    Streamlit runs this script in a fresh namespace on every rerun, so a cache kept in a
+    module global would start empty each time.
+    """
+    
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._items)
+    
+    def get(self, key):
+        """Cached value (marked most recently used), or None"""
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+    
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+# RENDER PROFILING
+PROFILING_AVAILABLE = os.environ.get("URBAN_PULSE_PROFILE", "") not in ("", "0")
+PROFILE_LOG_PATH = os.environ.get("URBAN_PULSE_PROFILE_LOG", "urban_pulse_profile.log")
+PROFILE_LOG_MAX_RECORDS = 5000
+PROFILE_LOG_MAX_BYTES = PROFILE_LOG_MAX_RECORDS * 4096  # Log file rotates at this size, keeping one backup
+PROFILE_CATEGORY_COLORS = {
+    "page": "#1f77b4", "section": "#aec7e8", "engine": "#d62728",
+    "report": "#9467bd", "chart": "#2ca02c", "dataframe": "#ff7f0e", "render": "#17becf"
+}
+
+class ProfileStore:
+    """Process-wide profiler state: the per-thread active profile and the recent rerun records"""
+    
+    def __init__(self, max_records=PROFILE_LOG_MAX_RECORDS):
+        self.local = threading.local()
+        self._records = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+    
+    def append(self, record):
+        with self._lock:
+            self._records.append(record)
+            get_profile_logger().info(json.dumps(record, ensure_ascii=False))
+    
+    def snapshot(self):
+        with self._lock:
+            return list(self._records)
+
+@st.cache_resource
+def get_profile_store():
+    """Profiler state that survives reruns, so percentiles cover more than the current one"""
+    return ProfileStore()
+
+class RenderProfile:
+    """Spans recorded during one script rerun, offsets relative to its start"""
+    
+    def __init__(self, page):
+        self.page = page
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.spans = []
+        self._depth = 0
+    
+    @contextlib.contextmanager
+    def span(self, name, category):
+        start = time.perf_counter()
+        record = [name, category, start - self.started, 0.0, self._depth]
+        self.spans.append(record)
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            record[3] = time.perf_counter() - start
+    
+    def to_record(self):
+        return {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "page": self.page,
+            "total_ms": round(self.total * 1000, 3),
+            "spans": [[name, category, round(start * 1000, 3), round(duration * 1000, 3), depth]
+                      for name, category, start, duration, depth in self.spans]
+        }
+
+_profile_local = get_profile_store().local
+
+def profiled(category, name=None):
+    """Time calls in the active rerun's profile; a thread-local lookup when profiling is off"""
+    def decorate(func):
+        label = name or func.__qualname__
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = getattr(_profile_local, "profile", None)
+            if profile is None:
+                return func(*args, **kwargs)
+            with profile.span(label, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def start_render_profile(page):
+    profile = RenderProfile(page)
+    _profile_local.profile = profile
+    return profile
+
+def get_profile_logger():
+    """Size-capped rolling log of rerun records; the file is opened on the first record"""
+    logger = logging.getLogger("urban_pulse.profile")
+    # The logger outlives script reruns, so attach the handler only once per process
+    if not logger.handlers:
+        handler = logging.handlers.RotatingFileHandler(
+            PROFILE_LOG_PATH, maxBytes=PROFILE_LOG_MAX_BYTES, backupCount=1, encoding="utf-8", delay=True
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+def finish_render_profile(profile):
+    """Detach the profile from this thread and append it to the rolling log"""
+    _profile_local.profile = None
+    profile.total = time.perf_counter() - profile.started
+    record = profile.to_record()
+    
+    get_profile_store().append(record)
+
+def summarize_profile_records(records):
+    """Per-page rerun count with p50/p95 of total and self (non-engine, non-chart) time"""
+    by_page = {}
+    for record in records:
+        child_ms = sum(span[3] for span in record["spans"] if span[4] == 1)
+        by_page.setdefault(record["page"], []).append((record["total_ms"], child_ms))
+    
+    rows = []
+    for page, samples in by_page.items():
+        totals = np.array([total for total, _ in samples])
+        children = np.array([child for _, child in samples])
+        rows.append({
+            "Page": page,
+            "Reruns": len(samples),
+            "p50 (ms)": round(float(np.percentile(totals, 50)), 1),
+            "p95 (ms)": round(float(np.percentile(totals, 95)), 1),
+            "Instrumented p50 (ms)": round(float(np.percentile(children, 50)), 1)
+        })
+    return sorted(rows, key=lambda row: row["p95 (ms)"], reverse=True)
+
+def build_profile_waterfall_figure(record):
+    """Horizontal waterfall of one rerun's spans"""
+    spans = record["spans"]
+    labels = [f"{i:02d} {'· ' * depth}{name}" for i, (name, _, _, _, depth) in enumerate(spans)]
+    
+    fig = go.Figure(go.Bar(
+        x=[span[3] for span in spans],
+        base=[span[2] for span in spans],
+        y=labels,
+        orientation='h',
+        marker_color=[PROFILE_CATEGORY_COLORS.get(span[1], "#7f7f7f") for span in spans],
+        hovertext=[f"{span[1]}: {span[3]:.1f} ms" for span in spans],
+        hoverinfo="text"
+    ))
+    fig.update_layout(
+        height=max(200, 22 * len(spans) + 60),
+        margin=dict(l=0, r=0, t=30, b=0),
+        title=f"Rerun: {record['total_ms']:.0f} ms",
+        xaxis_title="ms",
+        yaxis=dict(autorange="reversed")
+    )
+    return fig
+
+def render_profiler_panel(profile):
+    """Sidebar debug panel: this rerun's waterfall and rolling per-page percentiles"""
+    record = profile.to_record()
+    with st.sidebar.expander("🐞 Render Profile", expanded=True):
+        if record["spans"]:
+            st.plotly_chart(build_profile_waterfall_figure(record), use_container_width=True)
+        else:
+            st.caption("No instrumented calls in this rerun.")
+        summary = summarize_profile_records(get_profile_store().snapshot())
+        st.dataframe(pd.DataFrame(summary), hide_index=True, use_container_width=True)
+        st.caption(f"Rolling log: {PROFILE_LOG_PATH}")
+
+def _instrument_streamlit_output():
+    """Time plotly serialization and Arrow conversion done inside Streamlit's output calls"""
+    # The streamlit module outlives reruns; wrap its functions once, not once per rerun
+    for name in ("plotly_chart", "dataframe"):
+        func = getattr(st, name)
+        if not getattr(func, "_urban_pulse_profiled", False):
+            wrapper = profiled("render", f"st.{name}")(func)
+            wrapper._urban_pulse_profiled = True
+            setattr(st, name, wrapper)
+
+if PROFILING_AVAILABLE:
+    _instrument_streamlit_output()
+
+# METRICS
+METRICS_FILE_PATH = os.environ.get("URBAN_PULSE_METRICS_FILE", "")
+METRICS_PORT = int(os.environ.get("URBAN_PULSE_METRICS_PORT", "0") or 0)
+METRICS_HOST = os.environ.get("URBAN_PULSE_METRICS_HOST", "127.0.0.1")
+METRICS_EXPORT_INTERVAL_SECONDS = 15
+ACTIVE_SESSION_WINDOW_SECONDS = 300
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ZONE_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000, 10000)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+
+def _format_sample_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def _escape_label_value(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class _ShardHolder:
+    __slots__ = ("values", "__weakref__")
+    
+    def __init__(self, width):
+        self.values = [0.0] * width
+
+class _ThreadShards:
+    """Per-thread value vectors that are summed on read, so writers never take a lock
+    
+    When a thread exits its vector is folded into a retired total.
+    """
+    
+    def __init__(self, width):
+        self._width = width
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        self._live = {}
+        self._retired = [0.0] * width
+    
+    def cell(self):
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            holder = _ShardHolder(self._width)
+            self._local.holder = holder
+            with self._lock:
+                self._live[id(holder)] = holder.values
+            weakref.finalize(holder, self._retire, id(holder))
+        return holder.values
+    
+    def _retire(self, key):
+        with self._lock:
+            values = self._live.pop(key, None)
+            if values is not None:
+                self._retired = [a + b for a, b in zip(self._retired, values)]
+    
+    def snapshot(self):
+        with self._lock:
+            shards = [self._retired] + list(self._live.values())
+        return [sum(column) for column in zip(*shards)]
+
+class _Metric:
+    kind = "untyped"
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._children_lock = threading.Lock()
+    
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._children_lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+    
+    def _default(self):
+        child = self._children.get(())
+        return child if child is not None else self.labels()
+    
+    def _label_text(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + "}"
+    
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._expose_child(key, child))
+        return lines
+
+class _CounterChild:
+    def __init__(self):
+        self._shards = _ThreadShards(1)
+    
+    def inc(self, amount=1):
+        self._shards.cell()[0] += amount
+    
+    def value(self):
+        return self._shards.snapshot()[0]
+
+class Counter(_Metric):
+    kind = "counter"
+    
+    def _new_child(self):
+        return _CounterChild()
+    
+    def inc(self, amount=1):
+        self._default().inc(amount)
+    
+    def _expose_child(self, key, child):
+        return [f"{self.name}{self._label_text(key)} {_format_sample_value(child.value())}"]
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One slot per bucket, one for +Inf, then sum and count
+        self._shards = _ThreadShards(len(buckets) + 3)
+    
+    def observe(self, value):
+        cell = self._shards.cell()
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+    
+    @contextlib.contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+    
+    def snapshot(self):
+        return self._shards.snapshot()
+
+class Histogram(_Metric):
+    kind = "histogram"
+    
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+    
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+    
+    def observe(self, value):
+        self._default().observe(value)
+    
+    def time(self):
+        return self._default().time()
+    
+    def _expose_child(self, key, child):
+        values = child.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(list(self.buckets) + ["+Inf"], values[:-2]):
+            cumulative += count
+            le = bound if bound == "+Inf" else f"{bound:g}"
+            lines.append(f"{self.name}_bucket{self._label_text(key, [('le', le)])} {_format_sample_value(cumulative)}")
+        lines.append(f"{self.name}_sum{self._label_text(key)} {_format_sample_value(values[-2])}")
+        lines.append(f"{self.name}_count{self._label_text(key)} {_format_sample_value(values[-1])}")
+        return lines
+
+class Gauge(_Metric):
+    """Gauge read from a callback at exposition time"""
+    kind = "gauge"
+    
+    def __init__(self, name, documentation, read_value):
+        super().__init__(name, documentation)
+        self.read_value = read_value
+    
+    def expose(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}",
+                f"{self.name} {_format_sample_value(self.read_value())}"]
+
+class MetricsRegistry:
+    """Metrics by name; registering a name again returns the existing metric, so every
+    rerun's module globals bind to the same process-wide series"""
+    
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+    
+    def register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+    
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+    
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+    
+    def gauge(self, name, documentation, read_value):
+        return self.register(Gauge(name, documentation, read_value))
+    
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+class ActiveSessions:
+    """Last-seen time per browser session, for the active-sessions gauge"""
+    
+    def __init__(self, window_seconds=ACTIVE_SESSION_WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self._last_seen = {}
+        self._lock = threading.Lock()
+    
+    def touch(self, session_id, now=None):
+        with self._lock:
+            self._last_seen[session_id] = time.monotonic() if now is None else now
+    
+    def count(self, now=None):
+        cutoff = (time.monotonic() if now is None else now) - self.window_seconds
+        with self._lock:
+            for session_id, last_seen in list(self._last_seen.items()):
+                if last_seen < cutoff:
+                    del self._last_seen[session_id]
+            return len(self._last_seen)
+
+@st.cache_resource
+def get_metrics_registry():
+    """Process-wide metrics registry, kept across reruns so the exporters see every update"""
+    registry = MetricsRegistry()
+    registry.gauge("urban_pulse_active_sessions", f"Sessions seen in the last {ACTIVE_SESSION_WINDOW_SECONDS} seconds",
+                   get_active_sessions().count)
+    return registry
+
+@st.cache_resource
+def get_active_sessions():
+    return ActiveSessions()
+
+def track_active_session():
+    """Mark this browser session as active for the active-sessions gauge"""
+    if '_metrics_session_id' not in st.session_state:
+        st.session_state._metrics_session_id = os.urandom(8).hex()
+    get_active_sessions().touch(st.session_state._metrics_session_id)
+
+METRICS = get_metrics_registry()
+ENGINE_LATENCY = METRICS.histogram("urban_pulse_engine_seconds", "calculate_multi_zone_effects latency")
+ENGINE_ZONES = METRICS.histogram("urban_pulse_engine_zones", "Configured zones per engine call", buckets=ZONE_COUNT_BUCKETS)
+SPILLOVER_PAIRS = METRICS.counter("urban_pulse_spillover_pairs_total", "Source/target spillover pairs evaluated")
+CACHE_REQUESTS = METRICS.counter("urban_pulse_cache_requests_total", "Cache lookups by cache and result", ("cache", "result"))
+REPORT_LATENCY = METRICS.histogram("urban_pulse_report_seconds", "Report generation time on cache misses", ("report_type",))
+EXPORT_BYTES = METRICS.histogram("urban_pulse_export_bytes", "Size of generated exports", ("format",), SIZE_BUCKETS)
+
+def write_metrics_file(path, registry):
+    """Atomically replace path with the registry's current exposition"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".metrics_", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            handle.write(registry.render())
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+class _MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+@st.cache_resource
+def start_metrics_exporters():
+    """Start the optional file writer and /metrics endpoint once per process"""
+    registry = get_metrics_registry()
+    server = None
+    if METRICS_PORT:
+        server = http.server.ThreadingHTTPServer((METRICS_HOST, METRICS_PORT), _MetricsRequestHandler)
+        server.registry = registry
+        threading.Thread(target=server.serve_forever, name="urban-pulse-metrics-http", daemon=True).start()
+    
+    if METRICS_FILE_PATH:
+        def write_loop():
+            while True:
+                try:
+                    write_metrics_file(METRICS_FILE_PATH, registry)
+                except OSError:
+                    pass
+                time.sleep(METRICS_EXPORT_INTERVAL_SECONDS)
+        
+        threading.Thread(target=write_loop, name="urban-pulse-metrics-file", daemon=True).start()
+    
+    return server
+
+# SPATIAL INDEX
+SPILLOVER_EPSILON = float(os.environ.get("URBAN_PULSE_SPILLOVER_EPSILON", "0") or 0)
+SPILLOVER_NEARBY_DISTANCE = 3.0
+# Decay per distance category: (amplitude, rate, delay rounds); multiplier = amplitude * exp(-rate * distance)
+SPILLOVER_DECAY = {
+    "adjacent": (0.7, 0.5, 1),
+    "nearby": (0.4, 0.8, 2),
+    "distant": (0.15, 1.2, 3)
+}
+SPATIAL_INDEX_ZONES_PER_CELL = 4
+
+def spillover_cutoff_radius(max_effect, epsilon):
+    """Distance beyond which no non-adjacent spillover from max_effect can reach epsilon"""
+    if epsilon <= 0:
+        return math.inf
+    
+    def reach(category):
+        amplitude, rate, _ = SPILLOVER_DECAY[category]
+        return math.log(amplitude * max_effect / epsilon) / rate if amplitude * max_effect > epsilon else 0.0
+    
+    distant_reach = reach("distant")
+    if distant_reach > SPILLOVER_NEARBY_DISTANCE:
+        return distant_reach
+    return min(reach("nearby"), SPILLOVER_NEARBY_DISTANCE)
+
+class ZoneSpatialIndex:
+    """Uniform grid over zone centers for radius queries"""
+    
+    def __init__(self, zones):
+        self.zones = zones
+        self.zone_ids = list(zones)
+        self.position = {zone_id: i for i, zone_id in enumerate(self.zone_ids)}
+        
+        corners = np.array([
+            [*zones[zone_id]["coordinates"][0], *zones[zone_id]["coordinates"][1]] for zone_id in self.zone_ids
+        ], dtype=np.float64).reshape(len(self.zone_ids), 4)
+        self.centers = np.column_stack([(corners[:, 0] + corners[:, 2]) / 2, (corners[:, 1] + corners[:, 3]) / 2])
+        
+        self.origin = self.centers.min(axis=0) if len(self.zone_ids) else np.zeros(2)
+        extent = (self.centers.max(axis=0) - self.origin) if len(self.zone_ids) else np.ones(2)
+        area = max(float(extent[0] * extent[1]), 1.0)
+        self.cell_size = max(math.sqrt(area * SPATIAL_INDEX_ZONES_PER_CELL / max(len(self.zone_ids), 1)), 1e-9)
+        
+        cells = np.floor((self.centers - self.origin) / self.cell_size).astype(np.int64)
+        self.cells = {}
+        for i, (cx, cy) in enumerate(cells.tolist()):
+            self.cells.setdefault((cx, cy), []).append(i)
+        self.cells = {cell: np.array(members, dtype=np.int64) for cell, members in self.cells.items()}
+    
+    def query(self, point, radius):
+        """Indices of zones whose centers lie within radius of point, in zone order"""
+        if not math.isfinite(radius):
+            return np.arange(len(self.zone_ids))
+        
+        low = np.floor((np.asarray(point) - radius - self.origin) / self.cell_size).astype(np.int64)
+        high = np.floor((np.asarray(point) + radius - self.origin) / self.cell_size).astype(np.int64)
+        if (high[0] - low[0] + 1) * (high[1] - low[1] + 1) > len(self.cells):
+            candidates = np.arange(len(self.zone_ids))
+        else:
+            groups = [
+                self.cells[(cx, cy)]
+                for cx in range(low[0], high[0] + 1)
+                for cy in range(low[1], high[1] + 1)
+                if (cx, cy) in self.cells
+            ]
+            if not groups:
+                return np.zeros(0, dtype=np.int64)
+            candidates = np.concatenate(groups)
+        
+        offsets = self.centers[candidates] - point
+        inside = candidates[(offsets ** 2).sum(axis=1) <= radius * radius]
+        inside.sort()
+        return inside
+    
+    def within(self, zone_id, radius, extra=()):
+        """Zone ids within radius of zone_id's center plus any extra zones, in zone order"""
+        found = self.query(self.centers[self.position[zone_id]], radius)
+        if extra:
+            found = np.union1d(found, [self.position[other] for other in extra if other in self.position])
+        return [self.zone_ids[i] for i in found.tolist()]
+
+# APPROXIMATE SPILLOVER
+SPILLOVER_MODE = os.environ.get("URBAN_PULSE_SPILLOVER_MODE", "exact")  # exact, barnes_hut, raster or network
+SPILLOVER_THETA = float(os.environ.get("URBAN_PULSE_SPILLOVER_THETA", "0.5") or 0.5)
+SPILLOVER_LEAF_SIZE = 8
+SPILLOVER_SOURCE_CHUNK = 2048  # Sources traversed together; bounds the size of the frontier arrays
+
+def spillover_decay_kernel(distance, category=None):
+    """Vectorised decay multiplier; non-adjacent (nearby/distant by distance) unless a category is given"""
+    if category is not None:
+        amplitude, rate, _ = SPILLOVER_DECAY[category]
+        return amplitude * np.exp(-rate * distance)
+    near_amplitude, near_rate, _ = SPILLOVER_DECAY["nearby"]
+    far_amplitude, far_rate, _ = SPILLOVER_DECAY["distant"]
+    return np.where(
+        distance <= SPILLOVER_NEARBY_DISTANCE,
+        near_amplitude * np.exp(-near_rate * distance),
+        far_amplitude * np.exp(-far_rate * distance)
+    )
+
+class SpilloverQuadtree:
+    """Complete quadtree over zone centers for Barnes-Hut sums of the non-adjacent decay kernel
+    
+    Level L is a 2^L x 2^L grid over the city's bounding square; every node keeps
+    its zone count and center-of-mass, and leaves index their zones CSR-style.
+    layout_version records the city layout (compute_city_version) the centers came from.
+    """
+    
+    def __init__(self, centers, leaf_size=SPILLOVER_LEAF_SIZE, layout_version=None):
+        self.centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+        self.layout_version = layout_version
+        zone_count = len(self.centers)
+        self.origin = self.centers.min(axis=0) if zone_count else np.zeros(2)
+        span = float((self.centers.max(axis=0) - self.origin).max()) if zone_count else 0.0
+        self.side = max(span, 1e-9) * (1 + 1e-9)
+        self.depth = max(0, math.ceil(math.log(max(zone_count / leaf_size, 1.0), 4)))
+        
+        resolution = 2 ** self.depth
+        self.leaf_cells = self._cells(self.centers, self.depth)
+        leaf_ids = self.leaf_cells[:, 0] * resolution + self.leaf_cells[:, 1]
+        self.leaf_order = np.argsort(leaf_ids, kind="stable")
+        self.leaf_start = np.searchsorted(leaf_ids[self.leaf_order], np.arange(resolution * resolution + 1))
+        
+        size = resolution * resolution
+        counts = np.bincount(leaf_ids, minlength=size).astype(np.float64).reshape(resolution, resolution)
+        sum_x = np.bincount(leaf_ids, weights=self.centers[:, 0], minlength=size).reshape(resolution, resolution)
+        sum_y = np.bincount(leaf_ids, weights=self.centers[:, 1], minlength=size).reshape(resolution, resolution)
+        self.counts, self.sum_x, self.sum_y = [None] * (self.depth + 1), [None] * (self.depth + 1), [None] * (self.depth + 1)
+        for level in range(self.depth, -1, -1):
+            self.counts[level], self.sum_x[level], self.sum_y[level] = counts.ravel(), sum_x.ravel(), sum_y.ravel()
+            if level:
+                half = counts.shape[0] // 2
+                counts, sum_x, sum_y = (
+                    grid.reshape(half, 2, half, 2).sum(axis=(1, 3)) for grid in (counts, sum_x, sum_y)
+                )
+    
+    def _cells(self, points, level):
+        resolution = 2 ** level
+        cells = np.floor((points - self.origin) / self.side * resolution).astype(np.int64)
+        return np.clip(cells, 0, resolution - 1)
+    
+    def kernel_sums(self, points, exclude, theta):
+        """For each point, sum of the non-adjacent kernel to every zone except exclude[i] (-1 for none)
+        
+        Nodes whose size is below theta times their distance are replaced by count x kernel(distance
+        to center of mass); the rest are opened down to leaves, which are summed exactly. Returns
+        (sums, approximated node count, exact pair count). theta = 0 gives the exact sum.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        exclude = np.asarray(exclude, dtype=np.int64).reshape(-1)
+        sums = np.zeros(len(points))
+        approximated = exact_pairs = 0
+        for start in range(0, len(points), SPILLOVER_SOURCE_CHUNK):
+            chunk = slice(start, start + SPILLOVER_SOURCE_CHUNK)
+            sums[chunk], chunk_approximated, chunk_pairs = self._chunk_kernel_sums(points[chunk], exclude[chunk], theta)
+            approximated += chunk_approximated
+            exact_pairs += chunk_pairs
+        return sums, approximated, exact_pairs
+    
+    def _chunk_kernel_sums(self, points, exclude, theta):
+        sums = np.zeros(len(points))
+        point_leaf_cells = self._cells(points, self.depth)
+        source = np.arange(len(points))
+        node = np.zeros(len(points), dtype=np.int64)
+        approximated = 0
+        
+        for level in range(self.depth + 1):
+            resolution = 2 ** level
+            count = self.counts[level][node]
+            occupied = count > 0
+            source, node, count = source[occupied], node[occupied], count[occupied]
+            
+            center_x = self.sum_x[level][node] / count
+            center_y = self.sum_y[level][node] / count
+            distance = np.hypot(points[source, 0] - center_x, points[source, 1] - center_y)
+            own_cell = point_leaf_cells[source] >> (self.depth - level)
+            contains_point = (own_cell[:, 0] * resolution + own_cell[:, 1]) == node
+            accept = (self.side / resolution < theta * distance) & ~contains_point
+            
+            sums += np.bincount(source[accept], weights=count[accept] * spillover_decay_kernel(distance[accept]),
+                                minlength=len(points))
+            approximated += int(accept.sum())
+            source, node = source[~accept], node[~accept]
+            if level == self.depth:
+                break
+            
+            node_x, node_y = np.divmod(node, resolution)
+            child_x = (2 * node_x)[:, None] + np.array([0, 0, 1, 1])
+            child_y = (2 * node_y)[:, None] + np.array([0, 1, 0, 1])
+            source = np.repeat(source, 4)
+            node = (child_x * (2 * resolution) + child_y).ravel()
+        
+        # Opened leaves: exact kernel against every member zone
+        starts, ends = self.leaf_start[node], self.leaf_start[node + 1]
+        lengths = ends - starts
+        pair_source = np.repeat(source, lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        targets = self.leaf_order[np.repeat(starts, lengths) + offsets]
+        keep = targets != exclude[pair_source]
+        pair_source, targets = pair_source[keep], targets[keep]
+        distance = np.hypot(points[pair_source, 0] - self.centers[targets, 0], points[pair_source, 1] - self.centers[targets, 1])
+        sums += np.bincount(pair_source, weights=spillover_decay_kernel(distance), minlength=len(points))
+        
+        return sums, approximated, len(targets)
+
+def compare_spillover_approximation(calculator, zone_actions_dict, round_number=1, thetas=(0.3, 0.5, 0.8)):
+    """Error of Barnes-Hut total_city_impact against the exact engine, per opening angle"""
+    exact_calculator = SpatialEffectsCalculator(calculator.zones, calculator.adjacency, calculator.zone_multipliers,
+                                                spillover_epsilon=0.0, spillover_mode="exact")
+    started = time.perf_counter()
+    exact = exact_calculator.calculate_multi_zone_effects(zone_actions_dict, round_number)
+    exact_seconds = time.perf_counter() - started
+    
+    rows = []
+    for theta in thetas:
+        approx_calculator = SpatialEffectsCalculator(calculator.zones, calculator.adjacency, calculator.zone_multipliers,
+                                                     spillover_mode="barnes_hut", spillover_theta=theta)
+        approx_calculator._spillover_tree = calculator._spillover_tree
+        started = time.perf_counter()
+        approx = approx_calculator.calculate_multi_zone_effects(zone_actions_dict, round_number)
+        approx_seconds = time.perf_counter() - started
+        
+        errors = {
+            subsystem: abs(approx["total_city_impact"][subsystem] - exact["total_city_impact"][subsystem])
+            for subsystem in SUBSYSTEMS
+        }
+        rows.append({
+            "theta": theta,
+            "exact_seconds": exact_seconds,
+            "approx_seconds": approx_seconds,
+            "max_abs_error": max(errors.values()),
+            "max_rel_error": max(
+                errors[subsystem] / abs(exact["total_city_impact"][subsystem])
+                for subsystem in SUBSYSTEMS if exact["total_city_impact"][subsystem]
+            ) if any(exact["total_city_impact"].values()) else 0.0,
+            "subsystem_errors": errors,
+            **approx["far_field_stats"]
+        })
+    return rows
+
+# RASTER SPILLOVER
+RASTER_CELL_SIZE = float(os.environ.get("URBAN_PULSE_RASTER_CELL", "0.25") or 0.25)  # Map units per grid cell
+RASTER_MAX_CELLS = 1 << 21  # Cells are coarsened beyond this so large cities stay within memory
+
+def _fft_length(n):
+    """Smallest 2^a 3^b 5^c at or above n, the sizes numpy's FFT handles fastest"""
+    best = 1 << max(0, (n - 1).bit_length())
+    power3 = 1
+    while power3 < best:
+        power5 = power3
+        while power5 < best:
+            length = power5
+            while length < n:
+                length *= 2
+            best = min(best, length)
+            power5 *= 5
+        power3 *= 3
+    return best
+
+class PopulationRaster:
+    """Zones rasterized onto a regular grid with per-cell population weights
+    
+    Each cell belongs to the zone covering its center (zones later in the table are drawn on
+    top, so parks sit over the districts around them) and holds that zone's population
+    density. Spillover is the effect raster convolved with the non-adjacent decay kernel,
+    computed with one FFT per subsystem, so its cost depends on the grid, not on how many
+    zones are configured.
+    """
+    
+    def __init__(self, zones, cell_size=RASTER_CELL_SIZE, max_cells=RASTER_MAX_CELLS):
+        self.zones = zones
+        self.zone_ids = list(zones)
+        self.position = {zone_id: i for i, zone_id in enumerate(self.zone_ids)}
+        bounds = np.array([
+            [*zones[zone_id]["coordinates"][0], *zones[zone_id]["coordinates"][1]] for zone_id in self.zone_ids
+        ], dtype=np.float64).reshape(len(self.zone_ids), 4)
+        low = np.minimum(bounds[:, :2], bounds[:, 2:])
+        high = np.maximum(bounds[:, :2], bounds[:, 2:])
+        self.origin = low.min(axis=0) if len(self.zone_ids) else np.zeros(2)
+        extent = np.maximum((high.max(axis=0) - self.origin) if len(self.zone_ids) else np.ones(2), 1e-9)
+        self.cell_size = max(cell_size, math.sqrt(float(extent[0] * extent[1]) / max_cells))
+        self.shape = tuple(int(n) for n in np.maximum(np.ceil(extent / self.cell_size - 1e-9), 1).astype(np.int64))
+        
+        # Cell ranges whose centers fall inside each zone; tiny zones still get the cell under their center
+        first = np.ceil((low - self.origin) / self.cell_size - 0.5).astype(np.int64)
+        last = np.ceil((high - self.origin) / self.cell_size - 0.5).astype(np.int64)
+        center_cell = np.floor(((low + high) / 2 - self.origin) / self.cell_size).astype(np.int64)
+        empty = last <= first
+        first = np.where(empty, center_cell, first).clip(0, np.array(self.shape) - 1)
+        last = np.where(empty, center_cell + 1, last).clip(1, np.array(self.shape))
+        
+        self.zone_grid = np.full(self.shape, -1, dtype=np.int64)
+        self.cell_ranges = np.hstack([first, last])
+        for i, ((x0, y0), (x1, y1)) in enumerate(zip(first.tolist(), last.tolist())):
+            self.zone_grid[x0:x1, y0:y1] = i
+        
+        density = np.array([
+            zones[zone_id].get("characteristics", {}).get("population_density", 0) for zone_id in self.zone_ids
+        ], dtype=np.float64)
+        covered = self.zone_grid >= 0
+        self.cell_zone = self.zone_grid[covered]
+        self.zone_cells = np.bincount(self.cell_zone, minlength=len(self.zone_ids)).astype(np.float64)
+        # Unpopulated zones (parks) spread and average uniformly over their cells
+        weight = np.where(density > 0, density, 1.0)[self.cell_zone]
+        self.population = np.zeros(self.shape)
+        self.population[covered] = weight
+        self.zone_weight = np.bincount(self.cell_zone, weights=weight, minlength=len(self.zone_ids))
+        self._covered = covered
+        self._kernel_spectrum = None
+        self._box_spectra = {}
+        self._self_coupling = {}
+    
+    def _decay_kernel_spectrum(self, shape):
+        """(FFT shape, rfft2 of the decay kernel) for a wrap-free circular convolution over a grid of shape"""
+        nx, ny = shape
+        fft_shape = (_fft_length(2 * nx - 1), _fft_length(2 * ny - 1))
+        offset_x = np.arange(fft_shape[0])
+        offset_y = np.arange(fft_shape[1])
+        offset_x = np.where(offset_x < nx, offset_x, offset_x - fft_shape[0])
+        offset_y = np.where(offset_y < ny, offset_y, offset_y - fft_shape[1])
+        distance = np.hypot(offset_x[:, None], offset_y[None, :]) * self.cell_size
+        kernel = spillover_decay_kernel(distance)
+        kernel[0, 0] = 0.0  # A cell does not spill into itself
+        return fft_shape, np.fft.rfft2(kernel)
+    
+    @property
+    def kernel_spectrum(self):
+        """rfft2 of the decay kernel over the whole grid, built on first use"""
+        if self._kernel_spectrum is None:
+            self.fft_shape, self._kernel_spectrum = self._decay_kernel_spectrum(self.shape)
+        return self._kernel_spectrum
+    
+    def self_coupling(self, zone_index):
+        """Population-weighted kernel average over a zone's own cell pairs, to remove self-spillover
+        
+        Convolves the zone's weights over its bounding box by FFT, so memory stays linear in the
+        zone's cells instead of holding a cells x cells kernel matrix.
+        """
+        if zone_index not in self._self_coupling:
+            x0, y0, x1, y1 = self.cell_ranges[zone_index].tolist()
+            weight = np.where(self.zone_grid[x0:x1, y0:y1] == zone_index, self.population[x0:x1, y0:y1], 0.0)
+            weight /= weight.sum()
+            
+            shape = weight.shape
+            if shape not in self._box_spectra:
+                self._box_spectra[shape] = self._decay_kernel_spectrum(shape)
+            fft_shape, spectrum = self._box_spectra[shape]
+            spread = np.fft.irfft2(np.fft.rfft2(weight, s=fft_shape) * spectrum, s=fft_shape)[:shape[0], :shape[1]]
+            self._self_coupling[zone_index] = max(float(np.vdot(weight, spread)), 0.0)
+        return self._self_coupling[zone_index]
+    
+    def effect_raster(self, zone_effects):
+        """(subsystem, x, y) raster with each zone's effects spread over its cells by population"""
+        per_zone = np.zeros((len(SUBSYSTEMS), len(self.zone_ids)))
+        for zone_id, effects in zone_effects.items():
+            if zone_id in self.position:
+                for s, subsystem in enumerate(SUBSYSTEMS):
+                    per_zone[s, self.position[zone_id]] = effects.get(subsystem, 0.0)
+        share = np.divide(per_zone, self.zone_weight, out=np.zeros_like(per_zone), where=self.zone_weight > 0)
+        raster = np.zeros((len(SUBSYSTEMS), *self.shape))
+        raster[:, self._covered] = share[:, self.cell_zone] * self.population[self._covered]
+        return raster
+    
+    def spillover(self, zone_effects):
+        """Per-cell spillover field (subsystem, x, y) and per-zone population-weighted spillover
+        
+        A zone's spillover is the population-weighted mean of the field over its cells, less the
+        part its own effects contribute, which puts it on the same scale as the zone-level
+        effect * decay model.
+        """
+        kernel_spectrum = self.kernel_spectrum
+        nx, ny = self.shape
+        field = self.effect_raster(zone_effects)
+        for s, layer in enumerate(field):
+            if layer.any():
+                field[s] = np.fft.irfft2(np.fft.rfft2(layer, s=self.fft_shape) * kernel_spectrum, s=self.fft_shape)[:nx, :ny]
+        
+        weighted = field[:, self._covered] * self.population[self._covered]
+        per_zone = np.stack([
+            np.bincount(self.cell_zone, weights=values, minlength=len(self.zone_ids)) for values in weighted
+        ])
+        per_zone = np.divide(per_zone, self.zone_weight, out=np.zeros_like(per_zone), where=self.zone_weight > 0)
+        for zone_id, effects in zone_effects.items():
+            index = self.position.get(zone_id)
+            if index is not None and self.zone_weight[index] > 0:
+                coupling = self.self_coupling(index)
+                for s, subsystem in enumerate(SUBSYSTEMS):
+                    per_zone[s, index] -= effects.get(subsystem, 0.0) * coupling
+        np.maximum(per_zone, 0.0, out=per_zone)
+        
+        zone_spillover = {
+            zone_id: dict(zip(SUBSYSTEMS, per_zone[:, i].tolist()))
+            for i, zone_id in enumerate(self.zone_ids) if per_zone[:, i].any()
+        }
+        return field, zone_spillover
+
+# MULTI-HOP PROPAGATION
+SPILLOVER_ALPHA = float(os.environ.get("URBAN_PULSE_SPILLOVER_ALPHA", "1.0") or 1.0)  # Share of received spillover passed on per hop
+PROPAGATION_MAX_CONTRACTION = 0.9  # alpha is capped so alpha * ||W||inf stays below this and the iteration converges
+PROPAGATION_TOLERANCE = 1e-9
+PROPAGATION_MAX_ITERATIONS = 500
+
+class SpilloverNetwork:
+    """Sparse adjacency-weighted decay matrix W in CSR form, W[target, source] = adjacent decay multiplier
+    
+    Multi-hop spillover is the fixed point x = b + alpha W x, i.e. (I - alpha W) x = b, where b
+    holds each zone's direct effects; x - b is what every zone receives through the network.
+    """
+    
+    def __init__(self, zones, adjacency):
+        self.zones = zones
+        self.adjacency = adjacency
+        self.zone_ids = list(zones)
+        self.position = {zone_id: i for i, zone_id in enumerate(self.zone_ids)}
+        zone_count = len(self.zone_ids)
+        
+        pairs = [
+            (self.position[target], self.position[source])
+            for source, targets in adjacency.items() if source in self.position
+            for target in targets if target in self.position and target != source
+        ]
+        edges = np.unique(np.array(pairs, dtype=np.int64).reshape(-1, 2), axis=0)
+        self.rows, self.indices = edges[:, 0], edges[:, 1]
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(self.rows, minlength=zone_count))])
+        
+        centers = ZoneSpatialIndex(zones).centers if zone_count else np.zeros((0, 2))
+        distance = np.hypot(*(centers[self.rows] - centers[self.indices]).T) if len(edges) else np.zeros(0)
+        amplitude, rate, _ = SPILLOVER_DECAY["adjacent"]
+        self.weights = amplitude * np.exp(-rate * distance)
+        row_sums = np.bincount(self.rows, weights=self.weights, minlength=zone_count)
+        self.norm = float(row_sums.max()) if zone_count else 0.0
+    
+    def matvec(self, x):
+        """W @ x for x of shape (zones, columns)"""
+        contributions = self.weights[:, None] * x[self.indices]
+        return np.stack([
+            np.bincount(self.rows, weights=column, minlength=len(self.zone_ids)) for column in contributions.T
+        ], axis=1)
+    
+    def effective_alpha(self, alpha):
+        if self.norm <= 0:
+            return alpha
+        return min(alpha, PROPAGATION_MAX_CONTRACTION / self.norm)
+    
+    def solve(self, b, alpha=SPILLOVER_ALPHA, x0=None, tolerance=PROPAGATION_TOLERANCE,
+              max_iterations=PROPAGATION_MAX_ITERATIONS):
+        """Richardson (Jacobi, W has no diagonal) iteration for (I - alpha W) x = b from x0 or b
+        
+        Returns (x, stats) with the alpha actually used, iterations run and the last update size.
+        """
+        alpha = self.effective_alpha(alpha)
+        warm_started = x0 is not None and x0.shape == b.shape
+        x = x0.copy() if warm_started else b.copy()
+        change = 0.0
+        iterations = 0
+        for iterations in range(1, max_iterations + 1):
+            x_next = b + alpha * self.matvec(x)
+            change = float(np.abs(x_next - x).max()) if x.size else 0.0
+            x = x_next
+            if change <= tolerance * max(1.0, float(np.abs(x).max()) if x.size else 0.0):
+                break
+        
+        return x, {"alpha": alpha, "iterations": iterations, "residual": change, "warm_started": warm_started}
+
+# SHARDED EVALUATION
+SHARD_WORKERS = int(os.environ.get("URBAN_PULSE_SHARD_WORKERS", "0") or 0)  # 0 or 1 = evaluate in-process
+SHARD_MIN_ZONES = int(os.environ.get("URBAN_PULSE_SHARD_MIN_ZONES", "2000") or 2000)  # Smaller cities are not worth the IPC
+SHARD_FORK_AVAILABLE = "fork" in multiprocessing.get_all_start_methods()
+SHARD_START_METHOD = os.environ.get("URBAN_PULSE_SHARD_START_METHOD", "") or ("fork" if SHARD_FORK_AVAILABLE else "spawn")
+SHARD_POOL_CACHE_SIZE = 2
+# Worker entry points are pickled by reference. Under `streamlit run` this script is re-executed as a
+# fresh __main__ module on every rerun, so they are also published under this stable module name
+SHARD_WORKER_ALIAS = "_urban_pulse_shard_worker"
+
+def partition_zones(centers, shard_count):
+    """Recursive coordinate bisection of zone centers into shard_count spatially compact shards
+    
+    Returns one sorted array of zone positions per shard; shard sizes differ by at most one.
+    """
+    centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+    shards = []
+    
+    def split(members, count):
+        if count <= 1 or len(members) <= 1:
+            shards.append(np.sort(members))
+            return
+        points = centers[members]
+        axis = int(np.argmax(points.max(axis=0) - points.min(axis=0)))
+        left_count = count // 2
+        cut = len(members) * left_count // count
+        order = members[np.argsort(points[:, axis], kind="stable")]
+        split(order[:cut], left_count)
+        split(order[cut:], count - left_count)
+    
+    split(np.arange(len(centers)), max(1, min(shard_count, len(centers))))
+    return shards
+
+_shard_worker_state = {}
+
+def _init_shard_worker(zones, adjacency, zone_multipliers, spillover_epsilon, shard_zone_ids):
+    """Worker initializer: every worker holds the whole city and the shard layout"""
+    _shard_worker_state["calculator"] = SpatialEffectsCalculator(
+        zones, adjacency, zone_multipliers, spillover_epsilon=spillover_epsilon, spillover_mode="exact"
+    )
+    _shard_worker_state["shards"] = shard_zone_ids
+    _shard_worker_state["shard_sets"] = [set(zone_ids) for zone_ids in shard_zone_ids]
+
+def _shard_direct_effects(zone_requests):
+    """Direct effects for one shard's configured zones: [(zone, actions, subsystems)] -> [(zone, effects, loops)]"""
+    calculator = _shard_worker_state["calculator"]
+    results = []
+    for zone, actions, subsystems in zone_requests:
+        activation_score, activated_loops = calculator.calculate_loop_activation_score(actions, subsystems)
+        results.append((zone, calculator._calculate_zone_base_effects(subsystems, zone, activation_score, actions),
+                        activated_loops))
+    return results
+
+def _shard_spillover(shard_index, sources):
+    """Spillover pairs into one shard's zones from its own sources and the halo
+    
+    sources are (rank, zone, effects) in engine order. Returns columns (target position, source
+    rank, distance, category index, decay multiplier) rather than per-pair dicts, which would
+    cost more to pickle than to compute.
+    """
+    calculator = _shard_worker_state["calculator"]
+    shard_zone_ids = _shard_worker_state["shards"][shard_index]
+    shard_set = _shard_worker_state["shard_sets"][shard_index]
+    position = calculator.spatial_index.position
+    categories = list(SPILLOVER_DECAY)
+    targets, ranks, distances, category_codes = [], [], [], []
+    for rank, source_zone, source_effects in sources:
+        if calculator.spillover_epsilon <= 0:
+            shard_targets = shard_zone_ids
+        else:
+            shard_targets = [zone for zone in calculator._spillover_targets(source_zone, source_effects) if zone in shard_set]
+        adjacent = calculator.adjacency.get(source_zone, [])
+        for target_zone in shard_targets:
+            if target_zone != source_zone:
+                distance = calculator.calculate_euclidean_distance(source_zone, target_zone)
+                targets.append(position[target_zone])
+                ranks.append(rank)
+                distances.append(distance)
+                category_codes.append(0 if target_zone in adjacent else 1 if distance <= SPILLOVER_NEARBY_DISTANCE else 2)
+    
+    distance = np.array(distances, dtype=np.float64)
+    category = np.array(category_codes, dtype=np.int8)
+    amplitude = np.array([SPILLOVER_DECAY[name][0] for name in categories])
+    rate = np.array([SPILLOVER_DECAY[name][1] for name in categories])
+    decay = amplitude[category] * np.exp(-rate[category] * distance)
+    return np.array(targets, dtype=np.int64), np.array(ranks, dtype=np.int64), distance, category, decay
+
+if __name__ == "__main__" and SHARD_WORKER_ALIAS not in sys.modules:
+    _shard_worker_module = types.ModuleType(SHARD_WORKER_ALIAS)
+    for _entry_point in (_init_shard_worker, _shard_direct_effects, _shard_spillover):
+        _entry_point.__module__ = SHARD_WORKER_ALIAS
+        setattr(_shard_worker_module, _entry_point.__name__, _entry_point)
+    sys.modules[SHARD_WORKER_ALIAS] = _shard_worker_module
+
+def _shard_entry_point(name):
+    """Worker function that pickle can resolve: this module's own, or the published one under streamlit"""
+    if __name__ == "__main__":
+        return getattr(sys.modules[SHARD_WORKER_ALIAS], name)
+    return globals()[name]
+
+def shard_start_method():
+    """Start method for worker pools, or None when sharding cannot run
+    
+    Under streamlit the entry points live in the in-memory alias module, which only forked
+    workers inherit, so fork is forced there and sharding is off where fork does not exist.
+    Imported as a module (bench, tests), workers re-import it by name and any method works.
+    """
+    if __name__ == "__main__":
+        return "fork" if SHARD_FORK_AVAILABLE else None
+    return SHARD_START_METHOD
+
+def sharding_available():
+    """Sharded evaluation is configured and workers can be started"""
+    return SHARD_WORKERS > 1 and shard_start_method() is not None
+
+class ShardedEffectsEvaluator:
+    """calculate_multi_zone_effects for one city split into shards evaluated by a process pool
+    
+    Workers compute direct effects for their shard's configured zones, then spillover into their
+    shard from local sources plus the halo: sources elsewhere whose cutoff radius or adjacency
+    reaches the shard. Synergies, totals and zone performance are assembled in the parent with
+    the calculator's own methods, in the engine's order, so results match it exactly.
+    Only the exact spillover mode (with or without the epsilon cutoff) is sharded.
+    The pool shuts down on close(), when the evaluator is garbage collected (e.g. evicted
+    from the pool cache) or at interpreter exit, whichever comes first.
+    """
+    
+    def __init__(self, calculator, workers=None, shard_count=None):
+        start_method = shard_start_method()
+        if start_method is None:
+            raise RuntimeError("Sharded evaluation needs the fork start method when run under streamlit")
+        self.calculator = calculator
+        self.workers = max(1, workers or SHARD_WORKERS or os.cpu_count() or 1)
+        index = calculator.spatial_index
+        self.shards = partition_zones(index.centers, shard_count or self.workers)
+        self.shard_zone_ids = [[index.zone_ids[i] for i in shard.tolist()] for shard in self.shards]
+        self.shard_of = {zone: s for s, zone_ids in enumerate(self.shard_zone_ids) for zone in zone_ids}
+        self.shard_bounds = [
+            (index.centers[shard].min(axis=0), index.centers[shard].max(axis=0)) for shard in self.shards
+        ]
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_shard_entry_point("_init_shard_worker"),
+            initargs=(calculator.zones, calculator.adjacency, calculator.zone_multipliers,
+                      calculator.spillover_epsilon, self.shard_zone_ids)
+        )
+        # Holds the executor, not the evaluator, so it does not keep the evaluator alive
+        self._finalizer = weakref.finalize(self, self.executor.shutdown, wait=False, cancel_futures=True)
+    
+    def close(self):
+        self._finalizer.detach()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def halo_shards(self, source_zone, source_effects):
+        """Shards a source's spillover can reach: its own, those within the cutoff radius and adjacent ones"""
+        calculator = self.calculator
+        if calculator.spillover_epsilon <= 0:
+            return range(len(self.shards))
+        
+        reached = {self.shard_of[source_zone]}
+        reached.update(self.shard_of[zone] for zone in calculator.adjacency.get(source_zone, []) if zone in self.shard_of)
+        radius = spillover_cutoff_radius(max(source_effects.values(), default=0.0), calculator.spillover_epsilon)
+        point = calculator.spatial_index.centers[calculator.spatial_index.position[source_zone]]
+        for s, (low, high) in enumerate(self.shard_bounds):
+            gap = np.maximum(np.maximum(low - point, point - high), 0.0)
+            if math.hypot(*gap) <= radius:
+                reached.add(s)
+        return sorted(reached)
+    
+    def _assemble_spillover(self, columns, zone_base_effects, round_number):
+        """Per-pair spillover dicts in the engine's insertion order: targets by first reaching source,
+        then zone order; sources in engine order within each target"""
+        if not columns:
+            return {}
+        targets, ranks, distance, category, decay = (np.concatenate(parts) for parts in zip(*columns))
+        index = self.calculator.spatial_index
+        first_rank = np.full(len(index.zone_ids), len(zone_base_effects), dtype=np.int64)
+        np.minimum.at(first_rank, targets, ranks)
+        order = np.lexsort((ranks, targets, first_rank[targets]))
+        
+        categories = list(SPILLOVER_DECAY)
+        delays = [SPILLOVER_DECAY[name][2] for name in categories]
+        source_items = [(zone, list(effects.items())) for zone, effects in zone_base_effects.items()]
+        spillover_effects = {}
+        current_target = None
+        for target, rank, pair_distance, code, multiplier in zip(
+            targets[order].tolist(), ranks[order].tolist(), distance[order].tolist(), category[order].tolist(), list(decay[order])
+        ):
+            if target != current_target:
+                current_target = target
+                received = spillover_effects[index.zone_ids[target]] = {}
+            source_zone, source_effects = source_items[rank]
+            received[source_zone] = {
+                "effects": {subsystem: effect * multiplier for subsystem, effect in source_effects},
+                "delay_rounds": delays[code],
+                "distance_category": categories[code],
+                "distance": pair_distance,
+                "decay_multiplier": multiplier,
+                "effective_round": round_number + delays[code]
+            }
+        return spillover_effects
+    
+    def calculate_multi_zone_effects(self, zone_actions_dict, round_number):
+        calculator = self.calculator
+        started = time.perf_counter()
+        total_effects = {
+            "direct_effects": {},
+            "spillover_effects": {},
+            "cross_zone_synergies": {},
+            "total_city_impact": {},
+            "activated_loops": [],
+            "zone_performance": {}
+        }
+        
+        # Direct effects per shard; strategies are resolved here because custom ones live in the session
+        requests = [[] for _ in self.shards]
+        for zone, zone_data in zone_actions_dict.items():
+            actions = zone_data.get("actions", [])
+            if actions and zone in self.shard_of:
+                subsystems = calculator._get_subsystems_from_strategies(zone_data.get("strategies", []))
+                requests[self.shard_of[zone]].append((zone, actions, subsystems))
+        
+        direct = {}
+        direct_task = _shard_entry_point("_shard_direct_effects")
+        for future in [self.executor.submit(direct_task, batch) for batch in requests if batch]:
+            for zone, effects, loops in future.result():
+                direct[zone] = (effects, loops)
+        
+        all_activated_loops = []
+        zone_base_effects = {}
+        for zone in zone_actions_dict:
+            if zone in direct:
+                effects, loops = direct[zone]
+                all_activated_loops.extend(loops)
+                zone_base_effects[zone] = effects
+                total_effects["direct_effects"][zone] = effects
+        
+        # Halo exchange: each shard receives only the sources that can reach it
+        shard_sources = [[] for _ in self.shards]
+        for rank, (source_zone, source_effects) in enumerate(zone_base_effects.items()):
+            for s in self.halo_shards(source_zone, source_effects):
+                shard_sources[s].append((rank, source_zone, source_effects))
+        spillover_task = _shard_entry_point("_shard_spillover")
+        futures = [self.executor.submit(spillover_task, s, sources) for s, sources in enumerate(shard_sources) if sources]
+        columns = [future.result() for future in futures]
+        total_effects["spillover_effects"] = self._assemble_spillover(columns, zone_base_effects, round_number)
+        spillover_pairs = sum(len(targets) for targets, *_ in columns)
+        
+        if len(zone_actions_dict) > 1:
+            total_effects["cross_zone_synergies"] = calculator._calculate_cross_zone_synergies(zone_actions_dict, zone_base_effects)
+        
+        total_effects["total_city_impact"] = calculator._calculate_total_city_impact(
+            total_effects["direct_effects"],
+            total_effects["spillover_effects"],
+            total_effects["cross_zone_synergies"]
+        )
+        
+        for zone in zone_actions_dict.keys():
+            total_effects["zone_performance"][zone] = calculator._calculate_zone_performance(
+                zone, zone_base_effects.get(zone, {}), total_effects
+            )
+        
+        total_effects["activated_loops"] = all_activated_loops
+        
+        ENGINE_LATENCY.observe(time.perf_counter() - started)
+        ENGINE_ZONES.observe(len(zone_base_effects))
+        SPILLOVER_PAIRS.inc(spillover_pairs)
+        
+        return total_effects
+
+@st.cache_resource(max_entries=SHARD_POOL_CACHE_SIZE)
+def _cached_sharded_evaluator(city_key, spillover_epsilon, workers, _calculator):
+    return ShardedEffectsEvaluator(_calculator, workers)
+
+def get_sharded_evaluator(calculator, workers=None):
+    """Process pool for a city, shared across sessions and reruns; keyed by layout, adjacency and multipliers"""
+    if calculator._shard_key is None:
+        digest = hashlib.blake2b(
+            json.dumps([calculator.adjacency, calculator.zone_multipliers], sort_keys=True, default=list).encode("utf-8"),
+            digest_size=16
+        )
+        calculator._shard_key = f"{calculator.layout_version}:{digest.hexdigest()}"
+    return _cached_sharded_evaluator(calculator._shard_key, calculator.spillover_epsilon, workers or SHARD_WORKERS, calculator)
+
+# COMPILED SCORING
+COMPILED_SCORING = os.environ.get("URBAN_PULSE_COMPILED_SCORING", "1") != "0"
+COMPILED_MAX_ZONES = 2048  # Larger cities keep the reference engine (or sharding)
+COMPILED_MAX_ACTIONS = 16  # Action counts in the table; larger counts use the same formula directly
+COMPILED_VERIFY_SAMPLES = 48
+SUBSYSTEM_INDEX = {subsystem: i for i, subsystem in enumerate(SUBSYSTEMS)}
+SUBSYSTEM_BITS = {subsystem: 1 << i for i, subsystem in enumerate(SUBSYSTEMS)}
+BEHAVIORAL_MULTIPLIERS = np.array([8.2 if subsystem == "Human-Social" else 1.0 for subsystem in SUBSYSTEMS])
+
+def subsystem_mask(subsystems):
+    mask = 0
+    for subsystem in subsystems:
+        mask |= SUBSYSTEM_BITS[subsystem]
+    return mask
+
+class CompiledScoringTables:
+    """The engine's direct-effect model compiled into lookup tables
+    
+    A zone's direct effects depend only on (zone, subsystem set, action count) and its loop
+    activation only on the subsystem set, so both are tabulated over zone x subsystem bitmask x
+    action count with the engine's own formulas in the engine's operation order. Spillover and
+    synergies are then computed from the table rows; spillover decay rows are built per source
+    zone on first use. Zones keep the engine's subsystem order, so results match it exactly.
+    Only the exact spillover mode (with or without the epsilon cutoff) is compiled.
+    """
+    
+    def __init__(self, calculator, max_actions=COMPILED_MAX_ACTIONS):
+        self.calculator = calculator
+        self.zone_ids = list(calculator.zones)
+        self.zone_position = {zone: i for i, zone in enumerate(self.zone_ids)}
+        self.max_actions = max_actions
+        mask_count = 1 << len(SUBSYSTEMS)
+        
+        self.loop_activation = np.zeros(mask_count)
+        self.loop_rows = [[] for _ in range(mask_count)]
+        self.mask_subsystems = [[s for s in SUBSYSTEMS if mask & SUBSYSTEM_BITS[s]] for mask in range(mask_count)]
+        for mask in range(1, mask_count):
+            score, loops = calculator.calculate_loop_activation_score([], self.mask_subsystems[mask])
+            self.loop_activation[mask] = score
+            self.loop_rows[mask] = loops
+        
+        self.zone_multipliers = np.array([
+            [calculator.zone_multipliers.get(subsystem, {}).get(zone, 1.0) for subsystem in SUBSYSTEMS]
+            for zone in self.zone_ids
+        ]).reshape(len(self.zone_ids), len(SUBSYSTEMS))
+        self.uec_factor = np.array([
+            PRIORITY_MULTIPLIERS.get(calculator.zones[zone].get("priority_level", "Medium"), 1.0) for zone in self.zone_ids
+        ])
+        self.mask_bits = np.array([
+            [bool(mask & SUBSYSTEM_BITS[subsystem]) for subsystem in SUBSYSTEMS] for mask in range(mask_count)
+        ])
+        counts = np.arange(max_actions + 1)
+        # effects[zone, mask, count, subsystem]; subsystems outside the mask are 0
+        self.effects = self._direct_effects(
+            np.arange(len(self.zone_ids))[:, None, None], np.arange(mask_count)[None, :, None], counts[None, None, :]
+        )
+        self.zone_uec = self.effects.sum(axis=-1) * self.uec_factor[:, None, None] / 10.0
+        self._strategy_masks = {strategy["Strategy"]: subsystem_mask(strategy["Subsystems"]) for strategy in STRATEGIES}
+        self._spillover_rows = {}
+    
+    def _direct_effects(self, zones, masks, counts):
+        """The engine's base-effect formula, broadcast over index arrays"""
+        base_impact = counts * 2.0
+        loop_multiplier = 1.0 + (self.loop_activation[masks] / 10.0)
+        effect = (base_impact * loop_multiplier)[..., None] * self.zone_multipliers[zones] * BEHAVIORAL_MULTIPLIERS
+        return np.where(self.mask_bits[masks], effect, 0.0)
+    
+    def strategy_mask(self, strategy_names):
+        """Bitmask of the subsystems a strategy list resolves to, as in _get_subsystems_from_strategies"""
+        mask = 0
+        for name in strategy_names:
+            if name in self._strategy_masks:
+                mask |= self._strategy_masks[name]
+            else:
+                mask |= subsystem_mask(self.calculator._get_subsystems_from_strategies([name]))
+        return mask or SUBSYSTEM_BITS["Human-Social"]
+    
+    def score_zones(self, zone_index, masks, counts):
+        """Direct effects (n x subsystems) and zone UEC scores for arrays of zone positions,
+        subsystem masks and action counts; a table gather, no Python per zone
+        
+        Zone UEC sums subsystems in SUBSYSTEMS order, so it can differ from the engine's in the last bit.
+        """
+        zone_index, masks, counts = (np.asarray(values, dtype=np.intp) for values in (zone_index, masks, counts))
+        inside = counts <= self.max_actions
+        if inside.all():
+            return self.effects[zone_index, masks, counts], self.zone_uec[zone_index, masks, counts]
+        effects = np.empty((len(counts), len(SUBSYSTEMS)))
+        effects[inside] = self.effects[zone_index[inside], masks[inside], counts[inside]]
+        effects[~inside] = self._direct_effects(zone_index[~inside], masks[~inside], counts[~inside])
+        return effects, effects.sum(axis=-1) * self.uec_factor[zone_index] / 10.0
+    
+    def _spillover_row(self, source_zone):
+        """Distance, category and decay multiplier from one source to every zone, cached"""
+        row = self._spillover_rows.get(source_zone)
+        if row is None:
+            calculator = self.calculator
+            adjacent = set(calculator.adjacency.get(source_zone, []))
+            distance = np.array([calculator.calculate_euclidean_distance(source_zone, zone) for zone in self.zone_ids])
+            categories = [
+                "adjacent" if zone in adjacent else "nearby" if d <= SPILLOVER_NEARBY_DISTANCE else "distant"
+                for zone, d in zip(self.zone_ids, distance.tolist())
+            ]
+            amplitude, rate = (np.array([SPILLOVER_DECAY[category][k] for category in categories]) for k in (0, 1))
+            row = (distance.tolist(), categories, (amplitude * np.exp(-rate * distance)).tolist())
+            self._spillover_rows[source_zone] = row
+        return row
+    
+    def calculate_multi_zone_effects(self, zone_actions_dict, round_number):
+        """Same result as the reference engine in exact spillover mode"""
+        calculator = self.calculator
+        started = time.perf_counter()
+        total_effects = {
+            "direct_effects": {},
+            "spillover_effects": {},
+            "cross_zone_synergies": {},
+            "total_city_impact": {},
+            "activated_loops": [],
+            "zone_performance": {}
+        }
+        
+        # Subsystems are resolved as the engine does: their order sets the order of each zone's sums
+        configured = [
+            (zone, calculator._get_subsystems_from_strategies(zone_data.get("strategies", [])), len(zone_data["actions"]))
+            for zone, zone_data in zone_actions_dict.items() if zone_data.get("actions")
+        ]
+        masks = [subsystem_mask(subsystems) for _, subsystems, _ in configured]
+        rows, _ = self.score_zones(
+            [self.zone_position[zone] for zone, _, _ in configured], masks, [count for _, _, count in configured]
+        )
+        all_activated_loops = []
+        zone_base_effects = {}
+        for (zone, subsystems, _), mask, row in zip(configured, masks, rows.tolist()):
+            all_activated_loops.extend(dict(loop) for loop in self.loop_rows[mask])
+            zone_effects = {subsystem: row[SUBSYSTEM_INDEX[subsystem]] for subsystem in subsystems}
+            zone_base_effects[zone] = zone_effects
+            total_effects["direct_effects"][zone] = zone_effects
+        
+        spillover_pairs = 0
+        spillover_effects = total_effects["spillover_effects"]
+        for source_zone, source_effects in zone_base_effects.items():
+            distances, categories, multipliers = self._spillover_row(source_zone)
+            if calculator.spillover_epsilon > 0:
+                targets = [self.zone_position[zone] for zone in calculator._spillover_targets(source_zone, source_effects)]
+            else:
+                targets = range(len(self.zone_ids))
+            for t in targets:
+                target_zone = self.zone_ids[t]
+                if target_zone == source_zone:
+                    continue
+                decay_multiplier = multipliers[t]
+                delay_rounds = SPILLOVER_DECAY[categories[t]][2]
+                spillover_effects.setdefault(target_zone, {})[source_zone] = {
+                    "effects": {subsystem: effect * decay_multiplier for subsystem, effect in source_effects.items()},
+                    "delay_rounds": delay_rounds,
+                    "distance_category": categories[t],
+                    "distance": distances[t],
+                    "decay_multiplier": decay_multiplier,
+                    "effective_round": round_number + delay_rounds
+                }
+                spillover_pairs += 1
+        
+        if len(zone_actions_dict) > 1:
+            total_effects["cross_zone_synergies"] = calculator._calculate_cross_zone_synergies(zone_actions_dict, zone_base_effects)
+        
+        total_effects["total_city_impact"] = calculator._calculate_total_city_impact(
+            total_effects["direct_effects"],
+            total_effects["spillover_effects"],
+            total_effects["cross_zone_synergies"]
+        )
+        
+        for zone in zone_actions_dict.keys():
+            total_effects["zone_performance"][zone] = calculator._calculate_zone_performance(
+                zone, zone_base_effects.get(zone, {}), total_effects
+            )
+        
+        total_effects["activated_loops"] = all_activated_loops
+        
+        ENGINE_LATENCY.observe(time.perf_counter() - started)
+        ENGINE_ZONES.observe(len(zone_base_effects))
+        SPILLOVER_PAIRS.inc(spillover_pairs)
+        
+        return total_effects
+
+@st.cache_resource(max_entries=4)
+def _cached_compiled_tables(dataset_version, parameters, _calculator):
+    tables = CompiledScoringTables(_calculator)
+    return tables if verify_compiled_tables(tables) is None else None
+
+def _effects_mismatch(reference, compiled, path="effects"):
+    """First difference between two effects structures as a path string, or None when they agree"""
+    if isinstance(reference, dict):
+        if not isinstance(compiled, dict) or set(reference) != set(compiled):
+            return f"{path}: keys differ"
+        for key in reference:
+            mismatch = _effects_mismatch(reference[key], compiled[key], f"{path}.{key}")
+            if mismatch:
+                return mismatch
+        return None
+    if isinstance(reference, (list, tuple)):
+        if not isinstance(compiled, (list, tuple)) or len(reference) != len(compiled):
+            return f"{path}: lengths differ"
+        for i, (a, b) in enumerate(zip(reference, compiled)):
+            mismatch = _effects_mismatch(a, b, f"{path}[{i}]")
+            if mismatch:
+                return mismatch
+        return None
+    return None if reference == compiled else f"{path}: {reference!r} != {compiled!r}"
+
+def verify_compiled_tables(tables, samples=COMPILED_VERIFY_SAMPLES, seed=0, round_number=1):
+    """Run seeded random configurations through the compiled path and the reference engine and
+    require identical results; returns the first mismatch or None"""
+    rng = random.Random(seed)
+    zone_ids = tables.zone_ids
+    for _ in range(samples):
+        zone_actions_dict = {}
+        for zone in rng.sample(zone_ids, rng.randint(1, min(4, len(zone_ids)))):
+            strategies = rng.sample(STRATEGIES, rng.randint(1, 3))
+            actions = list(dict.fromkeys(action for strategy in strategies for action in strategy["Actions"]))
+            zone_actions_dict[zone] = {
+                "strategies": [strategy["Strategy"] for strategy in strategies],
+                "actions": rng.sample(actions, rng.randint(1, len(actions)))
+            }
+        reference = tables.calculator.calculate_multi_zone_effects(zone_actions_dict, round_number, compiled=False)
+        mismatch = _effects_mismatch(reference, tables.calculate_multi_zone_effects(zone_actions_dict, round_number))
+        if mismatch:
+            return mismatch
+    return None
 
 # COMPLETE CALCULATION ENGINE
+_strategy_scope = threading.local()
+
+@contextlib.contextmanager
+def custom_strategies_scope(custom_strategies):
+    """Resolve custom strategy names against custom_strategies instead of the session's in this thread"""
+    previous = getattr(_strategy_scope, "custom_strategies", None)
+    _strategy_scope.custom_strategies = custom_strategies
+    try:
+        yield
+    finally:
+        _strategy_scope.custom_strategies = previous
+
+def active_custom_strategies():
+    """Custom strategies the engine resolves names against: the active scope's, else the session's"""
+    custom_strategies = getattr(_strategy_scope, "custom_strategies", None)
+    if custom_strategies is None:
+        return st.session_state.custom_strategies
+    return custom_strategies
+
+SYNERGY_TOP_K = int(os.environ.get("URBAN_PULSE_SYNERGY_TOP_K", "0") or 0)  # 0 keeps every zone pair
+SYNERGY_AGGREGATE_KEY = "other_pairs"  # Synergy entry summing the pairs beyond the top k
+SYNERGY_PAIR_CHUNK = 1 << 20  # Zone pairs scored per block
+
 class SpatialEffectsCalculator:
-    def __init__(self):
-        self.zones = CITY_ZONES
-        self.adjacency = ZONE_ADJACENCY
-        self.zone_multipliers = ZONE_STRATEGY_MULTIPLIERS
+    def __init__(self, zones=None, adjacency=None, zone_multipliers=None, spillover_epsilon=None,
+                 spillover_mode=None, spillover_theta=None, spillover_alpha=None, synergy_top_k=None,
+                 compiled_scoring=None):
+        self.zones = CITY_ZONES if zones is None else zones
+        if adjacency is None:
+            # Stock city: hand-maintained table unless URBAN_PULSE_ADJACENCY says otherwise; other cities: from geometry
+            adjacency = resolve_zone_adjacency(CITY_ZONES, ZONE_ADJACENCY) if zones is None else get_zone_adjacency(self.zones)
+        self.adjacency = adjacency
+        self.zone_multipliers = ZONE_STRATEGY_MULTIPLIERS if zone_multipliers is None else zone_multipliers
         self.loop_data = SCIENTIFIC_LOOP_DATA
+        self.spillover_epsilon = SPILLOVER_EPSILON if spillover_epsilon is None else spillover_epsilon
+        self.spillover_mode = SPILLOVER_MODE if spillover_mode is None else spillover_mode
+        self.spillover_theta = SPILLOVER_THETA if spillover_theta is None else spillover_theta
+        self.spillover_alpha = SPILLOVER_ALPHA if spillover_alpha is None else spillover_alpha
+        self.synergy_top_k = SYNERGY_TOP_K if synergy_top_k is None else synergy_top_k
+        self.compiled_scoring = COMPILED_SCORING if compiled_scoring is None else compiled_scoring
+        self._spatial_index = None
+        self._spillover_tree = None
+        self._population_raster = None
+        self._spillover_network = None
+        self._propagation_solution = None
+        self._shard_key = None
+        self._layout_zones = None
+        self._layout_version = None
+        self._effects_dataset_version = None
+        self._compiled_tables = None
+    
+    @property
+    def layout_version(self):
+        """compute_city_version of the zones, rehashed only when the zones mapping is replaced"""
+        if self._layout_zones is not self.zones:
+            self._layout_version = compute_city_version(self.zones)
+            self._layout_zones = self.zones
+        return self._layout_version
+    
+    @property
+    def spatial_index(self):
+        """Grid index over zone centers, built on first use"""
+        if self._spatial_index is None or self._spatial_index.zones is not self.zones:
+            self._spatial_index = ZoneSpatialIndex(self.zones)
+        return self._spatial_index
+    
+    def _spillover_targets(self, source_zone, source_effects):
+        """Zones to evaluate spillover into: every zone, or only those within the epsilon cutoff radius"""
+        if self.spillover_epsilon <= 0:
+            return self.zones.keys()
+        
+        radius = spillover_cutoff_radius(max(source_effects.values(), default=0.0), self.spillover_epsilon)
+        index = self.spatial_index
+        # Adjacent zones use their own, slower decay, so they are always evaluated
+        return index.within(source_zone, radius, extra=self.adjacency.get(source_zone, []))
     
     def calculate_euclidean_distance(self, zone1, zone2):
         """Calculate Euclidean distance between zone centers"""
@@ -507,8 +2121,26 @@ class SpatialEffectsCalculator:
         
         return activation_score, activated_loops
     
-    def calculate_multi_zone_effects(self, zone_actions_dict, round_number):
-        """Calculate complete multi-zone effects"""
+    @property
+    def compiled_tables(self):
+        """Compiled scoring tables, built and verified against the engine once per process for each
+        dataset and shared across sessions; None when compilation is off, not applicable or failed verification"""
+        if self._compiled_tables is None:
+            self._compiled_tables = False
+            if self.compiled_scoring and self.spillover_mode == "exact" and len(self.zones) <= COMPILED_MAX_ZONES:
+                parameters = (self.spillover_epsilon, self.synergy_top_k)
+                self._compiled_tables = _cached_compiled_tables(effects_dataset_version(self), parameters, self) or False
+        return self._compiled_tables or None
+    
+    @profiled("engine")
+    def calculate_multi_zone_effects(self, zone_actions_dict, round_number, compiled=True):
+        """Calculate complete multi-zone effects; compiled=False forces the reference engine"""
+        if self.spillover_mode == "exact" and len(self.zones) >= SHARD_MIN_ZONES and sharding_available():
+            return get_sharded_evaluator(self).calculate_multi_zone_effects(zone_actions_dict, round_number)
+        if compiled and self.compiled_tables is not None:
+            return self.compiled_tables.calculate_multi_zone_effects(zone_actions_dict, round_number)
+        
+        started = time.perf_counter()
         total_effects = {
             "direct_effects": {},
             "spillover_effects": {},
@@ -538,15 +2170,24 @@ class SpatialEffectsCalculator:
             total_effects["direct_effects"][zone] = zone_effects
         
         # Calculate spillover effects between zones
-        for source_zone, source_effects in zone_base_effects.items():
-            for target_zone in self.zones.keys():
-                if target_zone != source_zone:
-                    spillover = self._calculate_spillover(source_zone, target_zone, source_effects, round_number)
-                    
-                    if target_zone not in total_effects["spillover_effects"]:
-                        total_effects["spillover_effects"][target_zone] = {}
-                    
-                    total_effects["spillover_effects"][target_zone][source_zone] = spillover
+        spillover_pairs = 0
+        if self.spillover_mode == "barnes_hut":
+            spillover_pairs = self._calculate_far_field_spillover(zone_base_effects, total_effects, round_number)
+        elif self.spillover_mode == "raster":
+            self._calculate_raster_spillover(zone_base_effects, total_effects)
+        elif self.spillover_mode == "network":
+            spillover_pairs = self._calculate_network_spillover(zone_base_effects, total_effects, round_number)
+        else:
+            for source_zone, source_effects in zone_base_effects.items():
+                for target_zone in self._spillover_targets(source_zone, source_effects):
+                    if target_zone != source_zone:
+                        spillover = self._calculate_spillover(source_zone, target_zone, source_effects, round_number)
+                        spillover_pairs += 1
+                        
+                        if target_zone not in total_effects["spillover_effects"]:
+                            total_effects["spillover_effects"][target_zone] = {}
+                        
+                        total_effects["spillover_effects"][target_zone][source_zone] = spillover
         
         # Calculate cross-zone synergies
         if len(zone_actions_dict) > 1:
@@ -556,7 +2197,9 @@ class SpatialEffectsCalculator:
         total_effects["total_city_impact"] = self._calculate_total_city_impact(
             total_effects["direct_effects"], 
             total_effects["spillover_effects"],
-            total_effects["cross_zone_synergies"]
+            total_effects["cross_zone_synergies"],
+            total_effects.get("far_field_spillover") or total_effects.get("raster_spillover")
+            or total_effects.get("network_spillover")
         )
         
         # Calculate zone performance metrics
@@ -567,6 +2210,10 @@ class SpatialEffectsCalculator:
         
         total_effects["activated_loops"] = all_activated_loops
         
+        ENGINE_LATENCY.observe(time.perf_counter() - started)
+        ENGINE_ZONES.observe(len(zone_base_effects))
+        SPILLOVER_PAIRS.inc(spillover_pairs)
+        
         return total_effects
     
     def _get_subsystems_from_strategies(self, strategy_names):
@@ -581,8 +2228,9 @@ class SpatialEffectsCalculator:
                     break
             else:
                 # Check custom strategies
-                if strategy_name in st.session_state.custom_strategies:
-                    custom_strategy = st.session_state.custom_strategies[strategy_name]
+                custom_strategies = active_custom_strategies()
+                if strategy_name in custom_strategies:
+                    custom_strategy = custom_strategies[strategy_name]
                     subsystems.update(custom_strategy.get("Subsystems", ["Human-Social"]))
         
         if not subsystems:
@@ -616,20 +2264,13 @@ class SpatialEffectsCalculator:
         
         if target_zone in self.adjacency.get(source_zone, []):
             category = "adjacent"
-            decay_multiplier = 0.7 * np.exp(-0.5 * distance)
-            delay_rounds = 1
-        elif distance <= 3.0:
+        elif distance <= SPILLOVER_NEARBY_DISTANCE:
             category = "nearby"
-            decay_multiplier = 0.4 * np.exp(-0.8 * distance)
-            delay_rounds = 2
-        elif distance <= 6.0:
-            category = "distant"
-            decay_multiplier = 0.15 * np.exp(-1.2 * distance)
-            delay_rounds = 3
         else:
             category = "distant"
-            decay_multiplier = 0.15 * np.exp(-1.2 * distance)
-            delay_rounds = 3
+        
+        amplitude, rate, delay_rounds = SPILLOVER_DECAY[category]
+        decay_multiplier = amplitude * np.exp(-rate * distance)
         
         spillover_effects = {}
         for subsystem, effect in source_effects.items():
@@ -644,40 +2285,189 @@ class SpatialEffectsCalculator:
             "effective_round": round_number + delay_rounds
         }
     
+    @property
+    def spillover_tree(self):
+        """Quadtree over zone centers for the Barnes-Hut mode, built on first use and whenever the layout changes"""
+        layout_version = self.layout_version
+        if self._spillover_tree is None or self._spillover_tree.layout_version != layout_version:
+            self._spillover_tree = SpilloverQuadtree(self.spatial_index.centers, layout_version=layout_version)
+        return self._spillover_tree
+    
+    def _calculate_far_field_spillover(self, zone_base_effects, total_effects, round_number):
+        """Barnes-Hut spillover: adjacent targets exactly and in detail, everything else aggregated per source
+        
+        The tree sums the non-adjacent kernel over all other zones; adjacent targets are then
+        swapped from that kernel to the exact adjacent spillover.
+        """
+        index = self.spatial_index
+        sources = [zone for zone in zone_base_effects if zone in index.position]
+        positions = [index.position[zone] for zone in sources]
+        sums, approximated, exact_pairs = self.spillover_tree.kernel_sums(
+            index.centers[positions], positions, self.spillover_theta
+        )
+        
+        far_field = {}
+        for source_zone, kernel_sum in zip(sources, sums.tolist()):
+            source_effects = zone_base_effects[source_zone]
+            for target_zone in self.adjacency.get(source_zone, []):
+                if target_zone == source_zone or target_zone not in index.position:
+                    continue
+                spillover = self._calculate_spillover(source_zone, target_zone, source_effects, round_number)
+                total_effects["spillover_effects"].setdefault(target_zone, {})[source_zone] = spillover
+                kernel_sum -= float(spillover_decay_kernel(spillover["distance"]))
+                exact_pairs += 1
+            far_field[source_zone] = {subsystem: effect * kernel_sum for subsystem, effect in source_effects.items()}
+        
+        total_effects["far_field_spillover"] = far_field
+        total_effects["far_field_stats"] = {
+            "theta": self.spillover_theta,
+            "approximated_nodes": approximated,
+            "exact_pairs": exact_pairs
+        }
+        return exact_pairs + approximated
+    
+    @property
+    def population_raster(self):
+        """Population grid for the raster mode, built on first use"""
+        if self._population_raster is None or self._population_raster.zones is not self.zones:
+            self._population_raster = PopulationRaster(self.zones)
+        return self._population_raster
+    
+    def calculate_raster_spillover_field(self, zone_base_effects):
+        """Per-cell spillover field (subsystem, x, y) for the raster mode"""
+        return self.population_raster.spillover(zone_base_effects)[0]
+    
+    def _calculate_raster_spillover(self, zone_base_effects, total_effects):
+        """Raster spillover: FFT convolution over the population grid, aggregated back to receiving zones"""
+        raster = self.population_raster
+        _, zone_spillover = raster.spillover(zone_base_effects)
+        total_effects["raster_spillover"] = zone_spillover
+        total_effects["raster_stats"] = {
+            "cell_size": raster.cell_size,
+            "shape": list(raster.shape),
+            "cells": int(raster.zone_grid.size)
+        }
+    
+    @property
+    def spillover_network(self):
+        """Adjacency decay matrix for the network mode, built on first use"""
+        network = self._spillover_network
+        if network is None or network.zones is not self.zones or network.adjacency is not self.adjacency:
+            self._spillover_network = SpilloverNetwork(self.zones, self.adjacency)
+            self._propagation_solution = None
+        return self._spillover_network
+    
+    def _calculate_network_spillover(self, zone_base_effects, total_effects, round_number):
+        """Network spillover: multi-hop cascade through adjacency plus one-hop nearby/distant spillover
+        
+        Adjacent spillover is replaced by the fixed point of (I - alpha W) x = b, warm-started from
+        the previous solve; the cascade is aggregated per receiving zone.
+        """
+        spillover_pairs = 0
+        for source_zone, source_effects in zone_base_effects.items():
+            adjacent = self.adjacency.get(source_zone, [])
+            for target_zone in self._spillover_targets(source_zone, source_effects):
+                if target_zone != source_zone and target_zone not in adjacent:
+                    spillover = self._calculate_spillover(source_zone, target_zone, source_effects, round_number)
+                    total_effects["spillover_effects"].setdefault(target_zone, {})[source_zone] = spillover
+                    spillover_pairs += 1
+        
+        network = self.spillover_network
+        direct = np.zeros((len(network.zone_ids), len(SUBSYSTEMS)))
+        for zone, effects in zone_base_effects.items():
+            if zone in network.position:
+                direct[network.position[zone]] = [effects.get(subsystem, 0.0) for subsystem in SUBSYSTEMS]
+        
+        solution, stats = network.solve(direct, self.spillover_alpha, self._propagation_solution)
+        self._propagation_solution = solution
+        received = solution - direct
+        total_effects["network_spillover"] = {
+            network.zone_ids[i]: dict(zip(SUBSYSTEMS, received[i].tolist()))
+            for i in np.flatnonzero(np.abs(received).max(axis=1) > 0).tolist()
+        }
+        total_effects["network_stats"] = stats
+        return spillover_pairs + len(network.weights) * stats["iterations"]
+    
     def _calculate_cross_zone_synergies(self, zone_actions_dict, zone_base_effects):
-        """Calculate synergistic effects between multiple zones"""
+        """Calculate synergistic effects between multiple zones
+        
+        A pair scores 0.3 * sqrt(effect1 * effect2) summed over the subsystems both zones affect,
+        times 1 / (1 + 0.1 * distance); pairs are scored in row blocks over the zone x subsystem
+        effect matrix. With synergy_top_k only the strongest pairs are kept and the rest are summed
+        into one SYNERGY_AGGREGATE_KEY entry, so the city total is unchanged.
+        """
         synergies = {}
         zones = list(zone_actions_dict.keys())
+        zone_count = len(zones)
+        if zone_count < 2:
+            return synergies
+        
+        effects = np.array([
+            [zone_base_effects.get(zone, {}).get(subsystem, 0) for subsystem in SUBSYSTEMS] for zone in zones
+        ], dtype=np.float64)
+        effects = np.where(effects > 0, effects, 0.0)
+        index = self.spatial_index
+        centers = index.centers[[index.position[zone] for zone in zones]]
+        
+        top_k = self.synergy_top_k
+        kept_first, kept_second, kept_scores, kept_distances = [], [], [], []
+        rest_score, rest_pairs = 0.0, 0
+        block = max(1, SYNERGY_PAIR_CHUNK // zone_count)
+        for start in range(0, zone_count - 1, block):
+            rows = np.arange(start, min(start + block, zone_count - 1))
+            first, second = np.nonzero(np.arange(zone_count)[None, :] > rows[:, None])
+            first = rows[first]
+            
+            synergy = (np.sqrt(effects[first] * effects[second]) * 0.3).sum(axis=1)
+            offsets = centers[first] - centers[second]
+            distance = np.sqrt(offsets[:, 0] ** 2 + offsets[:, 1] ** 2)
+            scores = synergy * (1.0 / (1.0 + distance * 0.1))
+            
+            kept_first.append(first)
+            kept_second.append(second)
+            kept_scores.append(scores)
+            kept_distances.append(distance)
+            if top_k and sum(len(part) for part in kept_scores) > 2 * top_k:
+                kept_first, kept_second, kept_scores, kept_distances, pruned_score, pruned_pairs = self._prune_synergy_pairs(
+                    kept_first, kept_second, kept_scores, kept_distances, top_k
+                )
+                rest_score += pruned_score
+                rest_pairs += pruned_pairs
         
-        for i, zone1 in enumerate(zones):
-            for j, zone2 in enumerate(zones):
-                if i < j:
-                    synergy_key = f"{zone1}-{zone2}"
-                    
-                    effects1 = zone_base_effects.get(zone1, {})
-                    effects2 = zone_base_effects.get(zone2, {})
-                    
-                    synergy_score = 0
-                    for subsystem in ["Human-Social", "Spatial", "Air-Soundscape", "Thermal"]:
-                        effect1 = effects1.get(subsystem, 0)
-                        effect2 = effects2.get(subsystem, 0)
-                        
-                        if effect1 > 0 and effect2 > 0:
-                            synergy = math.sqrt(effect1 * effect2) * 0.3
-                            synergy_score += synergy
-                    
-                    distance = self.calculate_euclidean_distance(zone1, zone2)
-                    distance_factor = 1.0 / (1.0 + distance * 0.1)
-                    
-                    synergies[synergy_key] = {
-                        "synergy_score": synergy_score * distance_factor,
-                        "distance": distance,
-                        "zones": [zone1, zone2]
-                    }
+        if top_k:
+            kept_first, kept_second, kept_scores, kept_distances, pruned_score, pruned_pairs = self._prune_synergy_pairs(
+                kept_first, kept_second, kept_scores, kept_distances, top_k
+            )
+            rest_score += pruned_score
+            rest_pairs += pruned_pairs
+        
+        first, second, scores, distance = (np.concatenate(parts) for parts in (kept_first, kept_second, kept_scores, kept_distances))
+        order = np.lexsort((second, first))
+        for i, j, score, pair_distance in zip(first[order].tolist(), second[order].tolist(),
+                                              scores[order].tolist(), distance[order].tolist()):
+            synergies[f"{zones[i]}-{zones[j]}"] = {
+                "synergy_score": score,
+                "distance": pair_distance,
+                "zones": [zones[i], zones[j]]
+            }
+        
+        if rest_pairs:
+            synergies[SYNERGY_AGGREGATE_KEY] = {"synergy_score": rest_score, "pair_count": rest_pairs}
         
         return synergies
     
-    def _calculate_total_city_impact(self, direct_effects, spillover_effects, cross_zone_synergies):
+    @staticmethod
+    def _prune_synergy_pairs(first, second, scores, distances, top_k):
+        """Keep the top_k pairs by score; returns the kept columns plus the pruned score sum and count"""
+        first, second, scores, distances = (np.concatenate(parts) for parts in (first, second, scores, distances))
+        if len(scores) <= top_k:
+            return [first], [second], [scores], [distances], 0.0, 0
+        keep = np.argpartition(-scores, top_k - 1)[:top_k]
+        pruned = np.ones(len(scores), dtype=bool)
+        pruned[keep] = False
+        return [first[keep]], [second[keep]], [scores[keep]], [distances[keep]], float(scores[pruned].sum()), int(pruned.sum())
+    
+    def _calculate_total_city_impact(self, direct_effects, spillover_effects, cross_zone_synergies, aggregated_spillover=None):
         """Calculate total city-wide impact"""
         total_impact = {"Human-Social": 0, "Spatial": 0, "Air-Soundscape": 0, "Thermal": 0}
         
@@ -695,6 +2485,10 @@ class SpatialEffectsCalculator:
             for subsystem in total_impact.keys():
                 total_impact[subsystem] += synergy_per_subsystem
         
+        for zone, effects in (aggregated_spillover or {}).items():
+            for subsystem, effect in effects.items():
+                total_impact[subsystem] += effect
+        
         return total_impact
     
     def _calculate_zone_performance(self, zone, zone_effects, total_effects):
@@ -703,10 +2497,7 @@ class SpatialEffectsCalculator:
         
         total_zone_effect = sum(zone_effects.values()) if zone_effects else 0
         
-        priority_multipliers = {
-            "Emergency": 2.2, "Critical": 1.8, "High": 1.5, "Medium": 1.0, "Low": 0.8
-        }
-        priority_multiplier = priority_multipliers.get(zone_info.get("priority_level", "Medium"), 1.0)
+        priority_multiplier = PRIORITY_MULTIPLIERS.get(zone_info.get("priority_level", "Medium"), 1.0)
         
         uec_score = total_zone_effect * priority_multiplier / 10.0
         
@@ -719,6 +2510,485 @@ class SpatialEffectsCalculator:
             "improvement_potential": max(0, 6.0 - uec_score)
         }
 
+# EFFECTS CACHE
+EFFECTS_CACHE_VERSION = 1  # Bump when the engine's formulas change so old entries stop matching
+EFFECTS_CACHE_DIR = os.environ.get("URBAN_PULSE_EFFECTS_CACHE_DIR", "urban_pulse_effects_cache")  # "" disables the disk layer
+EFFECTS_CACHE_MAX_BYTES = int(float(os.environ.get("URBAN_PULSE_EFFECTS_CACHE_MAX_MB", "256") or 256) * 2**20)
+EFFECTS_CACHE_LOW_WATERMARK = 0.8  # Eviction trims the disk layer to this share of the limit
+EFFECTS_MEMORY_CACHE_SIZE = 128
+
+def effects_dataset_version(calculator):
+    """Hash of everything besides the configuration that feeds the engine, cached per calculator"""
+    if calculator._effects_dataset_version is None:
+        payload = json.dumps([
+            EFFECTS_CACHE_VERSION, calculator.zones, calculator.adjacency, calculator.zone_multipliers,
+            calculator.loop_data, STRATEGIES, PRIORITY_MULTIPLIERS, SPILLOVER_DECAY, SPILLOVER_NEARBY_DISTANCE
+        ], sort_keys=True, default=str)
+        calculator._effects_dataset_version = hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+    return calculator._effects_dataset_version
+
+def effects_cache_key(calculator, zone_actions_dict, round_number):
+    """Content hash of a configuration, the subsystems its strategies resolve to, the engine
+    parameters and the dataset version"""
+    # Custom strategies live in the session, so the key holds what they resolve to rather than their names
+    configuration = {
+        zone: {
+            "strategies": zone_data.get("strategies", []),
+            "actions": zone_data.get("actions", []),
+            "subsystems": sorted(calculator._get_subsystems_from_strategies(zone_data.get("strategies", [])))
+        }
+        for zone, zone_data in zone_actions_dict.items()
+    }
+    parameters = {
+        "mode": calculator.spillover_mode,
+        "epsilon": calculator.spillover_epsilon,
+        "theta": calculator.spillover_theta,
+        "alpha": calculator.spillover_alpha,
+        "synergy_top_k": calculator.synergy_top_k
+    }
+    # Zone order is part of the key: it sets the order of the result's entries
+    payload = json.dumps([effects_dataset_version(calculator), list(configuration.items()), round_number, parameters],
+                         sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=20).hexdigest()
+
+class DiskEffectsCache:
+    """Content-addressed effects on disk: one zlib-compressed JSON file per key, written atomically
+    
+    Reads refresh a file's mtime, and once the directory grows past max_bytes the least recently
+    used files are removed down to the low watermark.
+    """
+    
+    def __init__(self, directory, max_bytes=EFFECTS_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+    
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json.z")
+    
+    def _scan(self):
+        """(mtime, size, path) of every cache file"""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json.z"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+    
+    def get(self, key):
+        """Serialized effects (JSON bytes) or None"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as handle:
+                payload = zlib.decompress(handle.read())
+            os.utime(path)
+        except (OSError, zlib.error):
+            return None
+        return payload
+    
+    def put(self, key, payload):
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        data = zlib.compress(payload, 6)
+        fd, temp_path = tempfile.mkstemp(prefix=".effects_", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._total_bytes += len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+    
+    def _evict(self):
+        entries = sorted(self._scan())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EFFECTS_CACHE_LOW_WATERMARK
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+    
+    def clear(self):
+        with self._lock:
+            for _, _, path in self._scan():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._total_bytes = 0
+
+@st.cache_resource
+def get_effects_memory_cache():
+    """Process-wide in-memory layer of serialized engine results"""
+    return LRUCache(EFFECTS_MEMORY_CACHE_SIZE)
+
+@st.cache_resource
+def get_disk_effects_cache():
+    """Process-wide disk layer, or None when URBAN_PULSE_EFFECTS_CACHE_DIR is empty"""
+    return DiskEffectsCache(EFFECTS_CACHE_DIR) if EFFECTS_CACHE_DIR else None
+
+def cached_multi_zone_effects(calculator, zone_actions_dict, round_number):
+    """calculate_multi_zone_effects behind an in-memory LRU and the disk cache
+    
+    Both layers hold serialized JSON, so every caller gets its own copy. Cached results carry
+    plain floats where a fresh calculation has numpy floats; the values are identical.
+    """
+    key = effects_cache_key(calculator, zone_actions_dict, round_number)
+    memory_cache = get_effects_memory_cache()
+    payload = memory_cache.get(key)
+    if payload is not None:
+        CACHE_REQUESTS.labels(cache="effects_memory", result="hit").inc()
+        return json.loads(payload)
+    CACHE_REQUESTS.labels(cache="effects_memory", result="miss").inc()
+    
+    disk_cache = get_disk_effects_cache()
+    payload = disk_cache.get(key) if disk_cache else None
+    if payload is not None:
+        CACHE_REQUESTS.labels(cache="effects_disk", result="hit").inc()
+        effects = json.loads(payload)
+    else:
+        if disk_cache:
+            CACHE_REQUESTS.labels(cache="effects_disk", result="miss").inc()
+        effects = calculator.calculate_multi_zone_effects(zone_actions_dict, round_number)
+        payload = json.dumps(effects, separators=(",", ":"), default=str).encode("utf-8")
+        if disk_cache:
+            try:
+                disk_cache.put(key, payload)
+            except OSError:
+                pass  # A read-only or full disk only costs the cache
+    
+    memory_cache.put(key, payload)
+    return effects
+
+# EFFECT PREVIEWS
+PREVIEW_MAX_ACTIONS = max(len(strategy["Actions"]) for strategy in STRATEGIES)
+PREVIEW_DEFAULT_ACTIONS = 3
+
+class EffectPreviewTable:
+    """Engine results for every zone × predefined strategy × action count, each strategy configured
+    alone in one zone
+    
+    effects holds the zone's direct effect per subsystem (SUBSYSTEMS order), zone_uec the engine's
+    zone UEC score and city_uec the city's overall UEC, i.e. the strategy's marginal contribution to
+    an empty city. Action counts a strategy cannot reach stay NaN.
+    """
+    
+    def __init__(self, zone_ids, strategy_names, max_actions=PREVIEW_MAX_ACTIONS):
+        self.zone_ids = list(zone_ids)
+        self.strategy_names = list(strategy_names)
+        self.max_actions = max_actions
+        self.zone_position = {zone_id: i for i, zone_id in enumerate(self.zone_ids)}
+        self.strategy_position = {name: i for i, name in enumerate(self.strategy_names)}
+        shape = (len(self.zone_ids), len(self.strategy_names), max_actions)
+        self.effects = np.full(shape + (len(SUBSYSTEMS),), np.nan)
+        self.zone_uec = np.full(shape, np.nan)
+        self.city_uec = np.full(shape, np.nan)
+    
+    @classmethod
+    def build(cls, calculator, max_actions=PREVIEW_MAX_ACTIONS, round_number=1):
+        """Run the engine once per cell"""
+        table = cls(calculator.zones.keys(), [strategy["Strategy"] for strategy in STRATEGIES], max_actions)
+        for z, zone_id in enumerate(table.zone_ids):
+            for s, strategy in enumerate(STRATEGIES):
+                for count in range(1, min(max_actions, len(strategy["Actions"])) + 1):
+                    effects = calculator.calculate_multi_zone_effects(
+                        {zone_id: {"strategies": [strategy["Strategy"]], "actions": strategy["Actions"][:count]}},
+                        round_number
+                    )
+                    direct = effects["direct_effects"][zone_id]
+                    table.effects[z, s, count - 1] = [direct.get(subsystem, 0.0) for subsystem in SUBSYSTEMS]
+                    table.zone_uec[z, s, count - 1] = effects["zone_performance"][zone_id]["uec_score"]
+                    table.city_uec[z, s, count - 1] = calculate_normalized_uec_score(effects)["overall_uec"]
+        return table
+    
+    def lookup(self, zone_id, strategy_name, action_count):
+        """Preview for one cell, or None when the zone or strategy is not in the table"""
+        z = self.zone_position.get(zone_id)
+        s = self.strategy_position.get(strategy_name)
+        if z is None or s is None:
+            return None
+        # A strategy with fewer actions than asked for previews all of them
+        column = self.zone_uec[z, s]
+        count = min(max(1, action_count), int(np.count_nonzero(~np.isnan(column))))
+        return {
+            "action_count": count,
+            "effects": dict(zip(SUBSYSTEMS, self.effects[z, s, count - 1].tolist())),
+            "zone_uec": float(self.zone_uec[z, s, count - 1]),
+            "city_uec": float(self.city_uec[z, s, count - 1])
+        }
+    
+    def zone_frame(self, zone_id, action_count):
+        """One row per strategy for a zone, best city contribution first"""
+        rows = []
+        for strategy_name in self.strategy_names:
+            preview = self.lookup(zone_id, strategy_name, action_count)
+            if preview is None:
+                continue
+            rows.append({
+                "Strategy": strategy_name,
+                "Actions": preview["action_count"],
+                "Zone UEC": round(preview["zone_uec"], 2),
+                "City UEC +": round(preview["city_uec"], 2),
+                "Direct Effect": round(sum(preview["effects"].values()), 1)
+            })
+        return pd.DataFrame(rows).sort_values("City UEC +", ascending=False, ignore_index=True) if rows else pd.DataFrame(rows)
+
+@st.cache_resource(max_entries=4)
+def _cached_effect_previews(dataset_version, parameters, _calculator):
+    return EffectPreviewTable.build(_calculator)
+
+def get_effect_previews(calculator):
+    """Preview table for a calculator's city and spillover settings, built once per process and shared across sessions"""
+    parameters = (calculator.spillover_mode, calculator.spillover_epsilon, calculator.spillover_theta, calculator.spillover_alpha)
+    return _cached_effect_previews(effects_dataset_version(calculator), parameters, calculator)
+
+# NEXT BEST MOVE
+RECOMMENDER_TOP_N = 5
+STRATEGY_GAINS_CACHE_SIZE = 64  # Plans whose zone x strategy gain matrix is kept
+STRATEGY_GAIN_MAX_ZONES = 40  # Heatmap rows on large cities
+RECOMMENDER_CANDIDATE_SETS = 4  # Strategy lists (predefined plus a session's custom ones) with cached new-zone candidates
+
+class MoveRecommender:
+    """Marginal overall UEC of every feasible next move, scored in one batched pass
+    
+    Moves are adding an unconfigured zone with one strategy and its actions, adding a strategy
+    (with its new actions) to a configured zone, or one more action in a configured zone. Each move
+    changes one zone's direct effects by delta, so the city total changes by delta * (1 + reach)
+    for the spillover the zone sends out, plus the change in its synergy with every other
+    configured zone; synergy factorizes as 0.3 * sqrt(effects) . sum_j sqrt(effects_j) * w(distance).
+    Gains follow the exact spillover model; cutoffs, approximate modes and synergy pruning are ignored.
+    """
+    
+    def __init__(self, calculator):
+        self.calculator = calculator
+        # Direct effects use the compiled formulas; large cities get a table without the action axis
+        self.tables = calculator.compiled_tables or CompiledScoringTables(calculator, max_actions=0)
+        index = calculator.spatial_index
+        self.zone_ids = index.zone_ids
+        self.position = index.position
+        self.centers = index.centers
+        self.reach = self._spillover_reach(calculator)
+        self.uec_max = np.array([UEC_MAX_VALUES[subsystem] for subsystem in SUBSYSTEMS])
+        self.uec_weights = np.array([UEC_WEIGHTS[subsystem] for subsystem in SUBSYSTEMS])
+        self._candidates = {}
+        # Warm the candidates for the predefined strategies
+        self._zone_candidates(
+            np.array([subsystem_mask(strategy["Subsystems"]) for strategy in STRATEGIES], dtype=np.intp),
+            np.array([len(dict.fromkeys(strategy["Actions"])) for strategy in STRATEGIES], dtype=np.intp)
+        )
+    
+    def _spillover_reach(self, calculator):
+        """Per zone, the sum of its decay multipliers to every other zone: spillover sent per unit effect"""
+        theta = 0.0 if len(self.zone_ids) <= COMPILED_MAX_ZONES else calculator.spillover_theta
+        positions = np.arange(len(self.zone_ids))
+        reach, _, _ = calculator.spillover_tree.kernel_sums(self.centers, positions, theta)
+        # Adjacent targets decay with their own kernel
+        network = calculator.spillover_network
+        distance = np.hypot(*(self.centers[network.rows] - self.centers[network.indices]).T)
+        reach += np.bincount(network.indices, weights=network.weights - spillover_decay_kernel(distance),
+                             minlength=len(self.zone_ids))
+        return reach
+    
+    def overall_uec(self, total_impact):
+        """calculate_normalized_uec_score's overall_uec for arrays of (..., subsystems) totals"""
+        return np.minimum(total_impact / self.uec_max * 100, 100) @ self.uec_weights
+    
+    def _synergy_field(self, zones, configured_positions, configured_effects, exclude_self):
+        """sum_j sqrt(effects_j) * w(distance to j) per subsystem for each zone in zones"""
+        points, others = self.centers[zones], self.centers[configured_positions]
+        dx = points[:, 0, None] - others[None, :, 0]
+        dy = points[:, 1, None] - others[None, :, 1]
+        weight = 1.0 / (1.0 + np.sqrt(dx * dx + dy * dy) * 0.1)
+        if exclude_self:
+            weight[zones[:, None] == configured_positions[None, :]] = 0.0
+        return weight @ np.sqrt(configured_effects)
+    
+    def strategy_gains(self, zone_actions_dict, effects):
+        """Marginal overall UEC of adding each strategy to each zone, as a zones x strategies matrix
+        
+        Unconfigured zones get the strategy with all its actions, configured zones get it with the
+        actions they do not have yet; strategies a zone already uses are NaN. Returns a dict with
+        the matrix ("gains"), the actions each cell adds and the plan state recommend() reuses.
+        """
+        calculator = self.calculator
+        strategies = STRATEGIES + list(st.session_state.custom_strategies.values())
+        strategy_names = [strategy["Strategy"] for strategy in strategies]
+        strategy_masks = np.array([self.tables.strategy_mask([name]) for name in strategy_names], dtype=np.intp)
+        strategy_actions = [list(dict.fromkeys(strategy.get("Actions", []))) for strategy in strategies]
+        counts = np.array([len(actions) for actions in strategy_actions], dtype=np.intp)
+        
+        effects = effects or {}
+        total = np.array([effects.get("total_city_impact", {}).get(subsystem, 0.0) for subsystem in SUBSYSTEMS], dtype=np.float64)
+        current_uec = float(self.overall_uec(total))
+        direct = effects.get("direct_effects", {})
+        configured = [zone for zone in direct if zone in self.position and zone in zone_actions_dict]
+        configured_positions = np.array([self.position[zone] for zone in configured], dtype=np.intp)
+        configured_effects = np.array([
+            [max(direct[zone].get(subsystem, 0.0), 0.0) for subsystem in SUBSYSTEMS] for zone in configured
+        ], dtype=np.float64).reshape(len(configured), len(SUBSYSTEMS))
+        
+        # Every zone as a new zone; the synergy field broadcasts over strategies
+        spread, root = self._zone_candidates(strategy_masks, counts)
+        field = self._synergy_field(np.arange(len(self.zone_ids)), configured_positions, configured_effects, exclude_self=False)
+        synergy = 0.3 * np.einsum("zsk,zk->zs", root, field)
+        gains = self.overall_uec(total + spread + (synergy / 4)[..., None]) - current_uec
+        added = np.broadcast_to(counts, gains.shape).copy()
+        
+        # Configured zones: rows rescored from their current effects
+        zone_masks, zone_counts, zone_added, zone_used = [], [], [], []
+        for zone in configured:
+            zone_data = zone_actions_dict[zone]
+            zone_actions = set(zone_data.get("actions", []))
+            zone_masks.append(subsystem_mask(calculator._get_subsystems_from_strategies(zone_data.get("strategies", []))))
+            zone_counts.append(len(zone_data.get("actions", [])))
+            zone_added.append([sum(action not in zone_actions for action in actions) for actions in strategy_actions])
+            zone_used.append([name in zone_data.get("strategies", []) for name in strategy_names])
+        zone_masks, zone_counts = np.array(zone_masks, dtype=np.intp), np.array(zone_counts, dtype=np.intp)
+        if configured:
+            zone_added = np.array(zone_added, dtype=np.intp)
+            new_effects = self.tables._direct_effects(
+                configured_positions[:, None], zone_masks[:, None] | strategy_masks[None, :], zone_counts[:, None] + zone_added
+            )
+            field = self._synergy_field(configured_positions, configured_positions, configured_effects, exclude_self=True)
+            configured_gains = self._gains(total, current_uec, self.reach[configured_positions][:, None],
+                                           configured_effects[:, None, :], new_effects, field[:, None, :])
+            gains[configured_positions] = np.where(np.array(zone_used), np.nan, configured_gains)
+            added[configured_positions] = zone_added
+        
+        return {
+            "gains": gains,
+            "actions": added,
+            "strategies": strategy_names,
+            "strategy_actions": strategy_actions,
+            "current_uec": current_uec,
+            "total": total,
+            "configured": configured,
+            "configured_positions": configured_positions,
+            "configured_effects": configured_effects,
+            "zone_masks": zone_masks,
+            "zone_counts": zone_counts
+        }
+    
+    def recommend(self, zone_actions_dict, effects, top_n=RECOMMENDER_TOP_N, plan=None):
+        """Top moves by marginal overall UEC, best first, as dicts; plan is a precomputed strategy_gains()"""
+        plan = plan or self.strategy_gains(zone_actions_dict, effects)
+        strategy_names, strategy_actions = plan["strategies"], plan["strategy_actions"]
+        current_uec = plan["current_uec"]
+        
+        # One more action in configured zones whose strategies still have unused actions
+        action_moves, positions, rows = [], [], []
+        for j, zone in enumerate(plan["configured"]):
+            zone_data = zone_actions_dict[zone]
+            available = [
+                action for name in zone_data.get("strategies", []) if name in strategy_names
+                for action in strategy_actions[strategy_names.index(name)] if action not in zone_data.get("actions", [])
+            ]
+            if available:
+                action_moves.append({"move": "Add action", "zone": zone, "strategy": None, "action": available[0], "actions": 1})
+                positions.append(plan["configured_positions"][j])
+                rows.append(j)
+        if action_moves:
+            positions, rows = np.array(positions, dtype=np.intp), np.array(rows, dtype=np.intp)
+            new_effects, _ = self.tables.score_zones(positions, plan["zone_masks"][rows], plan["zone_counts"][rows] + 1)
+            field = self._synergy_field(positions, plan["configured_positions"], plan["configured_effects"], exclude_self=True)
+            action_gains = self._gains(plan["total"], current_uec, self.reach[positions],
+                                       plan["configured_effects"][rows], new_effects, field)
+        else:
+            action_gains = np.zeros(0)
+        
+        matrix = plan["gains"]
+        gains = np.concatenate([np.nan_to_num(matrix, nan=-np.inf).ravel(), action_gains])
+        top = np.argpartition(-gains, top_n - 1)[:top_n] if len(gains) > top_n else np.arange(len(gains))
+        top = top[np.lexsort((top, -gains[top]))]
+        configured = set(plan["configured"])
+        recommendations = []
+        for i in top.tolist():
+            if gains[i] <= 0:
+                break
+            if i < matrix.size:
+                z, s = divmod(i, len(strategy_names))
+                zone = self.zone_ids[z]
+                move = {"move": "Add strategy" if zone in configured else "Add zone", "zone": zone,
+                        "strategy": strategy_names[s], "actions": int(plan["actions"][z, s])}
+            else:
+                move = dict(action_moves[i - matrix.size])
+            move["uec_gain"] = float(gains[i])
+            move["projected_uec"] = current_uec + float(gains[i])
+            recommendations.append(move)
+        return recommendations
+    
+    def _gains(self, total, current_uec, reach, old_effects, new_effects, synergy_field):
+        """Change in overall UEC when each zone's direct effects go from old to new (subsystems on the last axis)"""
+        delta = (new_effects - old_effects) * (1.0 + reach)[..., None]
+        synergy = 0.3 * ((np.sqrt(new_effects) - np.sqrt(old_effects)) * synergy_field).sum(axis=-1)
+        return self.overall_uec(total + delta + (synergy / 4)[..., None]) - current_uec
+    
+    def _zone_candidates(self, strategy_masks, counts):
+        """For every zone x strategy: direct effects times (1 + reach) and their square roots
+        
+        Neither depends on the current configuration, so they are kept for the last few strategy lists.
+        """
+        key = (strategy_masks.tobytes(), counts.tobytes())
+        candidates = self._candidates.get(key)
+        if candidates is None:
+            effects = self.tables._direct_effects(np.arange(len(self.zone_ids))[:, None], strategy_masks[None, :], counts[None, :])
+            candidates = (effects * (1.0 + self.reach)[:, None, None], np.sqrt(effects))
+            if len(self._candidates) >= RECOMMENDER_CANDIDATE_SETS:
+                self._candidates.pop(next(iter(self._candidates)))
+            self._candidates[key] = candidates
+        return candidates
+
+@st.cache_resource(max_entries=4)
+def _cached_move_recommender(dataset_version, parameters, _calculator):
+    return MoveRecommender(_calculator)
+
+def get_move_recommender(calculator):
+    """Recommender for a calculator's city, built once per process (spillover reach is per city)"""
+    parameters = (calculator.spillover_theta, calculator.compiled_scoring)
+    return _cached_move_recommender(effects_dataset_version(calculator), parameters, calculator)
+
+@st.cache_resource
+def get_strategy_gains_cache():
+    """Gain matrices per plan, shared across sessions and reruns"""
+    return LRUCache(STRATEGY_GAINS_CACHE_SIZE)
+
+def cached_strategy_gains(calculator, zone_actions_dict, effects, round_number):
+    """MoveRecommender.strategy_gains for a plan, cached by the plan's configuration hash and the
+    session's custom strategies (they add columns); callers must not modify the result"""
+    custom = json.dumps(list(st.session_state.custom_strategies.values()), sort_keys=True, default=str)
+    key = (effects_cache_key(calculator, zone_actions_dict, round_number), hashlib.blake2b(custom.encode("utf-8"), digest_size=16).hexdigest())
+    gains_cache = get_strategy_gains_cache()
+    plan = gains_cache.get(key)
+    if plan is not None:
+        CACHE_REQUESTS.labels(cache="strategy_gains", result="hit").inc()
+        return plan
+    CACHE_REQUESTS.labels(cache="strategy_gains", result="miss").inc()
+    
+    plan = get_move_recommender(calculator).strategy_gains(zone_actions_dict, effects)
+    gains_cache.put(key, plan)
+    return plan
+
 # MULTI-ZONE GAME MANAGER
 class MultiZoneGameManager:
     def __init__(self):
@@ -737,11 +3007,8 @@ class MultiZoneGameManager:
         self.selected_zones[zone_id]["strategies"] = strategies.copy()
         self.selected_zones[zone_id]["actions"] = actions.copy()
     
-    def calculate_round_effects(self):
-        """Calculate effects for current round"""
-        if not self.selected_zones:
-            return None
-        
+    def configured_zone_actions(self):
+        """Selected zones that have both strategies and actions, in the engine's input shape"""
         zone_actions_dict = {}
         
         for zone_id, zone_data in self.selected_zones.items():
@@ -754,36 +3021,53 @@ class MultiZoneGameManager:
                     "actions": actions
                 }
         
+        return zone_actions_dict
+    
+    @profiled("engine")
+    def calculate_round_effects(self):
+        """Calculate effects for current round"""
+        if not self.selected_zones:
+            return None
+        
+        zone_actions_dict = self.configured_zone_actions()
         if not zone_actions_dict:
             return None
         
-        return self.spatial_calculator.calculate_multi_zone_effects(zone_actions_dict, self.current_round)
+        return cached_multi_zone_effects(self.spatial_calculator, zone_actions_dict, self.current_round)
+    
+    def calculate_strategy_gains(self, effects=None):
+        """Zone x strategy marginal UEC for the current plan (see MoveRecommender.strategy_gains)"""
+        zone_actions_dict = self.configured_zone_actions()
+        if effects is None and zone_actions_dict:
+            effects = self.calculate_round_effects()
+        return cached_strategy_gains(self.spatial_calculator, zone_actions_dict, effects, self.current_round)
+
+# Total impact at which a subsystem's score saturates at 100, and the subsystem weights in overall UEC
+UEC_MAX_VALUES = {
+    "Human-Social": 200.0,
+    "Spatial": 150.0,
+    "Air-Soundscape": 100.0,
+    "Thermal": 100.0
+}
+UEC_WEIGHTS = {
+    "Human-Social": 0.4,
+    "Spatial": 0.25,
+    "Air-Soundscape": 0.175,
+    "Thermal": 0.175
+}
 
+@profiled("engine")
 def calculate_normalized_uec_score(effects):
     """Calculate normalized UEC score (0-100 scale)"""
     total_impact = effects.get("total_city_impact", {})
     
-    max_values = {
-        "Human-Social": 200.0,
-        "Spatial": 150.0,
-        "Air-Soundscape": 100.0,
-        "Thermal": 100.0
-    }
-    
     normalized_scores = {}
     for subsystem, impact in total_impact.items():
-        max_val = max_values.get(subsystem, 100.0)
+        max_val = UEC_MAX_VALUES.get(subsystem, 100.0)
         normalized_score = min((impact / max_val) * 100, 100)
         normalized_scores[subsystem] = normalized_score
     
-    weights = {
-        "Human-Social": 0.4,
-        "Spatial": 0.25,
-        "Air-Soundscape": 0.175,
-        "Thermal": 0.175
-    }
-    
-    overall_uec = sum(normalized_scores.get(sub, 0) * weight for sub, weight in weights.items())
+    overall_uec = sum(normalized_scores.get(sub, 0) * weight for sub, weight in UEC_WEIGHTS.items())
     
     return {
         "overall_uec": overall_uec,
@@ -870,9 +3154,271 @@ def create_custom_strategy(strategy_name, description, zone_id):
     
     return custom_strategy
 
+# ZONE ADJACENCY
+ADJACENCY_MODE = os.environ.get("URBAN_PULSE_ADJACENCY", "manual")  # manual, derived or merged
+ADJACENCY_CACHE_SIZE = 16
+
+@st.cache_resource
+def get_adjacency_cache():
+    """Derived adjacency per city version, shared across sessions and reruns"""
+    return LRUCache(ADJACENCY_CACHE_SIZE)
+
+def compute_city_version(zones):
+    """Content hash of zone ids and geometry; changes whenever the layout does"""
+    digest = hashlib.blake2b(digest_size=16)
+    for zone_id, zone_data in zones.items():
+        (x0, y0), (x1, y1) = zone_data["coordinates"]
+        digest.update(f"{zone_id}:{x0},{y0},{x1},{y1};".encode("utf-8"))
+    return digest.hexdigest()
+
+def _rectangles_touch(a, b, tolerance, include_corners):
+    """Rectangles overlap or share a boundary segment (within tolerance)"""
+    gap_x = max(a[0], b[0]) - min(a[2], b[2])
+    gap_y = max(a[1], b[1]) - min(a[3], b[3])
+    if gap_x > tolerance or gap_y > tolerance:
+        return False
+    # A positive-length overlap on one axis means an edge is shared, not just a corner
+    return include_corners or gap_x < 0 or gap_y < 0
+
+def _override_pairs(spec):
+    """Pairs from either an adjacency dict {zone: [neighbours]} or a list of (zone, zone) pairs"""
+    if not spec:
+        return []
+    if isinstance(spec, dict):
+        return [(zone_id, other) for zone_id, neighbours in spec.items() for other in neighbours]
+    return [tuple(pair) for pair in spec]
+
+def derive_zone_adjacency(zones, tolerance=0.0, include_corners=False, overrides=None):
+    """Adjacency computed from zone rectangles
+    
+    Zones are adjacent when their rectangles overlap or share an edge segment,
+    allowing gaps up to tolerance. Rectangles are bucketed into a grid sized to
+    the median zone, so only zones sharing a cell are compared (about O(N) for
+    real layouts instead of O(N^2)). overrides={"add": ..., "remove": ...} merges
+    manual edits, each given as pairs or as an adjacency dict.
+    """
+    zone_ids = list(zones)
+    position = {zone_id: i for i, zone_id in enumerate(zone_ids)}
+    corners = np.array([
+        [*zones[zone_id]["coordinates"][0], *zones[zone_id]["coordinates"][1]] for zone_id in zone_ids
+    ], dtype=np.float64).reshape(len(zone_ids), 4)
+    rectangles = np.column_stack([
+        np.minimum(corners[:, 0], corners[:, 2]), np.minimum(corners[:, 1], corners[:, 3]),
+        np.maximum(corners[:, 0], corners[:, 2]), np.maximum(corners[:, 1], corners[:, 3])
+    ])
+    
+    extents = np.maximum(rectangles[:, 2] - rectangles[:, 0], rectangles[:, 3] - rectangles[:, 1])
+    cell_size = max(float(np.median(extents)) if len(zone_ids) else 1.0, tolerance, 1e-9)
+    low = np.floor((rectangles[:, :2] - tolerance) / cell_size).astype(np.int64)
+    high = np.floor((rectangles[:, 2:] + tolerance) / cell_size).astype(np.int64)
+    
+    buckets = {}
+    for i in range(len(zone_ids)):
+        for cx in range(low[i, 0], high[i, 0] + 1):
+            for cy in range(low[i, 1], high[i, 1] + 1):
+                buckets.setdefault((cx, cy), []).append(i)
+    
+    boxes = rectangles.tolist()
+    pairs = set()
+    checked = set()
+    for members in buckets.values():
+        for offset, i in enumerate(members):
+            for j in members[offset + 1:]:
+                if (i, j) in checked:
+                    continue
+                checked.add((i, j))
+                if _rectangles_touch(boxes[i], boxes[j], tolerance, include_corners):
+                    pairs.add((i, j))
+    
+    overrides = overrides or {}
+    for zone1, zone2 in _override_pairs(overrides.get("add")):
+        if zone1 in position and zone2 in position and zone1 != zone2:
+            pairs.add(tuple(sorted((position[zone1], position[zone2]))))
+    for zone1, zone2 in _override_pairs(overrides.get("remove")):
+        if zone1 in position and zone2 in position:
+            pairs.discard(tuple(sorted((position[zone1], position[zone2]))))
+    
+    neighbours = [[] for _ in zone_ids]
+    for i, j in pairs:
+        neighbours[i].append(j)
+        neighbours[j].append(i)
+    return {zone_id: [zone_ids[j] for j in sorted(neighbours[i])] for i, zone_id in enumerate(zone_ids)}
+
+def get_zone_adjacency(zones, tolerance=0.0, include_corners=False, overrides=None):
+    """derive_zone_adjacency cached per city version; treat the result as read-only"""
+    key = (
+        compute_city_version(zones), tolerance, include_corners,
+        json.dumps(overrides or {}, sort_keys=True, default=list)
+    )
+    adjacency_cache = get_adjacency_cache()
+    cached = adjacency_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    adjacency = derive_zone_adjacency(zones, tolerance, include_corners, overrides)
+    adjacency_cache.put(key, adjacency)
+    return adjacency
+
+def resolve_zone_adjacency(zones, manual=None, mode=ADJACENCY_MODE):
+    """Adjacency for a city: the manual table, geometry-derived, or derived merged with the manual table"""
+    if mode == "manual" and manual is not None:
+        return manual
+    if mode == "merged" and manual is not None:
+        return get_zone_adjacency(zones, overrides={"add": manual})
+    if mode in ("manual", "merged", "derived"):
+        return get_zone_adjacency(zones)
+    raise ValueError(f"Unknown adjacency mode: {mode}")
+
+# SYNTHETIC CITY GENERATOR
+SYNTHETIC_ZONE_AREA = 9  # Average zone footprint in map units, close to the stock zones
+SYNTHETIC_MULTIPLIER_SPREAD = 0.1  # Log-normal jitter applied to archetype multipliers
+
+# Stock zones used as archetypes, by distance band from the city centre (0 = centre, 1 = edge)
+SYNTHETIC_ARCHETYPE_BANDS = [
+    (0.2, ["city_center", "commercial_district"]),
+    (0.5, ["middle_class", "rich_residential", "poor_areas", "central_park", "commercial_district"]),
+    (0.8, ["poor_areas", "formal_slums", "informal_slums", "middle_class", "luxury_park"]),
+    (float("inf"), ["periphery", "informal_slums", "risky_slums", "formal_slums"])
+]
+
+class CompiledCity:
+    """Array form of a city for vectorised kernels
+    
+    Zone order follows zone_ids; multipliers columns follow SUBSYSTEMS and
+    adjacency is stored CSR-style as (adjacency_indptr, adjacency_indices).
+    """
+    
+    def __init__(self, zone_ids, bounds, priority_multipliers, population_density, multipliers,
+                 adjacency_indptr, adjacency_indices):
+        self.zone_ids = zone_ids
+        self.index = {zone_id: i for i, zone_id in enumerate(zone_ids)}
+        self.bounds = bounds
+        self.centers = np.column_stack([
+            (bounds[:, 0] + bounds[:, 2]) / 2,
+            (bounds[:, 1] + bounds[:, 3]) / 2
+        ])
+        self.priority_multipliers = priority_multipliers
+        self.population_density = population_density
+        self.multipliers = multipliers
+        self.adjacency_indptr = adjacency_indptr
+        self.adjacency_indices = adjacency_indices
+    
+    def __len__(self):
+        return len(self.zone_ids)
+    
+    def neighbours(self, zone_index):
+        return self.adjacency_indices[self.adjacency_indptr[zone_index]:self.adjacency_indptr[zone_index + 1]]
+
+def compile_city_arrays(zones, adjacency, zone_multipliers):
+    """Compile CITY_ZONES-shaped tables into a CompiledCity"""
+    zone_ids = list(zones)
+    index = {zone_id: i for i, zone_id in enumerate(zone_ids)}
+    
+    bounds = np.array([
+        [*zones[zone_id]["coordinates"][0], *zones[zone_id]["coordinates"][1]] for zone_id in zone_ids
+    ], dtype=np.float64).reshape(len(zone_ids), 4)
+    priority_multipliers = np.array([
+        PRIORITY_MULTIPLIERS.get(zones[zone_id].get("priority_level", "Medium"), 1.0) for zone_id in zone_ids
+    ])
+    population_density = np.array([
+        zones[zone_id].get("characteristics", {}).get("population_density", 0) for zone_id in zone_ids
+    ], dtype=np.float64)
+    multipliers = np.array([
+        [zone_multipliers.get(subsystem, {}).get(zone_id, 1.0) for subsystem in SUBSYSTEMS] for zone_id in zone_ids
+    ]).reshape(len(zone_ids), len(SUBSYSTEMS))
+    
+    indptr = np.zeros(len(zone_ids) + 1, dtype=np.int64)
+    indices = []
+    for i, zone_id in enumerate(zone_ids):
+        neighbours = [index[other] for other in adjacency.get(zone_id, []) if other in index]
+        indices.extend(neighbours)
+        indptr[i + 1] = indptr[i] + len(neighbours)
+    
+    return CompiledCity(zone_ids, bounds, priority_multipliers, population_density, multipliers,
+                        indptr, np.array(indices, dtype=np.int64))
+
+def _split_city_block(rng, block, count, out):
+    """Recursively cut a block into count rectangles with integer edges"""
+    stack = [(block, count)]
+    while stack:
+        (x0, y0, x1, y1), count = stack.pop()
+        if count == 1:
+            out.append((x0, y0, x1, y1))
+            continue
+        
+        first = count // 2 if count > 3 else rng.randint(1, count - 1)
+        share = first / count
+        vertical = (x1 - x0) >= (y1 - y0)
+        lo, hi = (x0, x1) if vertical else (y0, y1)
+        if hi - lo < 2:
+            vertical = not vertical
+            lo, hi = (x0, x1) if vertical else (y0, y1)
+        if hi - lo < 2:
+            raise ValueError("City area too small for the requested number of zones")
+        
+        cut = round(lo + (hi - lo) * rng.uniform(share * 0.85, min(share * 1.15, 0.95)))
+        cut = min(max(cut, lo + 1), hi - 1)
+        if vertical:
+            stack.append(((x0, y0, cut, y1), first))
+            stack.append(((cut, y0, x1, y1), count - first))
+        else:
+            stack.append(((x0, y0, x1, cut), first))
+            stack.append(((x0, cut, x1, y1), count - first))
+
+def generate_synthetic_city(zone_count, seed=0, as_arrays=False):
+    """Seeded procedural city in the same shape as CITY_ZONES, ZONE_ADJACENCY and ZONE_STRATEGY_MULTIPLIERS
+    
+    Returns (zones, adjacency, zone_multipliers), or a CompiledCity when as_arrays is set.
+    """
+    if zone_count < 1:
+        raise ValueError("zone_count must be at least 1")
+    
+    rng = random.Random(seed)
+    side = max(2, math.ceil(math.sqrt(zone_count * SYNTHETIC_ZONE_AREA)))
+    rectangles = []
+    _split_city_block(rng, (0, 0, side, side), zone_count, rectangles)
+    # Order zones from the centre outwards so zone ids are stable and readable
+    centre = side / 2
+    rectangles.sort(key=lambda r: (math.hypot((r[0] + r[2]) / 2 - centre, (r[1] + r[3]) / 2 - centre), r))
+    
+    max_radius = math.hypot(centre, centre)
+    width = len(str(zone_count - 1))
+    zones = {}
+    zone_multipliers = {subsystem: {} for subsystem in SUBSYSTEMS}
+    for index, (x0, y0, x1, y1) in enumerate(rectangles):
+        radius = math.hypot((x0 + x1) / 2 - centre, (y0 + y1) / 2 - centre) / max_radius
+        archetype_id = rng.choice(next(band for limit, band in SYNTHETIC_ARCHETYPE_BANDS if radius < limit))
+        archetype = CITY_ZONES[archetype_id]
+        zone_id = f"{archetype_id}_{index:0{width}d}"
+        
+        characteristics = dict(archetype["characteristics"])
+        characteristics["population_density"] = max(1, int(characteristics["population_density"] * rng.uniform(0.7, 1.3)))
+        zones[zone_id] = {
+            "name": f"{archetype['name']} {index}",
+            "type": archetype["type"],
+            "coordinates": [(x0, y0), (x1, y1)],
+            "characteristics": characteristics,
+            "plots": max(1, round(archetype["plots"] * (x1 - x0) * (y1 - y0) / SYNTHETIC_ZONE_AREA / 4)),
+            "priority_level": archetype["priority_level"],
+            "archetype": archetype_id
+        }
+        for subsystem in SUBSYSTEMS:
+            base = ZONE_STRATEGY_MULTIPLIERS[subsystem][archetype_id]
+            zone_multipliers[subsystem][zone_id] = round(base * rng.lognormvariate(0, SYNTHETIC_MULTIPLIER_SPREAD), 2)
+    
+    adjacency = derive_zone_adjacency(zones)
+    
+    if as_arrays:
+        return compile_city_arrays(zones, adjacency, zone_multipliers)
+    return zones, adjacency, zone_multipliers
+
 # MAIN APPLICATION
 def main():
     init_session_state()
+    start_metrics_exporters()
+    track_active_session()
+    # Warm start: the first session builds the shared preview table, later ones reuse it
+    get_effect_previews(st.session_state.game_manager.spatial_calculator)
     
     st.markdown('<h1 class="main-header">🏙️ Urban Pulse - Multi-Zone Spatial Analysis</h1>', unsafe_allow_html=True)
     
@@ -888,7 +3434,9 @@ def main():
         "🌊 Spillover Analysis",
         "🔬 Scientific Loop Analysis",
         "📈 Multi-Round Comparison",
-        "📋 Reports & Export"
+        "📋 Reports & Export",
+        "🏆 Live Leaderboard",
+        "🧑‍🏫 Facilitator Dashboard"
     ])
     
     # Display current session info
@@ -898,7 +3446,22 @@ def main():
         st.sidebar.info(f"**Zones:** {len(st.session_state.game_manager.selected_zones)}")
         st.sidebar.info(f"**Custom Strategies:** {len(st.session_state.custom_strategies)}")
     
-    # Route to appropriate page
+    profile = None
+    if PROFILING_AVAILABLE and st.sidebar.checkbox("🐞 Profile reruns", key="profiling_enabled"):
+        profile = start_render_profile(page)
+    
+    try:
+        route_page(page)
+        publish_team_summary(changed=persist_session())
+    finally:
+        if profile is not None:
+            finish_render_profile(profile)
+    
+    if profile is not None:
+        render_profiler_panel(profile)
+
+def route_page(page):
+    """Route to appropriate page"""
     if page == "🎯 Team Setup":
         team_setup_page()
     elif page == "📖 City Introduction":
@@ -919,7 +3482,12 @@ def main():
         multi_round_comparison_page()
     elif page == "📋 Reports & Export":
         reports_export_page()
+    elif page == "🏆 Live Leaderboard":
+        leaderboard_page()
+    elif page == "🧑‍🏫 Facilitator Dashboard":
+        facilitator_dashboard_page()
 
+@profiled("page")
 def team_setup_page():
     st.header("🎯 Team Setup & Game Management")
     
@@ -945,10 +3513,37 @@ def team_setup_page():
                 st.session_state.game_manager.current_round = round_num
                 st.session_state.game_manager.team_id = team_name
                 st.session_state.game_manager.game_id = game_name
+                remember_session_identity(game_name, team_name)
                 st.success(f"✅ Game session started! Team: {team_name}, Round: {round_num}")
                 st.balloons()
             else:
                 st.error("Please enter a team name!")
+        
+        # Offer saved progress for this game/team (e.g. after a server restart)
+        if team_name and team_name != st.session_state.team_name and get_session_store().exists(game_name, team_name):
+            st.info(f"💾 Saved progress found for **{team_name}** in **{game_name}**.")
+            if st.button("♻️ Resume Saved Progress"):
+                try:
+                    resume_session_from_store(game_name, team_name)
+                except SessionImportError as exc:
+                    st.error(f"Could not resume saved progress: {exc}")
+                else:
+                    remember_session_identity(game_name, team_name)
+                    st.rerun()
+        
+        with st.expander("📂 Restore Saved Session", expanded=False):
+            st.markdown("Upload an **Export Current Results**, **Export All Rounds** or **Export Everything** file to continue where your team left off.")
+            uploaded_session = st.file_uploader("Session export", type=["json", "zip"], key="session_import_file")
+            
+            if uploaded_session is not None and st.button("♻️ Restore Session"):
+                try:
+                    manager, session = import_session(uploaded_session.getvalue())
+                except SessionImportError as exc:
+                    st.error(f"Could not restore session: {exc}")
+                else:
+                    apply_restored_session(manager, session)
+                    st.success(f"✅ Restored team {session['team_name']}: {len(manager.selected_zones)} zones, {len(manager.round_history)} saved rounds")
+                    st.rerun()
     
     with col2:
         st.subheader("🎮 Session Status")
@@ -976,8 +3571,10 @@ def team_setup_page():
             st.session_state.team_name = ""
             st.session_state.game_name = ""
             st.session_state.custom_strategies = {}
+            forget_session_identity()
             st.rerun()
 
+@profiled("page")
 def city_introduction_page():
     st.header("📖 Urban Sustainability Challenge - City Overview")
     
@@ -1094,6 +3691,7 @@ def city_introduction_page():
     Remember: You're not just playing a game - you're applying cutting-edge urban science!
     """)
 
+@profiled("page")
 def city_map_page():
     st.header("🗺️ Interactive City Map & Zone Selection")
     
@@ -1265,6 +3863,7 @@ def city_map_page():
         - ⚪ Low priority
         """)
 
+@profiled("page")
 def zone_configuration_page():
     st.header("⚙️ Zone Configuration & Strategy Selection")
     
@@ -1284,9 +3883,28 @@ def zone_configuration_page():
         with zone_tab:
             configure_zone_detailed(zone_id)
 
+@profiled("section")
+def strategy_gain_level(gain):
+    """(indicator, level) for a strategy's marginal UEC gain in a zone; NaN means it is already in the plan"""
+    if math.isnan(gain):
+        return "✅", "In plan"
+    if gain > 5.0:
+        return "🔥", "High"
+    if gain > 1.0:
+        return "⚡", "Good"
+    return "📊", "Moderate"
+
 def configure_zone_detailed(zone_id):
     zone_info = CITY_ZONES[zone_id]
-    zone_data = st.session_state.game_manager.selected_zones[zone_id]
+    manager = st.session_state.game_manager
+    zone_data = manager.selected_zones[zone_id]
+    plan_before = (list(zone_data.get('strategies', [])), list(zone_data.get('actions', [])))
+    
+    # Computed marginal UEC of each strategy in this zone, given the team's plan; the
+    # effectiveness table and the strategy picker labels both read this row
+    strategy_gains = manager.calculate_strategy_gains()
+    zone_row = strategy_gains["gains"][manager.spatial_calculator.spatial_index.position[zone_id]]
+    zone_gains = dict(zip(strategy_gains["strategies"], zone_row.tolist()))
     
     st.subheader(f"🏘️ Configure {zone_info['name']}")
     
@@ -1305,19 +3923,28 @@ def configure_zone_detailed(zone_id):
         **Plots:** {zone_info['plots']}
         """)
         
-        # Strategy effectiveness preview
+        # Strategy effectiveness
         st.markdown("**🎯 Strategy Effectiveness in This Zone:**")
         effectiveness_data = []
-        for subsystem in ["Human-Social", "Spatial", "Air-Soundscape", "Thermal"]:
-            multiplier = ZONE_STRATEGY_MULTIPLIERS.get(subsystem, {}).get(zone_id, 1.0)
+        for strategy_name, gain in zone_gains.items():
             effectiveness_data.append({
-                'Subsystem': subsystem,
-                'Multiplier': f"{multiplier:.2f}x",
-                'Effectiveness': 'High' if multiplier > 1.5 else 'Good' if multiplier > 1.0 else 'Moderate'
+                'Strategy': strategy_name,
+                'UEC Gain': "✅ In plan" if math.isnan(gain) else f"+{max(gain, 0.0):.2f}",
+                'Effectiveness': '—' if math.isnan(gain) else strategy_gain_level(gain)[1]
             })
         
         effectiveness_df = pd.DataFrame(effectiveness_data)
-        st.dataframe(effectiveness_df, use_container_width=True)
+        st.dataframe(effectiveness_df, use_container_width=True, hide_index=True)
+        
+        # Engine preview: precomputed, so changing the slider is only a table lookup
+        st.markdown("**🔮 Engine Preview (each strategy alone in this zone):**")
+        previews = get_effect_previews(st.session_state.game_manager.spatial_calculator)
+        preview_actions = st.slider(
+            "Actions per strategy",
+            1, previews.max_actions, min(PREVIEW_DEFAULT_ACTIONS, previews.max_actions),
+            key=f"preview_actions_{zone_id}"
+        )
+        st.dataframe(previews.zone_frame(zone_id, preview_actions), use_container_width=True, hide_index=True)
         
         # Quick Custom Strategy Creator
         st.markdown("**✨ Create Custom Strategy for This Zone:**")
@@ -1352,75 +3979,27 @@ def configure_zone_detailed(zone_id):
         st.markdown("**🎯 Select Strategies:**")
         
         current_strategies = zone_data.get('strategies', [])
+        strategy_options = list(dict.fromkeys(
+            [strategy['Strategy'] for strategy in STRATEGIES] + list(st.session_state.custom_strategies)
+        ))
         
-        # Create a mapping for strategy lookup
-        strategy_lookup = {}
-        strategy_options = []
-        
-        # Add predefined strategies
-        for strategy in STRATEGIES:
-            # Calculate effectiveness for this zone
-            effectiveness = 1.0
-            for subsystem in strategy['Subsystems']:
-                multiplier = ZONE_STRATEGY_MULTIPLIERS.get(subsystem, {}).get(zone_id, 1.0)
-                effectiveness *= multiplier
-            
-            avg_effectiveness = effectiveness ** (1.0 / len(strategy['Subsystems']))
-            
-            if avg_effectiveness > 1.5:
-                indicator = "🔥 HIGH"
-            elif avg_effectiveness > 1.0:
-                indicator = "⚡ GOOD"
-            else:
-                indicator = "📊 MODERATE"
-            
-            display_name = f"{indicator} {strategy['Strategy']}"
-            strategy_options.append(display_name)
-            strategy_lookup[display_name] = strategy['Strategy']
-        
-        # Add custom strategies
-        for custom_name, custom_strategy in st.session_state.custom_strategies.items():
-            # Calculate effectiveness for this zone
-            effectiveness = 1.0
-            for subsystem in custom_strategy['Subsystems']:
-                multiplier = ZONE_STRATEGY_MULTIPLIERS.get(subsystem, {}).get(zone_id, 1.0)
-                effectiveness *= multiplier
-            
-            avg_effectiveness = effectiveness ** (1.0 / len(custom_strategy['Subsystems']))
-            
-            if avg_effectiveness > 1.5:
-                indicator = "🔥 HIGH"
-            elif avg_effectiveness > 1.0:
-                indicator = "⚡ GOOD"
-            else:
-                indicator = "📊 MODERATE"
-            
-            display_name = f"{indicator} ✨ {custom_strategy['Strategy']}"
-            strategy_options.append(display_name)
-            strategy_lookup[display_name] = custom_strategy['Strategy']
-        
-        # Find currently selected options
-        selected_display_names = []
-        for strategy_name in current_strategies:
-            for display_name, actual_name in strategy_lookup.items():
-                if actual_name == strategy_name:
-                    selected_display_names.append(display_name)
-                    break
+        def strategy_label(strategy_name):
+            # Same gain thresholds as the effectiveness table
+            indicator, level = strategy_gain_level(zone_gains.get(strategy_name, 0.0))
+            badge = indicator if level == "In plan" else f"{indicator} {level.upper()}"
+            custom = "✨ " if strategy_name in st.session_state.custom_strategies else ""
+            return f"{badge} {custom}{strategy_name}"
         
-        selected_strategies_display = st.multiselect(
+        selected_strategies = st.multiselect(
             "Choose strategies for this zone:",
             strategy_options,
-            default=selected_display_names,
+            default=[strategy_name for strategy_name in current_strategies if strategy_name in strategy_options],
+            format_func=strategy_label,
             key=f"strategies_{zone_id}",
-            help="🔥 = High effectiveness, ⚡ = Good effectiveness, 📊 = Moderate effectiveness, ✨ = Custom strategy"
+            help="UEC gain of adding the strategy here: 🔥 = High (> 5), ⚡ = Good (> 1), 📊 = Moderate, "
+                 "✅ = already in this zone's plan, ✨ = Custom strategy"
         )
         
-        # Extract actual strategy names using lookup
-        selected_strategies = []
-        for display_name in selected_strategies_display:
-            if display_name in strategy_lookup:
-                selected_strategies.append(strategy_lookup[display_name])
-        
         # Update zone data
         zone_data['strategies'] = selected_strategies
         
@@ -1497,6 +4076,10 @@ def configure_zone_detailed(zone_id):
                             if strategy_name in strategy_action_map:
                                 st.write(f"**Available Actions:** {', '.join(strategy_action_map[strategy_name])}")
     
+    # The gains above describe the plan as this rerun started; rerun so they match the edits
+    if (zone_data.get('strategies', []), zone_data.get('actions', [])) != plan_before:
+        st.rerun()
+    
     # Configuration summary
     if zone_data.get('strategies') and zone_data.get('actions'):
         st.success(f"✅ Zone configured: {len(zone_data['strategies'])} strategies, {len(zone_data['actions'])} actions")
@@ -1536,6 +4119,7 @@ def configure_zone_detailed(zone_id):
         if not zone_data.get('strategies'):
             st.info("💡 **Tip:** You can create custom strategies tailored to this zone using the Quick Strategy Creator above!")
 
+@profiled("page")
 def custom_strategy_creator_page():
     st.header("✨ Custom Strategy Creator")
     
@@ -1700,6 +4284,195 @@ def custom_strategy_creator_page():
         5. **Evidence-based:** Use keywords that relate to proven urban interventions
         """)
 
+# CHART BUILDERS
+@profiled("chart")
+def build_uec_gauge_figure(uec_data):
+    """UEC speedometer gauge"""
+    fig = go.Figure(go.Indicator(
+        mode = "gauge+number+delta",
+        value = uec_data['overall_uec'],
+        domain = {'x': [0, 1], 'y': [0, 1]},
+        title = {'text': "UEC Score"},
+        delta = {'reference': 50},
+        gauge = {
+            'axis': {'range': [None, 100]},
+            'bar': {'color': uec_data['interpretation']['color']},
+            'steps': [
+                {'range': [0, 30], 'color': "lightgray"},
+                {'range': [30, 60], 'color': "yellow"},
+                {'range': [60, 100], 'color': "lightgreen"}
+            ],
+            'threshold': {
+                'line': {'color': "red", 'width': 4},
+                'thickness': 0.75,
+                'value': 90
+            }
+        }
+    ))
+    
+    fig.update_layout(height=300, title="Urban Environmental Comfort Score")
+    return fig
+
+@profiled("dataframe")
+def build_strategy_gain_frame(strategy_gains, zones, max_zones=STRATEGY_GAIN_MAX_ZONES):
+    """Zones x strategies UEC gain frame; large cities keep their configured zones and best-paying zones"""
+    gains = strategy_gains["gains"]
+    zone_ids = list(zones)
+    rows = np.arange(len(zone_ids))
+    if len(rows) > max_zones:
+        best = np.nan_to_num(gains, nan=-np.inf).max(axis=1)
+        best[strategy_gains["configured_positions"]] = np.inf
+        rows = np.sort(np.argpartition(-best, max_zones - 1)[:max_zones])
+    return pd.DataFrame(
+        gains[rows],
+        index=[zones[zone_ids[i]].get("name", zone_ids[i]) for i in rows.tolist()],
+        columns=strategy_gains["strategies"]
+    )
+
+@profiled("chart")
+def build_strategy_gain_heatmap_figure(gain_df):
+    """Heatmap of marginal UEC per zone and strategy"""
+    fig = go.Figure(go.Heatmap(
+        z=gain_df.values,
+        x=list(gain_df.columns),
+        y=list(gain_df.index),
+        colorscale="YlGn",
+        colorbar={"title": "UEC +"},
+        hovertemplate="%{y}<br>%{x}<br>+%{z:.2f} UEC<extra></extra>"
+    ))
+    
+    fig.update_layout(
+        title="Marginal UEC by Zone and Strategy",
+        height=max(300, 28 * len(gain_df) + 120),
+        yaxis={"autorange": "reversed"}
+    )
+    return fig
+
+@profiled("chart")
+def build_subsystem_scores_figure(uec_data):
+    """Bar chart of normalized subsystem scores"""
+    subsystem_scores = uec_data['subsystem_scores']
+    
+    fig = go.Figure(data=[
+        go.Bar(
+            x=list(subsystem_scores.keys()),
+            y=list(subsystem_scores.values()),
+            marker_color=['#E74C3C', '#3498DB', '#2ECC71', '#F39C12']
+        )
+    ])
+    
+    fig.update_layout(
+        title="Subsystem Performance",
+        yaxis_title="Score (0-100)",
+        height=300
+    )
+    return fig
+
+@profiled("dataframe")
+def build_zone_performance_frame(zone_performance):
+    """Zone performance table used by the dashboard chart and table"""
+    zone_data = []
+    for zone_id, performance in zone_performance.items():
+        zone_info = CITY_ZONES[zone_id]
+        zone_data.append({
+            'Zone': zone_info['name'],
+            'UEC Score': performance.get('uec_score', 0),
+            'Priority': zone_info['priority_level'],
+            'Performance Level': performance.get('performance_level', 'Unknown')
+        })
+    
+    return pd.DataFrame(zone_data)
+
+@profiled("chart")
+def build_zone_performance_figure(zone_df):
+    """Bar chart of zone UEC scores colored by priority"""
+    return px.bar(
+        zone_df, 
+        x='Zone', 
+        y='UEC Score',
+        color='Priority',
+        title="Zone Performance by UEC Score",
+        color_discrete_map={
+            'Emergency': '#FF0000',
+            'Critical': '#FF4500', 
+            'High': '#FFA500',
+            'Medium': '#32CD32',
+            'Low': '#808080'
+        }
+    )
+
+@profiled("chart")
+def build_raster_spillover_figure(field, raster):
+    """Heatmap of the raster spillover field summed over subsystems"""
+    x = raster.origin[0] + (np.arange(raster.shape[0]) + 0.5) * raster.cell_size
+    y = raster.origin[1] + (np.arange(raster.shape[1]) + 0.5) * raster.cell_size
+    fig = go.Figure(go.Heatmap(
+        x=x,
+        y=y,
+        z=field.sum(axis=0).T,
+        colorscale="Viridis",
+        colorbar={'title': "Spillover"}
+    ))
+    
+    fig.update_layout(
+        title="Spillover Field per Grid Cell",
+        xaxis_title="x",
+        yaxis_title="y",
+        yaxis={'scaleanchor': "x"},
+        height=500
+    )
+    return fig
+
+@profiled("section")
+def render_raster_spillover(effects):
+    """Per-cell field and per-zone totals for the raster spillover mode"""
+    calculator = st.session_state.game_manager.spatial_calculator
+    raster = calculator.population_raster
+    stats = effects.get('raster_stats', {})
+    
+    st.subheader("🗺️ Raster Spillover Field")
+    st.caption(
+        f"Grid {stats.get('shape', list(raster.shape))[0]} × {stats.get('shape', list(raster.shape))[1]} cells of "
+        f"{stats.get('cell_size', raster.cell_size):.2f} map units, population-weighted"
+    )
+    field = calculator.calculate_raster_spillover_field(effects.get('direct_effects', {}))
+    st.plotly_chart(build_raster_spillover_figure(field, raster), use_container_width=True)
+    
+    st.subheader("🏘️ Spillover Received per Zone")
+    zone_rows = []
+    for zone_id, zone_spillover in effects['raster_spillover'].items():
+        row = {'Zone': calculator.zones.get(zone_id, {}).get('name', zone_id)}
+        row.update({subsystem: round(zone_spillover.get(subsystem, 0.0), 2) for subsystem in SUBSYSTEMS})
+        row['Total'] = round(sum(zone_spillover.values()), 2)
+        zone_rows.append(row)
+    
+    if zone_rows:
+        st.dataframe(pd.DataFrame(zone_rows).sort_values('Total', ascending=False), use_container_width=True)
+    else:
+        st.info("🌊 No spillover effects detected yet.")
+
+@profiled("section")
+def render_network_spillover(effects):
+    """Multi-hop spillover received per zone in the network mode"""
+    calculator = st.session_state.game_manager.spatial_calculator
+    stats = effects.get('network_stats', {})
+    
+    st.subheader("🔁 Multi-hop Network Spillover")
+    st.caption(
+        f"Cascade through adjacent zones, α = {stats.get('alpha', 0):.2f}, "
+        f"converged in {stats.get('iterations', 0)} iterations"
+    )
+    zone_rows = []
+    for zone_id, zone_spillover in effects['network_spillover'].items():
+        row = {'Zone': calculator.zones.get(zone_id, {}).get('name', zone_id)}
+        row.update({subsystem: round(zone_spillover.get(subsystem, 0.0), 2) for subsystem in SUBSYSTEMS})
+        row['Total'] = round(sum(zone_spillover.values()), 2)
+        zone_rows.append(row)
+    
+    if zone_rows:
+        st.dataframe(pd.DataFrame(zone_rows).sort_values('Total', ascending=False), use_container_width=True)
+
+@profiled("page")
 def results_dashboard_page():
     st.header("📊 Game Results Dashboard")
     
@@ -1761,49 +4534,12 @@ def results_dashboard_page():
     
     with col1:
         # UEC Speedometer
-        fig = go.Figure(go.Indicator(
-            mode = "gauge+number+delta",
-            value = overall_uec,
-            domain = {'x': [0, 1], 'y': [0, 1]},
-            title = {'text': "UEC Score"},
-            delta = {'reference': 50},
-            gauge = {
-                'axis': {'range': [None, 100]},
-                'bar': {'color': interpretation['color']},
-                'steps': [
-                    {'range': [0, 30], 'color': "lightgray"},
-                    {'range': [30, 60], 'color': "yellow"},
-                    {'range': [60, 100], 'color': "lightgreen"}
-                ],
-                'threshold': {
-                    'line': {'color': "red", 'width': 4},
-                    'thickness': 0.75,
-                    'value': 90
-                }
-            }
-        ))
-        
-        fig.update_layout(height=300, title="Urban Environmental Comfort Score")
+        fig = build_uec_gauge_figure(uec_data)
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         # Subsystem breakdown
-        subsystem_scores = uec_data['subsystem_scores']
-        
-        fig = go.Figure(data=[
-            go.Bar(
-                x=list(subsystem_scores.keys()),
-                y=list(subsystem_scores.values()),
-                marker_color=['#E74C3C', '#3498DB', '#2ECC71', '#F39C12']
-            )
-        ])
-        
-        fig.update_layout(
-            title="Subsystem Performance",
-            yaxis_title="Score (0-100)",
-            height=300
-        )
-        
+        fig = build_subsystem_scores_figure(uec_data)
         st.plotly_chart(fig, use_container_width=True)
     
     # Zone performance comparison
@@ -1811,34 +4547,10 @@ def results_dashboard_page():
     
     zone_performance = effects.get('zone_performance', {})
     if zone_performance:
-        zone_data = []
-        for zone_id, performance in zone_performance.items():
-            zone_info = CITY_ZONES[zone_id]
-            zone_data.append({
-                'Zone': zone_info['name'],
-                'UEC Score': performance.get('uec_score', 0),
-                'Priority': zone_info['priority_level'],
-                'Performance Level': performance.get('performance_level', 'Unknown')
-            })
-        
-        zone_df = pd.DataFrame(zone_data)
+        zone_df = build_zone_performance_frame(zone_performance)
         
         # Zone performance chart
-        fig = px.bar(
-            zone_df, 
-            x='Zone', 
-            y='UEC Score',
-            color='Priority',
-            title="Zone Performance by UEC Score",
-            color_discrete_map={
-                'Emergency': '#FF0000',
-                'Critical': '#FF4500', 
-                'High': '#FFA500',
-                'Medium': '#32CD32',
-                'Low': '#808080'
-            }
-        )
-        
+        fig = build_zone_performance_figure(zone_df)
         st.plotly_chart(fig, use_container_width=True)
         
         # Zone performance table
@@ -1938,10 +4650,42 @@ def results_dashboard_page():
     else:
         st.error("🔄 **NEEDS PIVOT!** Shift to Pure Human-Social strategies for 8.2x leverage advantage.")
     
+    # Next best moves: marginal UEC of every feasible move, scored in one batched pass
+    st.subheader("🧭 Next Best Moves")
+    manager = st.session_state.game_manager
+    strategy_gains = manager.calculate_strategy_gains(effects)
+    moves = get_move_recommender(manager.spatial_calculator).recommend(
+        manager.configured_zone_actions(), effects, plan=strategy_gains
+    )
+    if moves:
+        zones = manager.spatial_calculator.zones
+        st.dataframe(pd.DataFrame([
+            {
+                "Move": move["move"],
+                "Zone": zones[move["zone"]].get("name", move["zone"]),
+                "Strategy / Action": move.get("action") or move["strategy"],
+                "Actions": move["actions"],
+                "UEC Gain": f"+{max(move['uec_gain'], 0.0):.2f}",
+                "Projected UEC": f"{move['projected_uec']:.1f}"
+            }
+            for move in moves
+        ]), use_container_width=True, hide_index=True)
+    else:
+        st.info("No single move raises the UEC score further: every subsystem is at its cap.")
+    
+    # Where each strategy pays off most, given the current plan
+    st.subheader("🗺️ Strategy Payoff by Zone")
+    gain_df = build_strategy_gain_frame(strategy_gains, manager.spatial_calculator.zones)
+    fig = build_strategy_gain_heatmap_figure(gain_df)
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption("UEC points gained by adding each strategy (with its actions) to each zone, including spillover and synergy. "
+               "Blank cells are strategies the zone already uses.")
+    
     # Custom strategy recommendation
     if len(st.session_state.custom_strategies) < 2:
         st.info("💡 **Try creating custom strategies** in the Custom Strategy Creator for more targeted interventions!")
 
+@profiled("page")
 def spillover_analysis_page():
     st.header("🌊 Spillover Effects Analysis")
     
@@ -1955,6 +4699,13 @@ def spillover_analysis_page():
         st.warning("⚙️ Configure zones first to see spillover effects!")
         return
     
+    if 'raster_spillover' in effects:
+        render_raster_spillover(effects)
+        return
+    
+    if 'network_spillover' in effects:
+        render_network_spillover(effects)
+    
     spillover_effects = effects.get('spillover_effects', {})
     
     if not spillover_effects:
@@ -2154,6 +4905,7 @@ def spillover_analysis_page():
         
         st.plotly_chart(fig, use_container_width=True)
 
+@profiled("page")
 def loop_analysis_page():
     st.header("🔬 Scientific Loop Analysis")
     
@@ -2277,6 +5029,7 @@ def loop_analysis_page():
         else:
             st.info("💡 Focus more on Human-Social strategies")
 
+@profiled("page")
 def multi_round_comparison_page():
     st.header("📈 Multi-Round Comparison Analysis")
     
@@ -2327,6 +5080,7 @@ def multi_round_comparison_page():
     
     st.info("📊 Multi-round comparison available! Select rounds to compare above.")
 
+@profiled("page")
 def multi_round_comparison_page():
     st.header("📈 Multi-Round Comparison Analysis")
     
@@ -2417,6 +5171,9 @@ def multi_round_comparison_page():
         else:
             continue
         
+        if not effects:  # Imported round with no configured zones
+            continue
+        
         uec_data = calculate_normalized_uec_score(effects)
         
         comparison_data.append({
@@ -2482,6 +5239,138 @@ def multi_round_comparison_page():
         styled_df = comparison_df.style.applymap(style_uec_score, subset=['UEC Score'])
         st.dataframe(styled_df, use_container_width=True)
 
+@profiled("page")
+def leaderboard_page():
+    st.header("🏆 Live Workshop Leaderboard")
+    
+    if not st.session_state.game_name:
+        st.warning("⚠️ Please start a game session first!")
+        return
+    
+    leaderboard = get_leaderboard(st.session_state.game_name)
+    
+    if not len(leaderboard):
+        st.info("🏁 No submissions yet. Submit your results from the Reports & Export page!")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Teams Submitted", len(leaderboard))
+    with col2:
+        team_rank = leaderboard.rank_of(st.session_state.team_name)
+        st.metric("Your Rank", f"#{team_rank}" if team_rank else "—")
+    with col3:
+        best = leaderboard.top(1)
+        st.metric("Top UEC Score", f"{best[0][1]['final_uec_score']:.1f}/100")
+    
+    st.subheader("🥇 Top Teams")
+    
+    top_rows = []
+    for rank, entry in leaderboard.top(20):
+        top_rows.append({
+            'Rank': rank,
+            'Team': entry['team_name'],
+            'UEC Score': entry['final_uec_score'],
+            'Level': entry.get('performance_level', ''),
+            'Zones': entry.get('zones_used', 0),
+            'Loops': entry.get('activated_loops', 0)
+        })
+    st.dataframe(pd.DataFrame(top_rows), use_container_width=True, hide_index=True)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        histogram_df = pd.DataFrame(leaderboard.histogram(), columns=['UEC Range', 'Teams'])
+        fig = px.bar(histogram_df, x='UEC Range', y='Teams', title="UEC Score Distribution")
+        st.plotly_chart(fig, use_container_width=True)
+    
+    with col2:
+        popularity = leaderboard.strategy_popularity()[:10]
+        if popularity:
+            popularity_df = pd.DataFrame(popularity, columns=['Strategy', 'Teams'])
+            fig = px.bar(popularity_df, x='Teams', y='Strategy', orientation='h', title="Strategy Popularity")
+            fig.update_layout(yaxis={'categoryorder': 'total ascending'})
+            st.plotly_chart(fig, use_container_width=True)
+
+@profiled("section")
+def render_facilitator_board(game_filter):
+    """Apply the board's change feed to this viewer's rows and draw them"""
+    cursor = st.session_state.get('facilitator_cursor', 0)
+    rows = st.session_state.setdefault('facilitator_rows', {})
+    if st.session_state.get('facilitator_game') != game_filter:
+        # Different game selected: replay the feed from the start
+        cursor = 0
+        rows.clear()
+        st.session_state.facilitator_game = game_filter
+    
+    cursor, changes, reset = get_team_state_board().changes_since(cursor, game_filter)
+    if reset:
+        rows.clear()
+    for key, summary in changes:
+        if summary is None:
+            rows.pop(key, None)
+        else:
+            rows[key] = summary
+    st.session_state.facilitator_cursor = cursor
+    
+    if not rows:
+        st.info("⏳ Waiting for teams to start playing...")
+        return
+    
+    scores = [summary['uec_score'] for summary in rows.values()]
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Active Teams", len(rows))
+    with col2:
+        st.metric("Average UEC", f"{np.mean(scores):.1f}/100")
+    with col3:
+        st.metric("Best UEC", f"{max(scores):.1f}/100")
+    with col4:
+        st.metric("Updated This Refresh", len(changes))
+    
+    board_df = pd.DataFrame([
+        {
+            'Team': summary['team'],
+            'Game': summary['game'],
+            'Round': summary['round'],
+            'UEC Score': summary['uec_score'],
+            'Level': summary['performance_level'],
+            'Zones': ", ".join(summary['zones']),
+            'Configured': f"{summary['configured_zones']}/{len(summary['zones'])}",
+            'Loops': summary['activated_loops'],
+            'Custom Strategies': summary['custom_strategies'],
+            'Last Change': summary['updated_at']
+        }
+        for summary in rows.values()
+    ]).sort_values('UEC Score', ascending=False)
+    
+    st.dataframe(board_df, use_container_width=True, hide_index=True)
+
+@profiled("page")
+def facilitator_dashboard_page():
+    st.header("🧑‍🏫 Facilitator Dashboard")
+    
+    st.markdown("Live view of every team's progress. Only teams whose state changed since the last refresh are re-read.")
+    
+    games = get_team_state_board().games()
+    game_options = ["All games"] + games
+    default_index = game_options.index(st.session_state.game_name) if st.session_state.game_name in games else 0
+    selected_game = st.selectbox("Game", game_options, index=default_index)
+    game_filter = None if selected_game == "All games" else selected_game
+    
+    auto_refresh = st.checkbox(f"🔄 Auto-refresh every {FACILITATOR_REFRESH_SECONDS} seconds", value=True)
+    
+    if hasattr(st, "fragment"):
+        # Fragment reruns only redraw the board, not the whole page
+        st.fragment(run_every=FACILITATOR_REFRESH_SECONDS if auto_refresh else None)(render_facilitator_board)(game_filter)
+    else:
+        render_facilitator_board(game_filter)
+        if auto_refresh:
+            st.caption("Auto-refresh needs Streamlit 1.37+; use the button below.")
+        st.button("🔄 Refresh")
+
+@profiled("page")
 def reports_export_page():
     st.header("📋 Reports & Export Center")
     
@@ -2523,14 +5412,7 @@ def reports_export_page():
     
     report_type = st.selectbox(
         "Choose report type:",
-        [
-            "📊 Executive Summary",
-            "🔬 Scientific Analysis Report", 
-            "🌊 Spillover Effects Report",
-            "📈 Multi-Round Comparison",
-            "🎯 Strategy Implementation Guide",
-            "📋 Complete Game Report"
-        ]
+        REPORT_TYPES
     )
     
     # Generate selected report
@@ -2552,7 +5434,16 @@ def reports_export_page():
                 file_name=report_filename,
                 mime="text/markdown"
             )
-    
+
+    # Complete report streamed straight into the download (served from cache once generated)
+    if current_effects:
+        st.download_button(
+            label="💾 Download Complete Game Report",
+            data=ReportStream(stream_report("📋 Complete Game Report", current_effects)),
+            file_name=f"{st.session_state.team_name}_Complete_Report_Round_{st.session_state.current_round}.md",
+            mime="text/markdown"
+        )
+
     # Data export options
     st.subheader("💾 Data Export Options")
     
@@ -2561,16 +5452,10 @@ def reports_export_page():
     with col1:
         if st.button("📊 Export Current Results"):
             if current_effects:
-                export_data = {
-                    'team': st.session_state.team_name,
-                    'round': st.session_state.current_round,
-                    'zones': st.session_state.game_manager.selected_zones,
-                    'custom_strategies': st.session_state.custom_strategies,
-                    'effects': current_effects,
-                    'timestamp': datetime.now().isoformat()
-                }
+                export_data = build_current_results_export(current_effects)
                 
                 json_data = json.dumps(export_data, indent=2, default=str)
+                EXPORT_BYTES.labels(format="json").observe(len(json_data.encode("utf-8")))
                 
                 st.download_button(
                     label="💾 Download JSON",
@@ -2584,16 +5469,10 @@ def reports_export_page():
     with col2:
         if st.button("📈 Export All Rounds"):
             if st.session_state.game_manager.round_history:
-                all_rounds_data = {
-                    'team': st.session_state.team_name,
-                    'game': st.session_state.game_name,
-                    'rounds': st.session_state.game_manager.round_history,
-                    'current_round': st.session_state.current_round,
-                    'custom_strategies': st.session_state.custom_strategies,
-                    'export_timestamp': datetime.now().isoformat()
-                }
+                all_rounds_data = build_all_rounds_export()
                 
                 json_data = json.dumps(all_rounds_data, indent=2, default=str)
+                EXPORT_BYTES.labels(format="json").observe(len(json_data.encode("utf-8")))
                 
                 st.download_button(
                     label="💾 Download All Rounds",
@@ -2607,6 +5486,7 @@ def reports_export_page():
     with col3:
         if st.button("📋 Export Strategy Summary"):
             strategy_summary = generate_strategy_summary()
+            EXPORT_BYTES.labels(format="csv").observe(len(strategy_summary.encode("utf-8")))
             
             st.download_button(
                 label="💾 Download Strategy CSV",
@@ -2614,7 +5494,40 @@ def reports_export_page():
                 file_name=f"{st.session_state.team_name}_Strategies.csv",
                 mime="text/csv"
             )
-    
+
+    if st.button("🧮 Export Columnar Data (NPZ)", help="Typed tables for fast loading into pandas with load_effects_columnar()"):
+        rounds_effects = collect_rounds_effects(current_effects)
+
+        if rounds_effects:
+            columnar_data = export_effects_columnar(rounds_effects, {
+                'team': st.session_state.team_name,
+                'game': st.session_state.game_name
+            })
+
+            st.download_button(
+                label="💾 Download Columnar NPZ",
+                data=columnar_data,
+                file_name=f"{st.session_state.team_name}_Effects.npz",
+                mime="application/octet-stream"
+            )
+        else:
+            st.warning("No data to export")
+
+    if st.button("🗂️ Export Everything (ZIP)", help="All reports, strategy CSV, round data and chart JSON in one archive"):
+        with st.spinner("Building export bundle..."):
+            bundle_path = build_export_bundle(current_effects)
+
+        try:
+            with open(bundle_path, "rb") as bundle_file:
+                st.download_button(
+                    label="💾 Download Bundle",
+                    data=bundle_file,
+                    file_name=f"{st.session_state.team_name}_Round_{st.session_state.current_round}_Bundle.zip",
+                    mime="application/zip"
+                )
+        finally:
+            os.remove(bundle_path)
+
     # Workshop submission
     st.subheader("🎓 Workshop Submission")
     
@@ -2638,6 +5551,15 @@ def reports_export_page():
         
         st.json(submission_data)
         
+        if st.button("🏁 Submit to Leaderboard", type="primary"):
+            strategies_used = set(
+                strategy
+                for zone_data in st.session_state.game_manager.selected_zones.values()
+                for strategy in zone_data.get('strategies', [])
+            )
+            rank = submit_to_leaderboard(submission_data, strategies_used)
+            st.success(f"✅ Submitted! Your team is currently ranked #{rank} of {len(get_leaderboard(st.session_state.game_name))}")
+        
         # Achievement badges
         st.subheader("🏆 Achievement Badges")
         
@@ -2674,67 +5596,161 @@ def reports_export_page():
         else:
             st.info("🌱 Keep playing to unlock achievement badges!")
 
-def generate_report(report_type, effects):
-    """Generate different types of reports"""
+# REPORT GENERATION PIPELINE
+REPORT_TYPES = [
+    "📊 Executive Summary",
+    "🔬 Scientific Analysis Report", 
+    "🌊 Spillover Effects Report",
+    "📈 Multi-Round Comparison",
+    "🎯 Strategy Implementation Guide",
+    "📋 Complete Game Report"
+]
+
+# Report types with distinct content; the remaining types render the Complete report
+BUNDLE_REPORT_TYPES = [
+    "📊 Executive Summary",
+    "🔬 Scientific Analysis Report",
+    "📋 Complete Game Report"
+]
+
+REPORT_CACHE_SIZE = 64
+# Cached reports carry this marker; stream_report stamps the current time over it on every request
+REPORT_TIMESTAMP_MARKER = "{{generated_at}}"
+
+@st.cache_resource
+def get_report_cache():
+    """Rendered reports shared across sessions and reruns"""
+    return LRUCache(REPORT_CACHE_SIZE)
+
+def compute_effects_hash(effects):
+    """Stable content hash of an effects dictionary"""
+    payload = json.dumps(effects, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+def _report_cache_key(report_type, effects):
+    """Cache key for a report: (report type, effects hash, session context hash)"""
+    # Reports also quote team details, zone setup and custom strategies
+    context = {
+        "team": st.session_state.team_name,
+        "game": st.session_state.game_name,
+        "round": st.session_state.current_round,
+        "zones": st.session_state.game_manager.selected_zones,
+        "custom_strategies": st.session_state.custom_strategies
+    }
+    effects_hash = compute_effects_hash(effects) if effects else None
+    return (report_type, effects_hash, compute_effects_hash(context))
+
+@profiled("engine")
+def build_report_metrics(effects):
+    """Compute every metric shared by the report sections in a single pass"""
+    activated_loops = effects.get('activated_loops', [])
     
-    if not effects:
-        return "No data available for report generation."
+    behavioral_loops = []
+    total_leverage = 0
+    behavioral_leverage = 0
+    value_counts = {}
     
-    uec_data = calculate_normalized_uec_score(effects)
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for loop in activated_loops:
+        leverage = loop.get('leverage', 0)
+        total_leverage += leverage
+        
+        value = loop.get('strategic_value', 'Unknown')
+        value_counts[value] = value_counts.get(value, 0) + 1
+        
+        if 'Human-Social' in SCIENTIFIC_LOOP_DATA.get(loop.get('loop_id', 0), {}).get('subsystems', []):
+            behavioral_loops.append(loop)
+            behavioral_leverage += leverage
     
-    if "Executive Summary" in report_type:
-        return f"""
+    selected_zones = st.session_state.game_manager.selected_zones
+    
+    return {
+        "effects": effects,
+        "uec_data": calculate_normalized_uec_score(effects),
+        "timestamp": REPORT_TIMESTAMP_MARKER,
+        "activated_loops": activated_loops,
+        "behavioral_loops": behavioral_loops,
+        "total_leverage": total_leverage,
+        "behavioral_leverage": behavioral_leverage,
+        "value_counts": value_counts,
+        "zone_count": len(selected_zones),
+        "unique_strategies": set(
+            strategy
+            for zone_data in selected_zones.values()
+            for strategy in zone_data.get('strategies', [])
+        ),
+        "custom_strategy_count": len(st.session_state.custom_strategies)
+    }
+
+def _executive_summary_sections(metrics):
+    """Yield the Executive Summary report section by section"""
+    uec_data = metrics['uec_data']
+    scores = uec_data['subsystem_scores']
+    
+    yield f"""
 # Executive Summary - Urban Pulse Analysis
 
 **Team:** {st.session_state.team_name}  
-**Generated:** {timestamp}  
+**Generated:** {metrics['timestamp']}  
 **Round:** {st.session_state.current_round}
-
+"""
+    
+    yield f"""
 ## 🎯 Key Performance Indicators
 
 - **Overall UEC Score:** {uec_data['overall_uec']:.1f}/100
 - **Performance Level:** {uec_data['interpretation']['level']}
-- **Zones Intervened:** {len(st.session_state.game_manager.selected_zones)}
-- **Feedback Loops Activated:** {len(effects.get('activated_loops', []))}
-- **Custom Strategies Created:** {len(st.session_state.custom_strategies)}
-
+- **Zones Intervened:** {metrics['zone_count']}
+- **Feedback Loops Activated:** {len(metrics['activated_loops'])}
+- **Custom Strategies Created:** {metrics['custom_strategy_count']}
+"""
+    
+    yield f"""
 ## 📊 Subsystem Performance
 
 | Subsystem | Score | Performance |
 |-----------|-------|-------------|
-| Human-Social | {uec_data['subsystem_scores'].get('Human-Social', 0):.1f} | {'Excellent' if uec_data['subsystem_scores'].get('Human-Social', 0) > 70 else 'Good' if uec_data['subsystem_scores'].get('Human-Social', 0) > 50 else 'Needs Improvement'} |
-| Spatial | {uec_data['subsystem_scores'].get('Spatial', 0):.1f} | {'Excellent' if uec_data['subsystem_scores'].get('Spatial', 0) > 70 else 'Good' if uec_data['subsystem_scores'].get('Spatial', 0) > 50 else 'Needs Improvement'} |
-| Air-Soundscape | {uec_data['subsystem_scores'].get('Air-Soundscape', 0):.1f} | {'Excellent' if uec_data['subsystem_scores'].get('Air-Soundscape', 0) > 70 else 'Good' if uec_data['subsystem_scores'].get('Air-Soundscape', 0) > 50 else 'Needs Improvement'} |
-| Thermal | {uec_data['subsystem_scores'].get('Thermal', 0):.1f} | {'Excellent' if uec_data['subsystem_scores'].get('Thermal', 0) > 70 else 'Good' if uec_data['subsystem_scores'].get('Thermal', 0) > 50 else 'Needs Improvement'} |
-
+| Human-Social | {scores.get('Human-Social', 0):.1f} | {'Excellent' if scores.get('Human-Social', 0) > 70 else 'Good' if scores.get('Human-Social', 0) > 50 else 'Needs Improvement'} |
+| Spatial | {scores.get('Spatial', 0):.1f} | {'Excellent' if scores.get('Spatial', 0) > 70 else 'Good' if scores.get('Spatial', 0) > 50 else 'Needs Improvement'} |
+| Air-Soundscape | {scores.get('Air-Soundscape', 0):.1f} | {'Excellent' if scores.get('Air-Soundscape', 0) > 70 else 'Good' if scores.get('Air-Soundscape', 0) > 50 else 'Needs Improvement'} |
+| Thermal | {scores.get('Thermal', 0):.1f} | {'Excellent' if scores.get('Thermal', 0) > 70 else 'Good' if scores.get('Thermal', 0) > 50 else 'Needs Improvement'} |
+"""
+    
+    yield f"""
 ## 🎯 Strategic Recommendations
 
-{get_strategic_recommendations(uec_data, effects)}
-
+{get_strategic_recommendations(metrics)}
+"""
+    
+    yield f"""
 ## ✨ Innovation Summary
 
-**Custom Strategies Developed:** {len(st.session_state.custom_strategies)}
+**Custom Strategies Developed:** {metrics['custom_strategy_count']}
 {chr(10).join([f"- {name}: {strategy.get('Description', 'No description')[:100]}..." for name, strategy in st.session_state.custom_strategies.items()])}
-
+"""
+    
+    yield f"""
 ## 📈 Next Steps
 
-1. **Focus Areas:** {'Behavioral strategies for higher leverage' if uec_data['subsystem_scores'].get('Human-Social', 0) < 60 else 'Expand to adjacent zones for spillover effects'}
-2. **Optimization:** {'Reduce zone count and focus interventions' if len(st.session_state.game_manager.selected_zones) > 5 else 'Consider adding complementary zones'}
-3. **Innovation:** {'Create more targeted custom strategies' if len(st.session_state.custom_strategies) < 3 else 'Refine existing custom strategies for maximum impact'}
+1. **Focus Areas:** {'Behavioral strategies for higher leverage' if scores.get('Human-Social', 0) < 60 else 'Expand to adjacent zones for spillover effects'}
+2. **Optimization:** {'Reduce zone count and focus interventions' if metrics['zone_count'] > 5 else 'Consider adding complementary zones'}
+3. **Innovation:** {'Create more targeted custom strategies' if metrics['custom_strategy_count'] < 3 else 'Refine existing custom strategies for maximum impact'}
 """
+
+def _scientific_analysis_sections(metrics):
+    """Yield the Scientific Analysis report section by section"""
+    activated_loops = metrics['activated_loops']
+    total_leverage = metrics['total_leverage']
+    custom_count = metrics['custom_strategy_count']
     
-    elif "Scientific Analysis" in report_type:
-        activated_loops = effects.get('activated_loops', [])
-        total_leverage = sum(loop.get('leverage', 0) for loop in activated_loops)
-        
-        return f"""
+    yield f"""
 # Scientific Analysis Report - Urban Pulse
 
 **Team:** {st.session_state.team_name}  
-**Generated:** {timestamp}  
+**Generated:** {metrics['timestamp']}  
 **Round:** {st.session_state.current_round}
-
+"""
+    
+    yield f"""
 ## 🔬 Loop System Analysis
 
 ### Activation Summary
@@ -2743,34 +5759,43 @@ def generate_report(report_type, effects):
 - **Average Loop Leverage:** {total_leverage/len(activated_loops) if activated_loops else 0:.3f}
 
 ### Custom Strategy Innovation
-**Strategies Created:** {len(st.session_state.custom_strategies)}
+**Strategies Created:** {custom_count}
 {chr(10).join([f"- **{name}:** {strategy.get('Evidence_Base', 'Custom evidence-based strategy')}" for name, strategy in st.session_state.custom_strategies.items()])}
 
 ### Behavioral Primacy Analysis
-{get_behavioral_primacy_analysis(activated_loops)}
-
+{get_behavioral_primacy_analysis(metrics)}
+"""
+    
+    yield f"""
 ## 📊 Evidence-Based Insights
 
 ### Leverage Optimization
-The scientific evidence shows that Pure Human-Social loops provide 8.2x higher leverage than complex multi-subsystem approaches. Your current strategy {'aligns well' if sum(1 for loop in activated_loops if 'Human-Social' in SCIENTIFIC_LOOP_DATA.get(loop.get('loop_id', 0), {}).get('subsystems', [])) > len(activated_loops)*0.6 else 'could better utilize'} this principle.
+The scientific evidence shows that Pure Human-Social loops provide 8.2x higher leverage than complex multi-subsystem approaches. Your current strategy {'aligns well' if len(metrics['behavioral_loops']) > len(activated_loops)*0.6 else 'could better utilize'} this principle.
 
 ### Innovation Impact
-Your {len(st.session_state.custom_strategies)} custom strategies demonstrate {'excellent' if len(st.session_state.custom_strategies) >= 3 else 'good' if len(st.session_state.custom_strategies) >= 1 else 'limited'} innovation in urban sustainability approaches.
-
+Your {custom_count} custom strategies demonstrate {'excellent' if custom_count >= 3 else 'good' if custom_count >= 1 else 'limited'} innovation in urban sustainability approaches.
+"""
+    
+    yield f"""
 ## 🎯 Scientific Recommendations
 
-{get_scientific_recommendations(activated_loops, uec_data)}
+{get_scientific_recommendations(metrics)}
 """
+
+def _complete_report_sections(metrics):
+    """Yield the Complete Game Report section by section"""
+    uec_data = metrics['uec_data']
     
-    else:  # Complete Game Report
-        return f"""
+    yield f"""
 # Complete Urban Pulse Game Report
 
 **Team:** {st.session_state.team_name}  
 **Game:** {st.session_state.game_name}  
-**Generated:** {timestamp}  
+**Generated:** {metrics['timestamp']}  
 **Round:** {st.session_state.current_round}
-
+"""
+    
+    yield f"""
 ## 🎮 Game Session Overview
 
 ### Performance Summary
@@ -2779,12 +5804,14 @@ Your {len(st.session_state.custom_strategies)} custom strategies demonstrate {'e
 - **Message:** {uec_data['interpretation']['message']}
 
 ### Innovation Summary
-- **Custom Strategies Created:** {len(st.session_state.custom_strategies)}
-- **Total Unique Strategies Used:** {len(set(strategy for zone_data in st.session_state.game_manager.selected_zones.values() for strategy in zone_data.get('strategies', [])))}
+- **Custom Strategies Created:** {metrics['custom_strategy_count']}
+- **Total Unique Strategies Used:** {len(metrics['unique_strategies'])}
 
 ### Zone Configuration
 {get_zone_configuration_summary()}
-
+"""
+    
+    yield f"""
 ## 📊 Detailed Analysis
 
 ### Custom Strategy Analysis
@@ -2794,25 +5821,112 @@ Your {len(st.session_state.custom_strategies)} custom strategies demonstrate {'e
 {get_subsystem_detailed_analysis(uec_data)}
 
 ### Scientific Loop Activation
-{get_complete_loop_analysis(effects)}
-
+{get_complete_loop_analysis(metrics)}
+"""
+    
+    yield f"""
 ## 🏆 Achievement Summary
 
-{get_achievement_summary(uec_data, effects)}
-
+{get_achievement_summary(metrics)}
+"""
+    
+    yield f"""
 ## 📈 Learning Outcomes
 
 Based on your gameplay, key learning outcomes include:
-{get_learning_outcomes(uec_data, effects)}
-
+{get_learning_outcomes(metrics)}
+"""
+    
+    yield f"""
 ## 🎯 Future Applications
 
-{get_future_applications_guide(uec_data)}
+{get_future_applications_guide(metrics)}
 """
 
-def get_strategic_recommendations(uec_data, effects):
+def iter_report_sections(report_type, effects):
+    """Generator pipeline producing report sections from one shared metrics pass"""
+    if not effects:
+        yield "No data available for report generation."
+        return
+    
+    metrics = build_report_metrics(effects)
+    
+    if "Executive Summary" in report_type:
+        yield from _executive_summary_sections(metrics)
+    elif "Scientific Analysis" in report_type:
+        yield from _scientific_analysis_sections(metrics)
+    else:  # Complete Game Report
+        yield from _complete_report_sections(metrics)
+
+def stream_report(report_type, effects):
+    """Stream report chunks, serving repeated requests from the report cache"""
+    key = _report_cache_key(report_type, effects)
+    report_cache = get_report_cache()
+    generated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    cached = report_cache.get(key)
+    if cached is not None:
+        CACHE_REQUESTS.labels(cache="report", result="hit").inc()
+        yield cached.replace(REPORT_TIMESTAMP_MARKER, generated_at)
+        return
+    
+    CACHE_REQUESTS.labels(cache="report", result="miss").inc()
+    chunks = []
+    elapsed = 0.0
+    sections = iter_report_sections(report_type, effects)
+    while True:
+        # Only time section generation, not the consumer between chunks
+        started = time.perf_counter()
+        chunk = next(sections, None)
+        elapsed += time.perf_counter() - started
+        if chunk is None:
+            break
+        chunks.append(chunk)
+        yield chunk.replace(REPORT_TIMESTAMP_MARKER, generated_at)
+    REPORT_LATENCY.labels(report_type=report_type).observe(elapsed)
+    
+    report_cache.put(key, "".join(chunks))
+
+@profiled("report")
+def generate_report(report_type, effects):
+    """Generate different types of reports"""
+    return "".join(stream_report(report_type, effects))
+
+class ReportStream(io.RawIOBase):
+    """Read-only file object that pulls report chunks lazily for st.download_button"""
+    
+    def __init__(self, chunks):
+        super().__init__()
+        self._chunks = iter(chunks)
+        self._buffer = b""
+        self._position = 0
+    
+    def readable(self):
+        return True
+    
+    def seek(self, offset, whence=io.SEEK_SET):
+        # Streamlit rewinds file objects before reading; only a no-op rewind is possible
+        if offset == 0 and whence == io.SEEK_SET and self._position == 0:
+            return 0
+        raise io.UnsupportedOperation("ReportStream is not seekable")
+    
+    def readinto(self, buffer):
+        while not self._buffer:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._buffer = chunk.encode("utf-8")
+        
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        self._position += size
+        return size
+
+def get_strategic_recommendations(metrics):
     """Generate strategic recommendations based on performance"""
     recommendations = []
+    uec_data = metrics['uec_data']
     
     if uec_data['overall_uec'] < 40:
         recommendations.append("• **Priority:** Shift to Pure Human-Social strategies for maximum leverage")
@@ -2829,15 +5943,13 @@ def get_strategic_recommendations(uec_data, effects):
     
     return "\n".join(recommendations) if recommendations else "• Continue current successful strategy"
 
-def get_behavioral_primacy_analysis(activated_loops):
+def get_behavioral_primacy_analysis(metrics):
     """Analyze behavioral primacy in loop activation"""
-    behavioral_loops = [
-        loop for loop in activated_loops 
-        if 'Human-Social' in SCIENTIFIC_LOOP_DATA.get(loop.get('loop_id', 0), {}).get('subsystems', [])
-    ]
+    activated_loops = metrics['activated_loops']
+    behavioral_loops = metrics['behavioral_loops']
     
-    behavioral_leverage = sum(loop.get('leverage', 0) for loop in behavioral_loops)
-    total_leverage = sum(loop.get('leverage', 0) for loop in activated_loops)
+    behavioral_leverage = metrics['behavioral_leverage']
+    total_leverage = metrics['total_leverage']
     
     if total_leverage > 0:
         percentage = behavioral_leverage / total_leverage * 100
@@ -2849,26 +5961,22 @@ def get_behavioral_primacy_analysis(activated_loops):
     else:
         return "No leverage data available"
 
-def get_scientific_recommendations(activated_loops, uec_data):
+def get_scientific_recommendations(metrics):
     """Generate science-based recommendations"""
     recommendations = []
+    activated_loops = metrics['activated_loops']
     
     # Check behavioral primacy
-    behavioral_loops = [
-        loop for loop in activated_loops 
-        if 'Human-Social' in SCIENTIFIC_LOOP_DATA.get(loop.get('loop_id', 0), {}).get('subsystems', [])
-    ]
-    
-    if len(behavioral_loops) < len(activated_loops) * 0.6:
+    if len(metrics['behavioral_loops']) < len(activated_loops) * 0.6:
         recommendations.append("1. **Increase behavioral focus:** Target 70% of strategies on Human-Social interventions")
         recommendations.append("2. **Create custom behavioral strategies:** Use keywords like 'community', 'engagement', 'participation'")
     
     # Check innovation
-    if len(st.session_state.custom_strategies) < 2:
+    if metrics['custom_strategy_count'] < 2:
         recommendations.append("3. **Boost innovation:** Create custom strategies tailored to your specific zones")
     
     # Check leverage optimization
-    avg_leverage = sum(loop.get('leverage', 0) for loop in activated_loops) / len(activated_loops) if activated_loops else 0
+    avg_leverage = metrics['total_leverage'] / len(activated_loops) if activated_loops else 0
     if avg_leverage < 0.8:
         recommendations.append("4. **Optimize leverage:** Choose strategies that activate high-leverage loops")
     
@@ -2943,18 +6051,15 @@ def get_subsystem_detailed_analysis(uec_data):
     
     return "\n".join(analysis)
 
-def get_complete_loop_analysis(effects):
+def get_complete_loop_analysis(metrics):
     """Generate complete loop analysis"""
-    activated_loops = effects.get('activated_loops', [])
+    activated_loops = metrics['activated_loops']
     
     if not activated_loops:
         return "No loops activated. Configure strategies to engage the feedback loop system."
     
     # Analyze by strategic value
-    value_counts = {}
-    for loop in activated_loops:
-        value = loop.get('strategic_value', 'Unknown')
-        value_counts[value] = value_counts.get(value, 0) + 1
+    value_counts = metrics['value_counts']
     
     analysis = f"""
 **Loop Activation Analysis:**
@@ -2963,14 +6068,16 @@ def get_complete_loop_analysis(effects):
 - Important Value Loops: {value_counts.get('Important', 0)}
 - Moderate Value Loops: {value_counts.get('Moderate', 0)}
 
-**System Leverage:** {sum(loop.get('leverage', 0) for loop in activated_loops):.3f}
+**System Leverage:** {metrics['total_leverage']:.3f}
 """
     
     return analysis
 
-def get_achievement_summary(uec_data, effects):
+def get_achievement_summary(metrics):
     """Generate achievement summary"""
     achievements = []
+    uec_data = metrics['uec_data']
+    effects = metrics['effects']
     
     if uec_data['overall_uec'] >= 90:
         achievements.append("🏆 **URBAN MASTER** - Achieved world-class UEC score")
@@ -2979,10 +6086,10 @@ def get_achievement_summary(uec_data, effects):
     elif uec_data['overall_uec'] >= 65:
         achievements.append("⭐ **SKILLED STRATEGIST** - Strong strategic thinking")
     
-    if len(effects.get('activated_loops', [])) >= 20:
+    if len(metrics['activated_loops']) >= 20:
         achievements.append("🔄 **LOOP MASTER** - Activated 20+ feedback loops")
     
-    if len(st.session_state.custom_strategies) >= 3:
+    if metrics['custom_strategy_count'] >= 3:
         achievements.append("✨ **STRATEGY INNOVATOR** - Created 3+ custom strategies")
     
     if len(effects.get('spillover_effects', {})) >= 5:
@@ -2990,9 +6097,11 @@ def get_achievement_summary(uec_data, effects):
     
     return "\n".join(achievements) if achievements else "🌱 Continue playing to unlock achievements!"
 
-def get_learning_outcomes(uec_data, effects):
+def get_learning_outcomes(metrics):
     """Generate learning outcomes based on gameplay"""
     outcomes = []
+    uec_data = metrics['uec_data']
+    effects = metrics['effects']
     
     if uec_data['subsystem_scores'].get('Human-Social', 0) > 60:
         outcomes.append("• **Behavioral Primacy:** Successfully applied the principle that behavioral interventions have higher leverage")
@@ -3000,10 +6109,10 @@ def get_learning_outcomes(uec_data, effects):
     if len(effects.get('spillover_effects', {})) > 0:
         outcomes.append("• **Network Effects:** Understood how urban interventions create ripple effects across zones")
     
-    if len(effects.get('activated_loops', [])) > 10:
+    if len(metrics['activated_loops']) > 10:
         outcomes.append("• **Systems Thinking:** Demonstrated ability to activate multiple feedback loops for system change")
     
-    if len(st.session_state.custom_strategies) >= 1:
+    if metrics['custom_strategy_count'] >= 1:
         outcomes.append("• **Innovation Skills:** Created custom strategies using evidence-based keyword analysis")
     
     outcomes.append("• **Evidence-Based Planning:** Applied scientific research to urban sustainability challenges")
@@ -3011,11 +6120,11 @@ def get_learning_outcomes(uec_data, effects):
     
     return "\n".join(outcomes)
 
-def get_future_applications_guide(uec_data):
+def get_future_applications_guide(metrics):
     """Generate guide for applying learnings in real contexts"""
-    innovation_score = len(st.session_state.custom_strategies)
+    innovation_score = metrics['custom_strategy_count']
     
-    if uec_data['overall_uec'] >= 70 and innovation_score >= 2:
+    if metrics['uec_data']['overall_uec'] >= 70 and innovation_score >= 2:
         return """
 **Real-World Application Readiness: HIGH**
 
@@ -3063,5 +6172,1335 @@ def generate_strategy_summary():
     
     return '\n'.join(rows)
 
+# EXPORT BUNDLE
+BUNDLE_CHUNK_SIZE = 64 * 1024
+BUNDLE_MAX_PENDING_CHUNKS = 8
+
+def build_current_results_export(effects):
+    """Payload of the "Export Current Results" JSON download"""
+    return {
+        'team': st.session_state.team_name,
+        'round': st.session_state.current_round,
+        'zones': st.session_state.game_manager.selected_zones,
+        'custom_strategies': st.session_state.custom_strategies,
+        'effects': effects,
+        'timestamp': datetime.now().isoformat()
+    }
+
+def build_all_rounds_export():
+    """Payload of the "Export All Rounds" JSON download"""
+    return {
+        'team': st.session_state.team_name,
+        'game': st.session_state.game_name,
+        # Restored rounds compute their effects lazily; materialize them for the export
+        'rounds': {
+            round_num: dict(round_data, effects=round_data['effects'])
+            for round_num, round_data in st.session_state.game_manager.round_history.items()
+        },
+        'current_round': st.session_state.current_round,
+        'custom_strategies': st.session_state.custom_strategies,
+        'export_timestamp': datetime.now().isoformat()
+    }
+
+def collect_rounds_effects(current_effects):
+    """Effects of every saved round plus the current one, keyed by round number"""
+    rounds_effects = {
+        round_num: round_data['effects']
+        for round_num, round_data in st.session_state.game_manager.round_history.items()
+        if round_data['effects']  # Imported rounds with no configured zones have no effects
+    }
+    if current_effects:
+        rounds_effects.setdefault(st.session_state.current_round, current_effects)
+    return rounds_effects
+
+def _encoded_chunks(text_chunks, chunk_size=BUNDLE_CHUNK_SIZE):
+    """Re-batch small text fragments into UTF-8 chunks of roughly chunk_size bytes"""
+    pending = []
+    pending_size = 0
+    for text in text_chunks:
+        pending.append(text)
+        pending_size += len(text)
+        if pending_size >= chunk_size:
+            yield "".join(pending).encode("utf-8")
+            pending = []
+            pending_size = 0
+    if pending:
+        yield "".join(pending).encode("utf-8")
+
+def _json_chunks(data):
+    """Stream a JSON document without materializing the full string"""
+    return _encoded_chunks(json.JSONEncoder(indent=2, default=str).iterencode(data))
+
+def _deferred_chunk(build_bytes):
+    """Single-chunk iterator that only builds its payload when the writer asks for it"""
+    yield build_bytes()
+
+def _bundle_slug(label):
+    """Archive-friendly file name for a report or chart label"""
+    return re.sub(r"[^a-z0-9]+", "_", label.lower()).strip("_")
+
+class ZipBundleWriter:
+    """Writes ZIP entries on a background thread from chunks streamed by the caller"""
+    
+    def __init__(self, fileobj, compression=zipfile.ZIP_DEFLATED, max_pending=BUNDLE_MAX_PENDING_CHUNKS):
+        self._zip = zipfile.ZipFile(fileobj, "w", compression=compression)
+        # Bounded queue: the producer blocks instead of buffering every artifact in memory
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="zip-bundle-writer", daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        entry = None
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._error is not None:
+                continue  # Keep draining so the producer never blocks on a dead writer
+            
+            kind, payload = item
+            try:
+                if kind == "open":
+                    entry = self._zip.open(payload, "w", force_zip64=True)
+                elif kind == "data":
+                    entry.write(payload)
+                else:
+                    entry.close()
+                    entry = None
+            except Exception as exc:
+                self._error = exc
+        
+        try:
+            if entry is not None:
+                entry.close()
+            self._zip.close()
+        except Exception as exc:
+            self._error = self._error or exc
+    
+    def write_entry(self, name, chunks):
+        """Queue one archive entry; chunks is an iterable of bytes produced lazily"""
+        self._queue.put(("open", name))
+        for chunk in chunks:
+            self._queue.put(("data", chunk))
+        self._queue.put(("close", None))
+    
+    def close(self):
+        """Flush pending entries, finish the archive and re-raise any writer error"""
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+def iter_export_bundle_entries(current_effects):
+    """Yield (archive name, chunk iterator) for every artifact; nothing is built until consumed"""
+    manager = st.session_state.game_manager
+    
+    for report_type in BUNDLE_REPORT_TYPES:
+        yield f"reports/{_bundle_slug(report_type)}.md", _encoded_chunks(stream_report(report_type, current_effects))
+    
+    yield "data/strategies.csv", _encoded_chunks([generate_strategy_summary()])
+    
+    if current_effects:
+        yield "data/current_results.json", _json_chunks(build_current_results_export(current_effects))
+    
+    if manager.round_history:
+        yield "data/all_rounds.json", _json_chunks(build_all_rounds_export())
+    
+    rounds_effects = collect_rounds_effects(current_effects)
+    if rounds_effects:
+        yield "data/effects_columnar.npz", _deferred_chunk(lambda: export_effects_columnar(rounds_effects, {
+            'team': st.session_state.team_name,
+            'game': st.session_state.game_name
+        }))
+    
+    if current_effects:
+        uec_data = calculate_normalized_uec_score(current_effects)
+        chart_builders = [
+            ("uec_gauge", lambda: build_uec_gauge_figure(uec_data)),
+            ("subsystem_performance", lambda: build_subsystem_scores_figure(uec_data)),
+            ("zone_performance", lambda: build_zone_performance_figure(
+                build_zone_performance_frame(current_effects.get('zone_performance', {}))
+            ))
+        ]
+        for chart_name, build_figure in chart_builders:
+            yield f"charts/{chart_name}.json", _deferred_chunk(lambda build_figure=build_figure: build_figure().to_json().encode("utf-8"))
+
+def build_export_bundle(current_effects):
+    """Write the "export everything" ZIP to a temporary file and return its path"""
+    bundle_file = tempfile.NamedTemporaryFile(prefix="urban_pulse_bundle_", suffix=".zip", delete=False)
+    try:
+        with bundle_file:
+            writer = ZipBundleWriter(bundle_file)
+            try:
+                for name, chunks in iter_export_bundle_entries(current_effects):
+                    writer.write_entry(name, chunks)
+            finally:
+                writer.close()
+    except Exception:
+        os.remove(bundle_file.name)
+        raise
+    
+    EXPORT_BYTES.labels(format="zip").observe(os.path.getsize(bundle_file.name))
+    return bundle_file.name
+
+# COLUMNAR DATA EXPORT
+COLUMNAR_SCHEMA_VERSION = 1
+
+COLUMNAR_TABLES = {
+    "direct_effects": ["round", "zone"] + SUBSYSTEMS,
+    "spillover": ["round", "target_zone", "source_zone", "subsystem", "effect", "distance",
+                  "decay_multiplier", "delay_rounds", "effective_round", "distance_category"],
+    "synergies": ["round", "zone_1", "zone_2", "synergy_score", "distance"],
+    "activated_loops": ["round", "loop_id", "activation", "influence", "leverage", "role", "strategic_value"]
+}
+
+COLUMNAR_INT_COLUMNS = {"round", "delay_rounds", "effective_round", "loop_id"}
+COLUMNAR_STRING_COLUMNS = {"zone", "target_zone", "source_zone", "subsystem", "distance_category",
+                           "zone_1", "zone_2", "role", "strategic_value"}
+
+def _encode_string_column(values):
+    """Dictionary-encode a string column into (int32 codes, categories)"""
+    categories = sorted(set(values))
+    lookup = {value: code for code, value in enumerate(categories)}
+    codes = np.fromiter((lookup[value] for value in values), dtype=np.int32, count=len(values))
+    return codes, np.array(categories, dtype=str)
+
+def _flatten_effects_to_columns(rounds_effects):
+    """Flatten {round: effects} into column lists for every columnar table"""
+    columns = {table: {column: [] for column in table_columns} for table, table_columns in COLUMNAR_TABLES.items()}
+    
+    for round_number, effects in rounds_effects.items():
+        round_number = int(round_number)
+        
+        direct = columns["direct_effects"]
+        for zone, zone_effects in effects.get("direct_effects", {}).items():
+            direct["round"].append(round_number)
+            direct["zone"].append(zone)
+            for subsystem in SUBSYSTEMS:
+                # NaN marks subsystems the zone's strategies do not touch
+                direct[subsystem].append(zone_effects.get(subsystem, np.nan))
+        
+        spillover = columns["spillover"]
+        for target_zone, sources in effects.get("spillover_effects", {}).items():
+            for source_zone, spillover_data in sources.items():
+                for subsystem, effect in spillover_data.get("effects", {}).items():
+                    spillover["round"].append(round_number)
+                    spillover["target_zone"].append(target_zone)
+                    spillover["source_zone"].append(source_zone)
+                    spillover["subsystem"].append(subsystem)
+                    spillover["effect"].append(effect)
+                    spillover["distance"].append(spillover_data.get("distance", np.nan))
+                    spillover["decay_multiplier"].append(spillover_data.get("decay_multiplier", np.nan))
+                    spillover["delay_rounds"].append(spillover_data.get("delay_rounds", 0))
+                    spillover["effective_round"].append(spillover_data.get("effective_round", 0))
+                    spillover["distance_category"].append(spillover_data.get("distance_category", ""))
+        
+        synergies = columns["synergies"]
+        for synergy_data in effects.get("cross_zone_synergies", {}).values():
+            zone_1, zone_2 = synergy_data.get("zones", ["", ""])
+            synergies["round"].append(round_number)
+            synergies["zone_1"].append(zone_1)
+            synergies["zone_2"].append(zone_2)
+            synergies["synergy_score"].append(synergy_data.get("synergy_score", 0.0))
+            synergies["distance"].append(synergy_data.get("distance", np.nan))
+        
+        loops = columns["activated_loops"]
+        for loop in effects.get("activated_loops", []):
+            loops["round"].append(round_number)
+            for column in COLUMNAR_TABLES["activated_loops"][1:]:
+                loops[column].append(loop.get(column, "" if column in COLUMNAR_STRING_COLUMNS else 0))
+    
+    return columns
+
+def export_effects_columnar(rounds_effects, metadata=None):
+    """Export {round: effects} as typed columnar tables in a compressed .npz archive"""
+    columns = _flatten_effects_to_columns(rounds_effects)
+    
+    arrays = {}
+    for table, table_columns in columns.items():
+        for column, values in table_columns.items():
+            name = f"{table}.{column}"
+            if column in COLUMNAR_STRING_COLUMNS:
+                arrays[name + ".codes"], arrays[name + ".categories"] = _encode_string_column(values)
+            elif column in COLUMNAR_INT_COLUMNS:
+                arrays[name] = np.asarray(values, dtype=np.int32)
+            else:
+                arrays[name] = np.asarray(values, dtype=np.float64)
+    
+    meta = {"exported_at": datetime.now().isoformat()}
+    meta.update(metadata or {})
+    # Reserved keys describe the archive layout and must not be overridden by callers
+    meta.update({
+        "schema_version": COLUMNAR_SCHEMA_VERSION,
+        "tables": COLUMNAR_TABLES,
+        "rounds": sorted(int(round_number) for round_number in rounds_effects)
+    })
+    arrays["__meta__"] = np.array(json.dumps(meta, default=str))
+    
+    buffer = BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    EXPORT_BYTES.labels(format="npz").observe(buffer.tell())
+    return buffer.getvalue()
+
+def load_effects_columnar(source):
+    """Load a columnar export back into pandas DataFrames keyed by table name"""
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+    
+    with np.load(source, allow_pickle=False) as archive:
+        meta = json.loads(str(archive["__meta__"]))
+        schema_version = meta.get("schema_version")
+        if schema_version != COLUMNAR_SCHEMA_VERSION:
+            raise ValueError(f"Unsupported columnar schema version: {schema_version}")
+        
+        tables = {"meta": meta}
+        for table, table_columns in meta["tables"].items():
+            data = {}
+            for column in table_columns:
+                name = f"{table}.{column}"
+                if name + ".codes" in archive:
+                    data[column] = pd.Categorical.from_codes(archive[name + ".codes"], archive[name + ".categories"])
+                else:
+                    data[column] = archive[name]
+            tables[table] = pd.DataFrame(data, columns=table_columns)
+    
+    return tables
+
+# SWEEP RESULT STORE
+SWEEP_STORE_SCHEMA_VERSION = 1
+SWEEP_STORE_INDEX_FILE = "index.json"
+SWEEP_STORE_BLOCK_ROWS = 1 << 16  # Rows per index block; the index keeps each column's min/max per block
+SWEEP_STORE_BUFFER_ROWS = 1 << 14  # Appended rows held in memory before they are written out
+
+# Compact little-endian column types; scores are float32, ids and counts int32
+SWEEP_STORE_COLUMNS = {
+    "scenario_id": "<i4",
+    "overall_uec": "<f4",
+    "human_social": "<f4",
+    "spatial": "<f4",
+    "air_soundscape": "<f4",
+    "thermal": "<f4",
+    "loop_activations": "<i4",
+    "unique_loops": "<i4"
+}
+SWEEP_SUBSYSTEM_COLUMNS = dict(zip(SUBSYSTEMS, ["human_social", "spatial", "air_soundscape", "thermal"]))
+
+def sweep_row(scenario_id, uec_data, effects=None):
+    """One store row from calculate_normalized_uec_score output and, for loop counts, the effects"""
+    loops = (effects or {}).get("activated_loops", [])
+    row = {
+        "scenario_id": scenario_id,
+        "overall_uec": uec_data["overall_uec"],
+        "loop_activations": len(loops),
+        "unique_loops": len({loop["loop_id"] for loop in loops})
+    }
+    for subsystem, column in SWEEP_SUBSYSTEM_COLUMNS.items():
+        row[column] = uec_data["subsystem_scores"].get(subsystem, 0.0)
+    return row
+
+def _top_n_positions(keys, rows, n):
+    """Positions of the n smallest keys, ties at the cut-off going to the lowest rows, in linear time"""
+    if not n:
+        return np.zeros(0, dtype=np.int64)
+    cutoff = np.partition(keys, n - 1)[n - 1]
+    below = np.flatnonzero(keys < cutoff)
+    tied = np.flatnonzero(keys == cutoff)
+    tied = tied[np.argsort(rows[tied], kind="stable")[:n - len(below)]]
+    return np.concatenate([below, tied])
+
+class SweepResultStore:
+    """Append-only columnar store of sweep results, one raw memory-mappable file per column
+    
+    index.json holds the committed row count and per-block min/max of every column. It is
+    replaced atomically after the column data is written, so readers and a reopened writer
+    never see a partial append; bytes past the committed count are dropped on reopen.
+    """
+    
+    def __init__(self, path, mode="a"):
+        if mode not in ("a", "r"):
+            raise ValueError(f"Unsupported mode {mode!r}, use 'a' or 'r'")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._buffer = {column: [] for column in SWEEP_STORE_COLUMNS}
+        self._handles = {}
+        
+        if mode == "a":
+            os.makedirs(path, exist_ok=True)
+        self.refresh()
+        if mode == "a":
+            for column, dtype in SWEEP_STORE_COLUMNS.items():
+                handle = open(self._column_path(column), "ab")
+                handle.truncate(self.rows * np.dtype(dtype).itemsize)
+                self._handles[column] = handle
+            if not os.path.exists(os.path.join(path, SWEEP_STORE_INDEX_FILE)):
+                self._write_index()
+    
+    def _column_path(self, column):
+        return os.path.join(self.path, f"{column}.bin")
+    
+    def refresh(self):
+        """Re-read the index; readers call this to see rows committed by a writer"""
+        index_path = os.path.join(self.path, SWEEP_STORE_INDEX_FILE)
+        if not os.path.exists(index_path):
+            if self.mode == "r":
+                raise FileNotFoundError(f"No sweep store at {self.path}")
+            self.rows, self.blocks = 0, {column: [] for column in SWEEP_STORE_COLUMNS}
+            return
+        
+        with open(index_path, "r", encoding="utf-8") as handle:
+            index = json.load(handle)
+        if index.get("schema_version") != SWEEP_STORE_SCHEMA_VERSION:
+            raise ValueError(f"Unsupported sweep store schema version: {index.get('schema_version')}")
+        self.rows = index["rows"]
+        self.blocks = index["blocks"]
+    
+    def _write_index(self):
+        fd, temp_path = tempfile.mkstemp(prefix=".index_", dir=self.path)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                json.dump({
+                    "schema_version": SWEEP_STORE_SCHEMA_VERSION,
+                    "rows": self.rows,
+                    "columns": SWEEP_STORE_COLUMNS,
+                    "block_rows": SWEEP_STORE_BLOCK_ROWS,
+                    "blocks": self.blocks
+                }, handle)
+            os.replace(temp_path, os.path.join(self.path, SWEEP_STORE_INDEX_FILE))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    
+    def __len__(self):
+        return self.rows
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def close(self):
+        if self.mode == "a":
+            self.flush()
+        for handle in self._handles.values():
+            handle.close()
+        self._handles = {}
+    
+    def append(self, scenario_id, uec_data, effects=None):
+        """Buffer one scenario's scores; written out every SWEEP_STORE_BUFFER_ROWS rows"""
+        row = sweep_row(scenario_id, uec_data, effects)
+        with self._lock:
+            for column, values in self._buffer.items():
+                values.append(row[column])
+            buffered = len(self._buffer["scenario_id"])
+        if buffered >= SWEEP_STORE_BUFFER_ROWS:
+            self.flush()
+    
+    def append_batch(self, columns):
+        """Append whole columns at once: {column: array-like}, every column the same length"""
+        with self._lock:
+            self._flush_locked()
+            self._write_columns(columns)
+    
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+    
+    def _flush_locked(self):
+        if self._buffer["scenario_id"]:
+            buffered, self._buffer = self._buffer, {column: [] for column in SWEEP_STORE_COLUMNS}
+            self._write_columns(buffered)
+    
+    def _write_columns(self, columns):
+        if self.mode != "a":
+            raise PermissionError("Sweep store opened read-only")
+        missing = set(SWEEP_STORE_COLUMNS) - set(columns)
+        if missing:
+            raise ValueError(f"Missing sweep columns: {sorted(missing)}")
+        
+        arrays = {}
+        for column, dtype in SWEEP_STORE_COLUMNS.items():
+            values = np.asarray(columns[column])
+            if np.dtype(dtype).kind == "i" and values.size and (values.min() < -2**31 or values.max() >= 2**31):
+                raise ValueError(f"{column} does not fit in int32")
+            arrays[column] = values.astype(dtype, copy=False)
+        lengths = {len(values) for values in arrays.values()}
+        if len(lengths) != 1:
+            raise ValueError("Sweep columns must all have the same length")
+        count = lengths.pop()
+        if not count:
+            return
+        
+        for column, values in arrays.items():
+            values.tofile(self._handles[column])
+            self._handles[column].flush()
+        
+        first_block = self.rows // SWEEP_STORE_BLOCK_ROWS
+        self.rows += count
+        for column in SWEEP_STORE_COLUMNS:
+            data = self.column(column)
+            stats = self.blocks[column][:first_block]
+            for start in range(first_block * SWEEP_STORE_BLOCK_ROWS, self.rows, SWEEP_STORE_BLOCK_ROWS):
+                block = data[start:start + SWEEP_STORE_BLOCK_ROWS]
+                stats.append([block.min().item(), block.max().item()])
+            self.blocks[column] = stats
+        self._write_index()
+    
+    def column(self, name):
+        """Read-only memory map of a column's committed rows"""
+        dtype = np.dtype(SWEEP_STORE_COLUMNS[name])
+        if not self.rows:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(self._column_path(name), dtype=dtype, mode="r", shape=(self.rows,))
+    
+    def _candidate_blocks(self, where):
+        """Blocks whose per-column min/max ranges can satisfy every (low, high) condition"""
+        candidates = []
+        for block in range((self.rows + SWEEP_STORE_BLOCK_ROWS - 1) // SWEEP_STORE_BLOCK_ROWS):
+            if all(
+                (low is None or self.blocks[column][block][1] >= low) and (high is None or self.blocks[column][block][0] <= high)
+                for column, (low, high) in (where or {}).items()
+            ):
+                candidates.append(block)
+        return candidates
+    
+    def _block_mask(self, start, stop, where):
+        mask = np.ones(stop - start, dtype=bool)
+        for column, (low, high) in (where or {}).items():
+            values = self.column(column)[start:stop]
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        return mask
+    
+    def rows_frame(self, rows, columns=None):
+        """DataFrame of the given row numbers, reading only those rows from each column"""
+        rows = np.asarray(rows, dtype=np.int64)
+        frame = pd.DataFrame({column: self.column(column)[rows] for column in (columns or SWEEP_STORE_COLUMNS)})
+        frame.index = rows
+        return frame
+    
+    def filter(self, where, columns=None, limit=None):
+        """Rows matching every {column: (low, high)} condition (inclusive, None = open), in row order"""
+        for column in where or {}:
+            if column not in SWEEP_STORE_COLUMNS:
+                raise KeyError(f"Unknown sweep column {column!r}")
+        matches = []
+        found = 0
+        for block in self._candidate_blocks(where):
+            start = block * SWEEP_STORE_BLOCK_ROWS
+            stop = min(start + SWEEP_STORE_BLOCK_ROWS, self.rows)
+            rows = start + np.flatnonzero(self._block_mask(start, stop, where))
+            matches.append(rows)
+            found += len(rows)
+            if limit is not None and found >= limit:
+                break
+        rows = np.concatenate(matches) if matches else np.zeros(0, dtype=np.int64)
+        return self.rows_frame(rows[:limit] if limit is not None else rows, columns)
+    
+    def top_n(self, n, by="overall_uec", where=None, ascending=False, columns=None):
+        """The n best rows by one column, optionally filtered; blocks that cannot beat the current
+        n-th best (by their index min/max) are never read"""
+        if by not in SWEEP_STORE_COLUMNS:
+            raise KeyError(f"Unknown sweep column {by!r}")
+        sign = 1.0 if ascending else -1.0
+        # Visit blocks best-bound first so the cut-off rises as early as possible
+        bound = {block: sign * self.blocks[by][block][0 if ascending else 1] for block in self._candidate_blocks(where)}
+        best_keys = np.zeros(0)
+        best_rows = np.zeros(0, dtype=np.int64)
+        for block in sorted(bound, key=bound.get):
+            if n and len(best_keys) >= n and bound[block] > best_keys.max():
+                break
+            start = block * SWEEP_STORE_BLOCK_ROWS
+            stop = min(start + SWEEP_STORE_BLOCK_ROWS, self.rows)
+            local = np.flatnonzero(self._block_mask(start, stop, where))
+            keys = sign * self.column(by)[start:stop][local].astype(np.float64)
+            best_keys = np.concatenate([best_keys, keys])
+            best_rows = np.concatenate([best_rows, start + local])
+            if len(best_keys) > n:
+                keep = _top_n_positions(best_keys, best_rows, n)
+                best_keys, best_rows = best_keys[keep], best_rows[keep]
+        
+        order = np.lexsort((best_rows, best_keys))
+        return self.rows_frame(best_rows[order], columns)
+
+def run_scenario_sweep(scenarios, store, calculator=None, round_number=1):
+    """Evaluate (scenario_id, zone_actions_dict) pairs and append their UEC scores to store"""
+    calculator = calculator or SpatialEffectsCalculator()
+    count = 0
+    for scenario_id, zone_actions_dict in scenarios:
+        effects = calculator.calculate_multi_zone_effects(zone_actions_dict, round_number)
+        store.append(scenario_id, calculate_normalized_uec_score(effects), effects)
+        count += 1
+    store.flush()
+    return count
+
+# SESSION IMPORT
+class SessionImportError(ValueError):
+    """Raised when an exported session file cannot be restored"""
+
+def compile_schema(spec):
+    """Compile a schema spec into a validator that checks a document in one pass"""
+    kind = spec.get("type", "any")
+    
+    if kind == "object":
+        properties = {name: compile_schema(sub_spec) for name, sub_spec in spec.get("properties", {}).items()}
+        required = tuple(spec.get("required", ()))
+        values_check = compile_schema(spec["values"]) if "values" in spec else None
+        allowed_keys = frozenset(spec["keys"]) if "keys" in spec else None
+        key_pattern = re.compile(spec["key_pattern"]) if "key_pattern" in spec else None
+        
+        def validate_object(value, path):
+            if not isinstance(value, dict):
+                raise SessionImportError(f"{path}: expected an object")
+            for name in required:
+                if name not in value:
+                    raise SessionImportError(f"{path}: missing required field '{name}'")
+            for name, item in value.items():
+                if allowed_keys is not None and name not in allowed_keys:
+                    raise SessionImportError(f"{path}: unknown key '{name}'")
+                if key_pattern is not None and not key_pattern.match(name):
+                    raise SessionImportError(f"{path}: invalid key '{name}'")
+                check = properties.get(name, values_check)
+                if check is not None:
+                    check(item, f"{path}.{name}")
+        
+        return validate_object
+    
+    if kind == "array":
+        items_check = compile_schema(spec["items"]) if "items" in spec else None
+        
+        def validate_array(value, path):
+            if not isinstance(value, list):
+                raise SessionImportError(f"{path}: expected an array")
+            if items_check is not None:
+                for index, item in enumerate(value):
+                    items_check(item, f"{path}[{index}]")
+        
+        return validate_array
+    
+    if kind == "any":
+        return lambda value, path: None
+    
+    expected_types = {
+        "string": (str,),
+        "integer": (int,),
+        "number": (int, float),
+        "boolean": (bool,)
+    }[kind]
+    allow_bool = kind == "boolean"
+    
+    def validate_scalar(value, path):
+        # bool is an int subclass; only accept it where a boolean is expected
+        if not isinstance(value, expected_types) or (isinstance(value, bool) and not allow_bool):
+            raise SessionImportError(f"{path}: expected {kind}")
+    
+    return validate_scalar
+
+ZONE_CONFIG_SCHEMA = {
+    "type": "object",
+    "keys": list(CITY_ZONES.keys()),
+    "values": {
+        "type": "object",
+        "required": ["strategies", "actions"],
+        "properties": {
+            "strategies": {"type": "array", "items": {"type": "string"}},
+            "actions": {"type": "array", "items": {"type": "string"}}
+        }
+    }
+}
+
+CUSTOM_STRATEGIES_SCHEMA = {
+    "type": "object",
+    "values": {
+        "type": "object",
+        "required": ["Strategy", "Subsystems", "Actions"],
+        "properties": {
+            "Strategy": {"type": "string"},
+            "Description": {"type": "string"},
+            "Subsystems": {"type": "array", "items": {"type": "string"}},
+            "Actions": {"type": "array", "items": {"type": "string"}},
+            "Loop_Impact": {"type": "string"},
+            "Evidence_Base": {"type": "string"},
+            "Created_For_Zone": {"type": "string"},
+            "Custom": {"type": "boolean"}
+        }
+    }
+}
+
+# Effects inside an export are derived data: they are not validated or trusted,
+# restored rounds recompute them on first access instead
+CURRENT_RESULTS_SCHEMA = {
+    "type": "object",
+    "required": ["team", "round", "zones"],
+    "properties": {
+        "team": {"type": "string"},
+        "round": {"type": "integer"},
+        "zones": ZONE_CONFIG_SCHEMA,
+        "custom_strategies": CUSTOM_STRATEGIES_SCHEMA,
+        "timestamp": {"type": "string"}
+    }
+}
+
+ALL_ROUNDS_SCHEMA = {
+    "type": "object",
+    "required": ["team", "rounds", "current_round"],
+    "properties": {
+        "team": {"type": "string"},
+        "game": {"type": "string"},
+        "current_round": {"type": "integer"},
+        "custom_strategies": CUSTOM_STRATEGIES_SCHEMA,
+        "export_timestamp": {"type": "string"},
+        "zones": ZONE_CONFIG_SCHEMA,
+        "rounds": {
+            "type": "object",
+            "key_pattern": r"^\d+$",
+            "values": {
+                "type": "object",
+                "required": ["zones"],
+                "properties": {
+                    "zones": ZONE_CONFIG_SCHEMA,
+                    "timestamp": {"type": "string"}
+                }
+            }
+        }
+    }
+}
+
+validate_current_results_export = compile_schema(CURRENT_RESULTS_SCHEMA)
+validate_all_rounds_export = compile_schema(ALL_ROUNDS_SCHEMA)
+
+class RoundRecord(dict):
+    """round_history entry whose effects are recomputed from its zones on first access
+    
+    Custom strategy names resolve against the imported session's custom strategies, not
+    whatever the live session holds when the effects are first read.
+    """
+    
+    def __init__(self, calculator, round_number, zones, timestamp, custom_strategies):
+        super().__init__(zones=zones, timestamp=timestamp)
+        self._calculator = calculator
+        self._round_number = round_number
+        self._custom_strategies = custom_strategies
+    
+    def __missing__(self, key):
+        if key != 'effects':
+            raise KeyError(key)
+        
+        zone_actions_dict = {
+            zone_id: zone_data
+            for zone_id, zone_data in self['zones'].items()
+            if zone_data.get('strategies') and zone_data.get('actions')
+        }
+        effects = None
+        if zone_actions_dict:
+            with custom_strategies_scope(self._custom_strategies):
+                effects = self._calculator.calculate_multi_zone_effects(zone_actions_dict, self._round_number)
+        self['effects'] = effects
+        return effects
+
+def _read_session_documents(source):
+    """Decode an uploaded export (JSON text/bytes, parsed dict, or export bundle ZIP)"""
+    if isinstance(source, dict):
+        return [source]
+    if isinstance(source, str):
+        source = source.encode("utf-8")
+    if hasattr(source, "read"):
+        source = source.read()
+    
+    try:
+        if source[:2] == b"PK":
+            with zipfile.ZipFile(BytesIO(source)) as bundle:
+                names = [name for name in ("data/all_rounds.json", "data/current_results.json") if name in bundle.namelist()]
+                if not names:
+                    raise SessionImportError("Bundle contains no session data")
+                return [json.loads(bundle.read(name)) for name in names]
+        return [json.loads(source)]
+    except (ValueError, zipfile.BadZipFile) as exc:
+        if isinstance(exc, SessionImportError):
+            raise
+        raise SessionImportError(f"Unreadable session file: {exc}") from exc
+
+def import_session(source):
+    """Restore an "Export Current Results"/"Export All Rounds" file into a new game manager
+    
+    Returns (manager, session) where session carries team_name, game_name,
+    current_round and custom_strategies for st.session_state.
+    """
+    manager = MultiZoneGameManager()
+    session = {"team_name": "", "game_name": "", "current_round": 1, "custom_strategies": {}}
+    # Saved rounds keep their own copy: later edits to the live session must not change them
+    restored_custom_strategies = {}
+    
+    for document in _read_session_documents(source):
+        if isinstance(document, dict) and "rounds" in document:
+            validate_all_rounds_export(document, "$")
+            
+            for round_key, round_data in document["rounds"].items():
+                round_number = int(round_key)
+                manager.round_history[round_number] = RoundRecord(
+                    manager.spatial_calculator,
+                    round_number,
+                    copy.deepcopy(round_data["zones"]),
+                    round_data.get("timestamp", ""),
+                    restored_custom_strategies
+                )
+            
+            session["current_round"] = document["current_round"]
+            session["game_name"] = document.get("game", session["game_name"])
+            
+            if "zones" in document:
+                manager.selected_zones = copy.deepcopy(document["zones"])
+            # Without a current-results document, resume from the latest saved zone setup
+            elif not manager.selected_zones and manager.round_history:
+                latest = manager.round_history.get(document["current_round"]) or manager.round_history[max(manager.round_history)]
+                manager.selected_zones = copy.deepcopy(latest["zones"])
+        else:
+            validate_current_results_export(document, "$")
+            manager.selected_zones = copy.deepcopy(document["zones"])
+            session["current_round"] = document["round"]
+        
+        session["team_name"] = document["team"]
+        restored_custom_strategies.update(copy.deepcopy(document.get("custom_strategies", {})))
+    
+    session["custom_strategies"] = copy.deepcopy(restored_custom_strategies)
+    manager.current_round = session["current_round"]
+    manager.team_id = session["team_name"]
+    manager.game_id = session["game_name"]
+    
+    return manager, session
+
+# PERSISTENT SESSION STORE
+SESSION_DB_PATH = os.environ.get("URBAN_PULSE_SESSION_DB", "urban_pulse_sessions.db")
+SESSION_SAVE_DEBOUNCE_SECONDS = 0.5
+
+class SessionStore:
+    """SQLite (WAL mode) store of team sessions keyed by (game_id, team_id)
+    
+    save() only records the latest state in memory; a background thread coalesces
+    bursts of saves and writes them in one transaction per debounce window, so the
+    Streamlit script thread never waits on disk I/O.
+    """
+    
+    def __init__(self, path=SESSION_DB_PATH, debounce_seconds=SESSION_SAVE_DEBOUNCE_SECONDS):
+        self.path = path
+        self.debounce_seconds = debounce_seconds
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._idle = threading.Condition(self._lock)
+        self._writing = False
+        self._closed = False
+        self._local = threading.local()
+        
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    game_id TEXT NOT NULL,
+                    team_id TEXT NOT NULL,
+                    state BLOB NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (game_id, team_id)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS submissions (
+                    game_id TEXT NOT NULL,
+                    team_id TEXT NOT NULL,
+                    state BLOB NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (game_id, team_id)
+                )
+            """)
+        
+        self._thread = threading.Thread(target=self._writer_loop, name="session-store-writer", daemon=True)
+        self._thread.start()
+    
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
+    def _reader(self):
+        # One read connection per thread; WAL lets readers run alongside the writer
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+    
+    def save(self, game_id, team_id, encoded_state):
+        """Queue the latest JSON-encoded state of a team; returns immediately"""
+        self._queue_write("sessions", game_id, team_id, encoded_state)
+    
+    def record_submission(self, game_id, team_id, submission):
+        """Queue a team's workshop submission (latest one wins)"""
+        self._queue_write("submissions", game_id, team_id, json.dumps(submission, default=str).encode("utf-8"))
+    
+    def load_submissions(self, game_id):
+        """Every stored submission of a game, including ones not yet written"""
+        rows = self._reader().execute(
+            "SELECT team_id, state FROM submissions WHERE game_id = ?", (game_id,)
+        ).fetchall()
+        submissions = {team_id: json.loads(zlib.decompress(state)) for team_id, state in rows}
+        
+        with self._lock:
+            for (table, pending_game, team_id), (encoded, _) in self._pending.items():
+                if table == "submissions" and pending_game == game_id:
+                    submissions[team_id] = json.loads(encoded)
+        return list(submissions.values())
+    
+    def _queue_write(self, table, game_id, team_id, encoded_state):
+        with self._lock:
+            self._pending[(table, game_id, team_id)] = (encoded_state, time.time())
+        self._wakeup.set()
+    
+    def load(self, game_id, team_id):
+        """Latest stored session document for a team, or None"""
+        with self._lock:
+            pending = self._pending.get(("sessions", game_id, team_id))
+        if pending is not None:
+            return json.loads(pending[0])
+        
+        row = self._reader().execute(
+            "SELECT state FROM sessions WHERE game_id = ? AND team_id = ?", (game_id, team_id)
+        ).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+    
+    def exists(self, game_id, team_id):
+        """Whether a saved session exists, without decoding it"""
+        with self._lock:
+            if ("sessions", game_id, team_id) in self._pending:
+                return True
+        row = self._reader().execute(
+            "SELECT 1 FROM sessions WHERE game_id = ? AND team_id = ?", (game_id, team_id)
+        ).fetchone()
+        return row is not None
+    
+    def list_sessions(self, game_id=None):
+        """(game_id, team_id, updated_at, stored bytes) of every saved session"""
+        query = "SELECT game_id, team_id, updated_at, length(state) FROM sessions"
+        params = ()
+        if game_id is not None:
+            query += " WHERE game_id = ?"
+            params = (game_id,)
+        return self._reader().execute(query + " ORDER BY updated_at DESC", params).fetchall()
+    
+    def flush(self, timeout=None):
+        """Block until every queued save has been committed"""
+        self._wakeup.set()
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._pending and not self._writing, timeout)
+    
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+    
+    def _writer_loop(self):
+        conn = self._connect()
+        while True:
+            self._wakeup.wait()
+            if not self._closed:
+                # Debounce: let rapid reruns overwrite each other before writing
+                time.sleep(self.debounce_seconds)
+            
+            with self._lock:
+                self._wakeup.clear()
+                batch = self._pending
+                self._pending = {}
+                self._writing = bool(batch)
+            
+            if batch:
+                rows_by_table = {}
+                for (table, game_id, team_id), (encoded_state, updated_at) in batch.items():
+                    rows_by_table.setdefault(table, []).append(
+                        (game_id, team_id, zlib.compress(encoded_state), updated_at)
+                    )
+                try:
+                    with conn:
+                        for table, rows in rows_by_table.items():
+                            conn.executemany(f"""
+                                INSERT INTO {table} (game_id, team_id, state, updated_at) VALUES (?, ?, ?, ?)
+                                ON CONFLICT(game_id, team_id) DO UPDATE SET
+                                    state = excluded.state, updated_at = excluded.updated_at
+                            """, rows)
+                except sqlite3.Error:
+                    # Keep the states for the next attempt unless newer ones arrived meanwhile
+                    with self._lock:
+                        for key, value in batch.items():
+                            self._pending.setdefault(key, value)
+                    time.sleep(self.debounce_seconds)
+                    self._wakeup.set()
+            
+            with self._idle:
+                self._writing = False
+                self._idle.notify_all()
+            
+            if self._closed and not self._pending:
+                conn.close()
+                return
+
+@st.cache_resource
+def get_session_store():
+    """Process-wide session store shared by every browser session"""
+    return SessionStore()
+
+def build_session_document():
+    """Compact restorable snapshot of the current session (effects are recomputed on load)"""
+    manager = st.session_state.game_manager
+    return {
+        'team': st.session_state.team_name,
+        'game': st.session_state.game_name,
+        'current_round': st.session_state.current_round,
+        'zones': manager.selected_zones,
+        'custom_strategies': st.session_state.custom_strategies,
+        'rounds': {
+            round_num: {'zones': round_data['zones'], 'timestamp': round_data.get('timestamp', '')}
+            for round_num, round_data in manager.round_history.items()
+        }
+    }
+
+def apply_restored_session(manager, session):
+    """Install a restored game manager and session fields into st.session_state"""
+    st.session_state.game_manager = manager
+    st.session_state.team_name = session["team_name"]
+    st.session_state.game_name = session["game_name"] or st.session_state.game_name
+    st.session_state.current_round = session["current_round"]
+    st.session_state.custom_strategies = session["custom_strategies"]
+
+def persist_session():
+    """Queue the session for the persistent store when its state changed since the last save"""
+    manager = st.session_state.game_manager
+    if not (st.session_state.team_name and manager.game_id and manager.team_id):
+        return False
+    
+    encoded = json.dumps(build_session_document(), separators=(",", ":"), sort_keys=True, default=str).encode("utf-8")
+    digest = hashlib.blake2b(encoded, digest_size=16).digest()
+    if st.session_state.get('_persisted_digest') == digest:
+        return False
+    
+    get_session_store().save(manager.game_id, manager.team_id, encoded)
+    st.session_state._persisted_digest = digest
+    return True
+
+def resume_session_from_store(game_id, team_id):
+    """Restore a team's saved session; returns False when nothing is stored"""
+    document = get_session_store().load(game_id, team_id)
+    if document is None:
+        return False
+    
+    manager, session = import_session(document)
+    manager.game_id = game_id
+    manager.team_id = team_id
+    apply_restored_session(manager, session)
+    return True
+
+# LIVE LEADERBOARD
+LEADERBOARD_SCORE_RESOLUTION = 100  # Scores are ranked to 0.01 UEC points
+LEADERBOARD_HISTOGRAM_BIN_WIDTH = 10
+
+class FenwickTree:
+    """Binary indexed tree of counts: O(log n) updates, prefix sums and k-th element lookup"""
+    
+    def __init__(self, size):
+        self.size = size
+        self._tree = [0] * (size + 1)
+        self._top_bit = 1 << (size.bit_length() - 1) if size else 0
+    
+    def add(self, index, delta):
+        index += 1
+        while index <= self.size:
+            self._tree[index] += delta
+            index += index & -index
+    
+    def prefix_sum(self, index):
+        """Sum of counts at positions 0..index (inclusive)"""
+        total = 0
+        index += 1
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+    
+    def find_kth(self, k):
+        """Smallest position whose prefix sum reaches k (k is 1-based)"""
+        position = 0
+        step = self._top_bit
+        while step:
+            next_position = position + step
+            if next_position <= self.size and self._tree[next_position] < k:
+                position = next_position
+                k -= self._tree[next_position]
+            step >>= 1
+        return position
+
+class Leaderboard:
+    """Workshop leaderboard with incrementally maintained rank, histogram and strategy aggregates
+    
+    Scores are bucketed at LEADERBOARD_SCORE_RESOLUTION and counted in a Fenwick tree
+    ordered from best to worst, so a submission, a rank query and each top-N step cost
+    O(log n) and rendering never re-sorts the whole field.
+    """
+    
+    def __init__(self, max_score=100.0, resolution=LEADERBOARD_SCORE_RESOLUTION, bin_width=LEADERBOARD_HISTOGRAM_BIN_WIDTH):
+        self.resolution = resolution
+        self.max_score = max_score
+        self.bin_width = bin_width
+        self._bucket_count = int(max_score * resolution) + 1
+        self._ranks = FenwickTree(self._bucket_count)
+        self._bucket_teams = {}
+        self._submissions = {}
+        # A perfect score folds into the last bin so labels run 0-10 ... 90-100
+        self._histogram = [0] * max(math.ceil(max_score / bin_width), 1)
+        self._strategy_counts = {}
+        self._lock = threading.Lock()
+        self.version = 0
+    
+    def _position(self, score):
+        # Position 0 holds the best score so prefix sums count better-or-equal teams
+        bucket = min(max(int(round(score * self.resolution)), 0), self._bucket_count - 1)
+        return self._bucket_count - 1 - bucket
+    
+    def _histogram_bin(self, score):
+        return min(max(int(score // self.bin_width), 0), len(self._histogram) - 1)
+    
+    def submit(self, team_name, submission, strategies=()):
+        """Insert or replace a team's submission; returns the team's new rank"""
+        score = submission["final_uec_score"]
+        entry = dict(submission, strategies=sorted(set(strategies)))
+        
+        with self._lock:
+            previous = self._submissions.get(team_name)
+            if previous is not None:
+                self._remove(team_name, previous)
+            
+            position = self._position(score)
+            self._submissions[team_name] = entry
+            self._bucket_teams.setdefault(position, {})[team_name] = entry
+            self._ranks.add(position, 1)
+            self._histogram[self._histogram_bin(score)] += 1
+            for strategy in entry["strategies"]:
+                self._strategy_counts[strategy] = self._strategy_counts.get(strategy, 0) + 1
+            self.version += 1
+            
+            return self._ranks.prefix_sum(position - 1) + 1 if position else 1
+    
+    def _remove(self, team_name, entry):
+        position = self._position(entry["final_uec_score"])
+        bucket = self._bucket_teams[position]
+        del bucket[team_name]
+        if not bucket:
+            del self._bucket_teams[position]
+        self._ranks.add(position, -1)
+        self._histogram[self._histogram_bin(entry["final_uec_score"])] -= 1
+        for strategy in entry["strategies"]:
+            self._strategy_counts[strategy] -= 1
+            if not self._strategy_counts[strategy]:
+                del self._strategy_counts[strategy]
+    
+    def rank_of(self, team_name):
+        """1-based rank (ties share a rank), or None when the team has not submitted"""
+        with self._lock:
+            entry = self._submissions.get(team_name)
+            if entry is None:
+                return None
+            position = self._position(entry["final_uec_score"])
+            return self._ranks.prefix_sum(position - 1) + 1 if position else 1
+    
+    def top(self, n):
+        """Best n submissions as (rank, submission), walking the tree bucket by bucket"""
+        results = []
+        with self._lock:
+            k = 1
+            total = len(self._submissions)
+            while k <= min(n, total):
+                position = self._ranks.find_kth(k)
+                tied = self._bucket_teams[position]
+                for entry in sorted(tied.values(), key=lambda item: item.get("submission_timestamp", "")):
+                    results.append((k, entry))
+                k += len(tied)
+        return results[:n]
+    
+    def histogram(self):
+        """(score range label, team count) per histogram bin"""
+        with self._lock:
+            counts = list(self._histogram)
+        return [
+            (f"{index * self.bin_width:g}-{min((index + 1) * self.bin_width, self.max_score):g}", count)
+            for index, count in enumerate(counts)
+        ]
+    
+    def strategy_popularity(self):
+        """Strategies by the number of submitting teams using them"""
+        with self._lock:
+            return sorted(self._strategy_counts.items(), key=lambda item: (-item[1], item[0]))
+    
+    def __len__(self):
+        return len(self._submissions)
+
+@st.cache_resource
+def get_leaderboard(game_id):
+    """Process-wide leaderboard of a game, rebuilt from stored submissions after a restart"""
+    leaderboard = Leaderboard()
+    for submission in get_session_store().load_submissions(game_id):
+        leaderboard.submit(submission["team_name"], submission, submission.get("strategies", []))
+    return leaderboard
+
+def submit_to_leaderboard(submission_data, strategies):
+    """Publish the team's submission to the shared leaderboard and persist it"""
+    leaderboard = get_leaderboard(st.session_state.game_name)
+    rank = leaderboard.submit(st.session_state.team_name, submission_data, strategies)
+    get_session_store().record_submission(
+        st.session_state.game_name,
+        st.session_state.team_name,
+        dict(submission_data, strategies=sorted(strategies))
+    )
+    return rank
+
+# FACILITATOR BOARD
+FACILITATOR_REFRESH_SECONDS = 2
+FACILITATOR_STALE_MINUTES = float(os.environ.get("URBAN_PULSE_FACILITATOR_STALE_MINUTES", "30") or 30)  # Idle teams leave the board
+
+class TeamStateBoard:
+    """Change feed of every active team's summary, shared by all sessions
+    
+    Each publish bumps a global sequence number and moves the team to the end of
+    an ordered map, so changes_since() walks back only over teams that changed
+    after the caller's cursor. Teams that have not published for stale_minutes
+    expire: they come back once as a (key, None) change, then are forgotten.
+    """
+    
+    def __init__(self, stale_minutes=FACILITATOR_STALE_MINUTES):
+        self.stale_seconds = stale_minutes * 60
+        self._entries = OrderedDict()  # key -> (sequence, summary), by sequence; summary None once expired
+        self._last_seen = OrderedDict()  # Live key -> last publish time, oldest first
+        self._expired = OrderedDict()  # Expired key -> expiry time, oldest first
+        self._floor = 0  # Cursors below this missed a forgotten expiry and must replay
+        self._sequence = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def version(self):
+        return self._sequence
+    
+    @staticmethod
+    def _content(summary):
+        # The publish timestamp changes on every rerun; it is not a change of state
+        return {field: value for field, value in summary.items() if field != 'updated_at'}
+    
+    def publish(self, game_id, team_id, summary, now=None):
+        """Record a team's latest summary; unchanged summaries do not bump the version"""
+        key = (game_id, team_id)
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._mark_seen(key, now)
+            self._expired.pop(key, None)
+            
+            current = self._entries.get(key)
+            if current is not None and current[1] is not None and self._content(current[1]) == self._content(summary):
+                return current[0]
+            self._sequence += 1
+            self._entries[key] = (self._sequence, summary)
+            self._entries.move_to_end(key)
+            return self._sequence
+    
+    def touch(self, game_id, team_id, now=None):
+        """Keep a live team from expiring without republishing its summary; False when the
+        board does not hold it (never published or already expired), so the caller must publish"""
+        key = (game_id, team_id)
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if key not in self._last_seen:
+                return False
+            self._mark_seen(key, now)
+            return True
+    
+    def _mark_seen(self, key, now):
+        self._last_seen[key] = now
+        self._last_seen.move_to_end(key)
+    
+    def _expire(self, now):
+        cutoff = now - self.stale_seconds
+        while self._last_seen:
+            key, seen = next(iter(self._last_seen.items()))
+            if seen >= cutoff:
+                break
+            del self._last_seen[key]
+            self._sequence += 1
+            self._entries[key] = (self._sequence, None)
+            self._entries.move_to_end(key)
+            self._expired[key] = now
+        
+        while self._expired:
+            key, expired = next(iter(self._expired.items()))
+            if expired >= cutoff:
+                break
+            del self._expired[key]
+            self._floor = max(self._floor, self._entries.pop(key)[0])
+    
+    def changes_since(self, cursor, game_id=None, now=None):
+        """(new cursor, [(key, summary or None when expired)], reset) for teams changed after cursor,
+        oldest first; reset means the cursor is too old and the caller must drop its rows first"""
+        now = time.monotonic() if now is None else now
+        changed = []
+        with self._lock:
+            self._expire(now)
+            reset = 0 < cursor < self._floor
+            if reset:
+                cursor = 0
+            for key in reversed(self._entries):
+                sequence, summary = self._entries[key]
+                if sequence <= cursor:
+                    break
+                if game_id is None or key[0] == game_id:
+                    changed.append((key, summary))
+            return self._sequence, changed[::-1], reset
+    
+    def games(self):
+        with self._lock:
+            return sorted(set(game_id for game_id, _ in self._last_seen))
+
+@st.cache_resource
+def get_team_state_board():
+    """Process-wide facilitator board"""
+    return TeamStateBoard()
+
+def build_team_summary():
+    """Facilitator-facing summary of the current session"""
+    manager = st.session_state.game_manager
+    effects = manager.calculate_round_effects()
+    uec_data = calculate_normalized_uec_score(effects) if effects else None
+    
+    configured = [
+        zone_id for zone_id, zone_data in manager.selected_zones.items()
+        if zone_data.get('strategies') and zone_data.get('actions')
+    ]
+    
+    return {
+        'team': st.session_state.team_name,
+        'game': st.session_state.game_name,
+        'round': st.session_state.current_round,
+        'zones': [CITY_ZONES[zone_id]['name'] for zone_id in manager.selected_zones],
+        'configured_zones': len(configured),
+        'uec_score': round(uec_data['overall_uec'], 2) if uec_data else 0.0,
+        'performance_level': uec_data['interpretation']['level'] if uec_data else "—",
+        'activated_loops': len(effects.get('activated_loops', [])) if effects else 0,
+        'custom_strategies': len(st.session_state.custom_strategies),
+        'updated_at': datetime.now().strftime("%H:%M:%S")
+    }
+
+def publish_team_summary(changed=True):
+    """Publish this team's summary to the facilitator board when its state changed;
+    otherwise only mark the team as still active, so open but idle teams do not expire"""
+    manager = st.session_state.game_manager
+    board = get_team_state_board()
+    if changed or not board.touch(manager.game_id, manager.team_id):
+        board.publish(manager.game_id, manager.team_id, build_team_summary())
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Urban Pulse - Headless Load Test
+Simulates N teams playing the real workshop flow against the app through Streamlit's
+AppTest API, recording per-step latency and process RSS
+
+Every simulated team is a separate app session running in this process, the same way
+a Streamlit server runs all sessions in one process, so the RSS reported here is the
+server footprint for N concurrent teams. AppTest installs a process-global runtime for
+each run, so reruns are executed one at a time; a Streamlit server also runs its
+sessions' scripts under one GIL, and the time a rerun waits for its turn is reported
+as queueing on top of the rerun's own service time.
+
+Usage:
+    python urban_pulse_loadtest.py --teams 60 --zones 3 --ramp 30 --output loadtest.json
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "urban_pulse_game.py")
+DEFAULT_TEAMS = 10
+DEFAULT_ZONES = 3
+DEFAULT_RAMP_SECONDS = 5.0
+DEFAULT_THINK_SECONDS = 0.5
+DEFAULT_TIMEOUT_SECONDS = 120
+RSS_SAMPLE_SECONDS = 0.5
+_APP_RUN_LOCK = threading.Lock()
+STEPS = ["team_setup", "city_map", "configure_zones", "dashboard", "reports"]
+ZONE_IDS = ["city_center", "commercial_district", "rich_residential", "middle_class", "poor_areas",
+            "formal_slums", "informal_slums", "risky_slums", "central_park", "luxury_park", "periphery"]
+
+# MEASUREMENT
+def current_rss_bytes():
+    """Resident set size of this process (Linux /proc, falling back to peak RSS)"""
+    try:
+        with open("/proc/self/statm", "r") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+class RssSampler:
+    """Background RSS sampling while the load test runs"""
+    
+    def __init__(self, interval=RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self.samples.append((time.perf_counter() - self._started, current_rss_bytes()))
+            self._stop.wait(self.interval)
+    
+    def start(self):
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.samples.append((time.perf_counter() - self._started, current_rss_bytes()))
+        return self.samples
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+# SIMULATED TEAM
+def _widget(widgets, label):
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    raise LookupError(f"Widget {label!r} not found")
+
+class TeamSimulation:
+    """One team's session driven through the workshop flow"""
+    
+    def __init__(self, team_index, zones_per_team, game_name, think_seconds, timeout, seed):
+        self.team_name = f"Load Team {team_index:03d}"
+        self.game_name = game_name
+        self.think_seconds = think_seconds
+        self.timeout = timeout
+        self.rng = random.Random(seed + team_index)
+        self.zones = self.rng.sample(ZONE_IDS, min(zones_per_team, len(ZONE_IDS)))
+        self.timings = []
+        self.error = None
+    
+    def _run_step(self, app, step):
+        requested = time.perf_counter()
+        with _APP_RUN_LOCK:
+            started = time.perf_counter()
+            app.run(timeout=self.timeout)
+            finished = time.perf_counter()
+        self.timings.append((step, finished - requested, finished - started))
+        if app.exception:
+            raise RuntimeError(f"{step}: {app.exception[0].message}")
+        if self.think_seconds:
+            time.sleep(self.rng.uniform(0.5, 1.5) * self.think_seconds)
+    
+    def _navigate(self, app, page, step):
+        app.sidebar.selectbox[0].select(page)
+        self._run_step(app, step)
+    
+    def run(self):
+        try:
+            app = AppTest.from_file(APP_PATH, default_timeout=self.timeout)
+            self._run_step(app, "team_setup")
+            
+            _widget(app.text_input, "Game/City Name").input(self.game_name)
+            _widget(app.text_input, "Team Name").input(self.team_name)
+            _widget(app.button, "🚀 Start Game Session").click()
+            self._run_step(app, "team_setup")
+            
+            self._navigate(app, "🗺️ Interactive City Map", "city_map")
+            for zone_id in self.zones:
+                app.checkbox(key=f"zone_select_{zone_id}").check()
+                self._run_step(app, "city_map")
+            
+            self._navigate(app, "⚙️ Zone Configuration", "configure_zones")
+            for zone_id in self.zones:
+                strategies = app.multiselect(key=f"strategies_{zone_id}")
+                strategies.set_value(self.rng.sample(strategies.options, self.rng.randint(1, 3)))
+                self._run_step(app, "configure_zones")
+                actions = app.multiselect(key=f"actions_{zone_id}")
+                actions.set_value(self.rng.sample(actions.options, min(len(actions.options), self.rng.randint(1, 4))))
+                self._run_step(app, "configure_zones")
+            
+            self._navigate(app, "📊 Game Results Dashboard", "dashboard")
+            
+            self._navigate(app, "📋 Reports & Export", "reports")
+            _widget(app.button, "📋 Generate Report").click()
+            self._run_step(app, "reports")
+        except Exception as exc:
+            self.error = f"{type(exc).__name__}: {exc}"
+
+# LOAD TEST
+def run_load_test(teams, zones_per_team, ramp_seconds, think_seconds, timeout, seed, game_name):
+    """Start teams spread over the ramp period and collect per-step latency and RSS"""
+    simulations = [
+        TeamSimulation(index, zones_per_team, game_name, think_seconds, timeout, seed)
+        for index in range(teams)
+    ]
+    # Warm-up run so module imports are part of the baseline, not the per-team cost
+    AppTest.from_file(APP_PATH, default_timeout=timeout).run()
+    baseline_rss = current_rss_bytes()
+    sampler = RssSampler().start()
+    started = time.perf_counter()
+    
+    threads = []
+    for index, simulation in enumerate(simulations):
+        delay = ramp_seconds * index / max(1, teams - 1) if teams > 1 else 0
+        thread = threading.Timer(delay, simulation.run)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    
+    duration = time.perf_counter() - started
+    rss_samples = sampler.stop()
+    return summarize_load_test(simulations, duration, baseline_rss, rss_samples)
+
+def summarize_load_test(simulations, duration, baseline_rss, rss_samples):
+    by_step = {step: [] for step in STEPS}
+    service_by_step = {step: [] for step in STEPS}
+    for simulation in simulations:
+        for step, elapsed, service in simulation.timings:
+            by_step[step].append(elapsed * 1000)
+            service_by_step[step].append(service * 1000)
+    
+    peak_rss = max(rss for _, rss in rss_samples)
+    teams = len(simulations)
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "teams": teams,
+        "completed": sum(1 for simulation in simulations if simulation.error is None),
+        "errors": [f"{simulation.team_name}: {simulation.error}" for simulation in simulations if simulation.error],
+        "duration_seconds": round(duration, 2),
+        "steps": {
+            step: {
+                "runs": len(values),
+                "p50_ms": round(percentile(values, 0.50), 1),
+                "p95_ms": round(percentile(values, 0.95), 1),
+                "max_ms": round(max(values), 1),
+                "mean_ms": round(statistics.fmean(values), 1),
+                "service_p50_ms": round(percentile(service_by_step[step], 0.50), 1),
+                "service_p95_ms": round(percentile(service_by_step[step], 0.95), 1)
+            }
+            for step, values in by_step.items() if values
+        },
+        "rss": {
+            "baseline_mb": round(baseline_rss / 2**20, 1),
+            "peak_mb": round(peak_rss / 2**20, 1),
+            "per_team_mb": round((peak_rss - baseline_rss) / 2**20 / max(1, teams), 2),
+            "samples": [(round(offset, 2), round(rss / 2**20, 1)) for offset, rss in rss_samples]
+        }
+    }
+
+def print_summary(summary):
+    print(f"Teams: {summary['completed']}/{summary['teams']} completed in {summary['duration_seconds']} s")
+    print(f"{'step':<18} {'runs':>6} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10} {'service p50':>12} {'service p95':>12}")
+    for step, stats in summary["steps"].items():
+        print(f"{step:<18} {stats['runs']:>6} {stats['p50_ms']:>10.1f} {stats['p95_ms']:>10.1f} {stats['max_ms']:>10.1f}"
+              f" {stats['service_p50_ms']:>12.1f} {stats['service_p95_ms']:>12.1f}")
+    rss = summary["rss"]
+    print(f"RSS: baseline {rss['baseline_mb']} MB, peak {rss['peak_mb']} MB, ~{rss['per_team_mb']} MB per team")
+    for error in summary["errors"]:
+        print(f"ERROR {error}")
+
+# COMMAND LINE
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent Urban Pulse teams")
+    parser.add_argument("--teams", type=int, default=DEFAULT_TEAMS)
+    parser.add_argument("--zones", type=int, default=DEFAULT_ZONES, help="Zones each team selects and configures")
+    parser.add_argument("--ramp", type=float, default=DEFAULT_RAMP_SECONDS, help="Seconds over which teams join")
+    parser.add_argument("--think", type=float, default=DEFAULT_THINK_SECONDS, help="Mean pause between interactions")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_SECONDS, help="Per-rerun timeout")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--game", default="Load Test")
+    parser.add_argument("--output", "-o", help="Write the JSON summary here")
+    args = parser.parse_args(argv)
+    
+    # Keep simulated sessions and their cached effects out of the real stores
+    session_dir = tempfile.mkdtemp(prefix="urban_pulse_loadtest_")
+    os.environ.setdefault("URBAN_PULSE_SESSION_DB", os.path.join(session_dir, "sessions.db"))
+    os.environ.setdefault("URBAN_PULSE_EFFECTS_CACHE_DIR", os.path.join(session_dir, "effects_cache"))
+    
+    summary = run_load_test(args.teams, args.zones, args.ramp, args.think, args.timeout, args.seed, args.game)
+    print_summary(summary)
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(summary, handle, indent=2)
+        print(f"Summary written to {args.output}")
+    
+    return 1 if summary["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())